@@ -0,0 +1,89 @@
+"""
+Listing-create throughput with and without the create coalescer
+(services/create_coalescer.py), at 1, 10 and 100 concurrent writers.
+
+    python -m bench.create_coalescing --db postgresql+asyncpg://... [--creates 2000] [--window-ms 2]
+
+"direct" is the API's default path: a session per create, one create_listing_v1()
+call and a commit each, on a pool sized like the API's. "coalesced" runs the same
+documents through a CreateCoalescer. The writers share 50 realtors, so the direct
+runs contend on the same realtor rows the way parallel agents do.
+
+Writes real listings: point it at a scratch database with the migrations applied.
+"""
+from __future__ import annotations
+import argparse, asyncio, json, random, statistics, time
+
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from bench.load import _listing_payload
+from routes.listings.helpers.functions import listing_create_doc
+from routes.listings.helpers.schemas import ListingCreate
+from routes.listings.helpers.sql import CREATE_LISTING_SQL
+from services.create_coalescer import CreateCoalescer
+
+def _docs(n: int, seed: int) -> list[str]:
+    rng = random.Random(seed)
+    return [json.dumps(listing_create_doc(ListingCreate(**_listing_payload(rng)))) for _ in range(n)]
+
+async def _direct(sessions, doc: str):
+    async with sessions() as session:
+        await session.execute(CREATE_LISTING_SQL, {"doc": doc, "key": None, "hash": None})
+        await session.commit()
+
+async def _drive(writers: int, docs: list[str], create) -> tuple[float, list[float], int]:
+    queue = iter(docs)
+    latencies: list[float] = []
+    errors = 0
+
+    async def writer():
+        nonlocal errors
+        for doc in queue:
+            t0 = time.perf_counter()
+            try:
+                await create(doc)
+            except Exception:
+                errors += 1
+            latencies.append((time.perf_counter() - t0) * 1000.0)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*[writer() for _ in range(writers)])
+    return time.perf_counter() - t0, sorted(latencies), errors
+
+async def run(url: str, writer_counts: list[int], creates: int, window_ms: float, max_batch: int):
+    engine = create_async_engine(url)
+    sessions = async_sessionmaker(engine, expire_on_commit=False)
+    print(f"{'writers':>8}{'mode':>11}{'creates/s':>11}{'p50 ms':>9}{'p95 ms':>9}{'errors':>8}{'avg batch':>11}")
+    try:
+        for writers in writer_counts:
+            for mode in ("direct", "coalesced"):
+                docs = _docs(creates, seed=writers)
+                coalescer = None
+                if mode == "coalesced":
+                    coalescer = CreateCoalescer(window_ms=window_ms, max_batch=max_batch)
+                    coalescer.start(sessions)
+                    create = coalescer.submit
+                else:
+                    create = lambda doc: _direct(sessions, doc)
+                elapsed, lat, errors = await _drive(writers, docs, create)
+                avg_batch = "-"
+                if coalescer is not None:
+                    avg_batch = f"{coalescer.stats()['avg_batch'] or 0:.1f}"
+                    await coalescer.stop()
+                print(f"{writers:>8}{mode:>11}{len(lat) / elapsed:>11.0f}{statistics.median(lat):>9.1f}"
+                      f"{lat[int(0.95 * (len(lat) - 1))]:>9.1f}{errors:>8}{avg_batch:>11}")
+    finally:
+        await engine.dispose()
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--db", required=True, help="postgresql+asyncpg:// URL of a scratch database")
+    ap.add_argument("--writers", default="1,10,100", help="Comma-separated concurrent writer counts")
+    ap.add_argument("--creates", type=int, default=2_000, help="Creates per run")
+    ap.add_argument("--window-ms", type=float, default=2.0)
+    ap.add_argument("--max-batch", type=int, default=64)
+    args = ap.parse_args()
+    asyncio.run(run(args.db, [int(w) for w in args.writers.split(",")], args.creates, args.window_ms, args.max_batch))
+
+if __name__ == "__main__":
+    main()
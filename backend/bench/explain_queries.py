@@ -0,0 +1,110 @@
+"""
+EXPLAIN (ANALYZE, BUFFERS) timings for the listing read queries.
+
+Record a run before and after a migration and compare them:
+
+    python -m db.migrate --target 1
+    python -m bench.explain_queries --label before --out bench/results/explain_before.json
+    python -m db.migrate
+    python -m bench.explain_queries --label after --out bench/results/explain_after.json
+    python -m bench.explain_queries --compare bench/results/explain_before.json bench/results/explain_after.json
+"""
+from __future__ import annotations
+import argparse, json, os, statistics
+from datetime import datetime, timezone
+from pathlib import Path
+
+from sqlalchemy import create_engine, text
+
+from db.migrate import sync_url
+from routes.listings.helpers.sql import BASE_LIST_SQL, ORDER_CLAUSE, DETAIL_SQL
+
+# Detail pages for listings with the most price points are the worst case for DETAIL_SQL.
+HOT_LISTINGS_SQL = text("""
+SELECT listing_id FROM price_history
+GROUP BY listing_id ORDER BY count(*) DESC LIMIT :n
+""")
+
+def _explain(conn, sql: str, params: dict) -> dict:
+    plan = conn.execute(text(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}"), params).scalar_one()
+    top = plan[0] if isinstance(plan, list) else json.loads(plan)[0]
+    root = top["Plan"]
+    return {
+        "planning_ms": top.get("Planning Time"),
+        "execution_ms": top.get("Execution Time"),
+        "shared_hit": root.get("Shared Hit Blocks"),
+        "shared_read": root.get("Shared Read Blocks"),
+        "root_node": root.get("Node Type"),
+    }
+
+def _summarize(samples: list[dict]) -> dict:
+    ex = [s["execution_ms"] for s in samples]
+    return {
+        "runs": len(samples),
+        "execution_ms_median": statistics.median(ex),
+        "execution_ms_max": max(ex),
+        "planning_ms_median": statistics.median(s["planning_ms"] for s in samples),
+        "shared_read_max": max(s["shared_read"] or 0 for s in samples),
+        "root_node": samples[-1]["root_node"],
+    }
+
+def run(url: str, repeat: int, hot: int) -> dict:
+    engine = create_engine(url)
+    results = {}
+    with engine.connect() as conn:
+        list_sql = BASE_LIST_SQL + ORDER_CLAUSE
+        results["list_all"] = _summarize([_explain(conn, list_sql, {}) for _ in range(repeat)])
+
+        filtered = BASE_LIST_SQL + " WHERE lo.loan_type = ANY(:loan_types) " + ORDER_CLAUSE
+        results["list_va_fha"] = _summarize(
+            [_explain(conn, filtered, {"loan_types": ["VA", "FHA"]}) for _ in range(repeat)]
+        )
+
+        lids = list(conn.execute(HOT_LISTINGS_SQL, {"n": hot}).scalars())
+        if lids:
+            detail = DETAIL_SQL.text.rstrip().rstrip(";")
+            samples = [_explain(conn, detail, {"lid": lid}) for lid in lids for _ in range(repeat)]
+            results["detail_hot"] = _summarize(samples)
+        conn.rollback()
+    return results
+
+def compare(before_path: str, after_path: str):
+    before = json.loads(Path(before_path).read_text())
+    after = json.loads(Path(after_path).read_text())
+    print(f"{'query':<14}{'before ms':>12}{'after ms':>12}{'speedup':>10}  plan root (after)")
+    for q, b in before["queries"].items():
+        a = after["queries"].get(q)
+        if not a:
+            continue
+        bm, am = b["execution_ms_median"], a["execution_ms_median"]
+        speed = f"{bm / am:.1f}x" if am else "-"
+        print(f"{q:<14}{bm:>12.2f}{am:>12.2f}{speed:>10}  {a['root_node']}")
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--db", default=None)
+    ap.add_argument("--label", default="run")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--hot", type=int, default=5, help="How many of the longest-history listings to EXPLAIN")
+    ap.add_argument("--out", default=None)
+    ap.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"))
+    args = ap.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    url = args.db or sync_url(os.environ["DATABASE_URL"])
+    record = {
+        "label": args.label,
+        "recorded_at": datetime.now(timezone.utc).isoformat(),
+        "queries": run(url, args.repeat, args.hot),
+    }
+    text_out = json.dumps(record, indent=2)
+    if args.out:
+        Path(args.out).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.out).write_text(text_out)
+    print(text_out)
+
+if __name__ == "__main__":
+    main()
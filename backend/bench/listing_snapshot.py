@@ -0,0 +1,94 @@
+"""
+Filter latency and memory of the in-process listing snapshot (services/listing_snapshot.py).
+
+    python -m bench.listing_snapshot --listings 100000
+    python -m bench.listing_snapshot --db postgresql+psycopg2://...    # load the real rows instead
+
+Reports, per filter set, the median/p95 time to build the mask alone and to produce
+the full ListingOut-shaped response, plus the snapshot's own byte count and what
+tracemalloc saw allocated while building it.
+"""
+from __future__ import annotations
+import argparse, statistics, time, tracemalloc
+
+import numpy as np
+from sqlalchemy import create_engine, text
+
+from bench.seed import CITIES, CITY_P, LOAN_TYPES, LOAN_TYPE_P, STATUSES, STATUS_P, STREET_NAMES
+from db.migrate import sync_url
+from services.filters import ListingFilters
+from services.listing_snapshot import SNAPSHOT_SQL, ListingSnapshot
+
+FILTERS = {
+    "none": ListingFilters(),
+    "loan_type": ListingFilters(loan_type=["VA", "FHA"]),
+    "rate+price": ListingFilters(max_rate=3.0, min_price=350_000, max_price=650_000),
+    "zip+status+beds": ListingFilters(zip=["80203", "80210", "80903"], mls_status=["active"], min_beds=3),
+}
+
+def synthetic_rows(n: int, seed: int = 7) -> list[dict]:
+    rng = np.random.default_rng(seed)
+    city = rng.choice(len(CITIES), size=n, p=CITY_P)
+    loan = rng.choice(LOAN_TYPES, size=n, p=LOAN_TYPE_P)
+    status = rng.choice(STATUSES, size=n, p=STATUS_P)
+    price = np.round(rng.lognormal(13.0, 0.35, size=n), -3)
+    rows = []
+    for i in range(n):
+        name, prefix, lat, lon = CITIES[city[i]]
+        zip5 = f"{prefix}{rng.integers(0, 100):02d}"
+        rows.append({
+            "listing_id": i + 1,
+            "address": f"{rng.integers(1, 9999)} {STREET_NAMES[i % len(STREET_NAMES)]} St, {name}, CO {zip5}",
+            "price": None if i % 50 == 0 else float(price[i]),
+            "loan_type": str(loan[i]),
+            "mls_status": str(status[i]),
+            "lat": lat + rng.normal(0, 0.05), "lon": lon + rng.normal(0, 0.05),
+            "zip5": zip5,
+            "interest_rate": float(rng.choice([2.25, 2.5, 2.75, 3.0, 3.25, 3.5, 4.0])),
+            "investor_allowed": bool(rng.random() < 0.3) if i % 7 else None,
+            "equity_to_cover": float(rng.integers(0, 200) * 1000),
+            "beds": int(rng.integers(1, 6)),
+        })
+    return rows
+
+def db_rows(url: str) -> list[dict]:
+    engine = create_engine(sync_url(url))
+    with engine.connect() as conn:
+        return [dict(r) for r in conn.execute(text(SNAPSHOT_SQL)).mappings()]
+
+def _time(fn, repeat: int) -> tuple[float, float]:
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000.0)
+    samples.sort()
+    return statistics.median(samples), samples[int(0.95 * (len(samples) - 1))]
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--listings", type=int, default=100_000)
+    ap.add_argument("--db", help="Snapshot the real listings instead of synthetic ones")
+    ap.add_argument("--repeat", type=int, default=200)
+    args = ap.parse_args()
+
+    rows = db_rows(args.db) if args.db else synthetic_rows(args.listings)
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    snap = ListingSnapshot.build(rows)
+    build_ms = (time.perf_counter() - t0) * 1000.0
+    snap.order()
+    traced, _peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"{len(snap)} listings  build {build_ms:.0f} ms  "
+          f"snapshot {snap.nbytes() / 2**20:.1f} MiB  traced {traced / 2**20:.1f} MiB")
+    print(f"{'filter':<18}{'matches':>9}{'mask p50':>11}{'mask p95':>11}{'query p50':>12}{'query p95':>12}")
+    for name, f in FILTERS.items():
+        matches = int(snap.mask(f).sum())
+        m50, m95 = _time(lambda: snap.mask(f), args.repeat)
+        q50, q95 = _time(lambda: snap.query(f), max(5, args.repeat // 20))
+        print(f"{name:<18}{matches:>9}{m50:>9.3f}ms{m95:>9.3f}ms{q50:>10.2f}ms{q95:>10.2f}ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""
+Async load driver for the authenticated API.
+
+    python -m bench.load --base-url http://localhost:8000 --token $APP_ACCESS_TOKEN \
+        --concurrency 32 --duration 60 --save-baseline bench/baselines/local.json
+
+    # CI: fail when p95 regresses more than 20% (or throughput drops 20%) vs the baseline
+    python -m bench.load ... --compare bench/baselines/local.json --max-regression 0.2
+
+Logs in once through /api/auth/login (which is rate limited) and reuses the cookie.
+Half of the detail requests go to 1% of the ids, so a few listings stay hot,
+the way real detail traffic concentrates.
+"""
+from __future__ import annotations
+import argparse, asyncio, json, os, random, sys, time
+from collections import defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable
+
+import httpx
+
+def _pct(sorted_vals: list[float], q: float) -> float | None:
+    if not sorted_vals:
+        return None
+    return sorted_vals[min(len(sorted_vals) - 1, int(round(q * (len(sorted_vals) - 1))))]
+
+def _listing_payload(rng: random.Random) -> dict:
+    n = rng.randint(1, 10**9)
+    price = rng.randint(300, 900) * 1000
+    return {
+        "street": f"{n % 9999} Loadtest Ave", "unit": None, "city": "Denver", "state": "CO",
+        "zip": f"802{n % 100:02d}", "beds": rng.randint(1, 5), "baths": 2.0, "sqft": rng.randint(700, 4000),
+        "realtor_name": f"Load Realtor {n % 50}", "mls_status": "Active",
+        "loan_type": rng.choice(["FHA", "VA", "NVVA", "CONV"]), "interest_rate": rng.choice([2.5, 2.75, 3.0]),
+        "balance": price * 0.7, "piti": 2400.0, "asking_price": float(price),
+        "response_from_realtor": "Load test note",
+    }
+
+class Driver:
+    def __init__(self, client: httpx.AsyncClient, ids: list[int], weights: dict[str, float], seed: int):
+        self.client = client
+        self.ids = ids
+        self.hot = ids[: max(1, len(ids) // 100)]
+        self.rng = random.Random(seed)
+        self.weights = weights
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.errors: dict[str, int] = defaultdict(int)
+        self.scenarios: dict[str, Callable] = {
+            "list": lambda: self.client.get("/api/listings"),
+            "list_filtered": lambda: self.client.get("/api/listings", params={"loan_type": ["VA", "FHA"]}),
+            "detail": lambda: self.client.get(f"/api/listings/{self._detail_id()}"),
+            "create": lambda: self.client.post("/api/listings", json=_listing_payload(self.rng)),
+        }
+
+    def _detail_id(self) -> int:
+        pool = self.hot if self.rng.random() < 0.5 else self.ids
+        return self.rng.choice(pool)
+
+    def _pick(self) -> str:
+        names = [k for k, w in self.weights.items() if w > 0]
+        return self.rng.choices(names, weights=[self.weights[k] for k in names])[0]
+
+    async def worker(self, deadline: float, remaining: list[int]):
+        while time.monotonic() < deadline:
+            if remaining[0] <= 0:
+                return
+            remaining[0] -= 1
+            name = self._pick()
+            start = time.perf_counter()
+            try:
+                r = await self.scenarios[name]()
+                ok = r.status_code < 400
+            except httpx.HTTPError:
+                ok = False
+            elapsed = (time.perf_counter() - start) * 1000.0
+            if ok:
+                self.latencies[name].append(elapsed)
+            else:
+                self.errors[name] += 1
+
+    def report(self, wall_s: float) -> dict:
+        out = {}
+        for name in sorted(set(self.latencies) | set(self.errors)):
+            lat = sorted(self.latencies[name])
+            out[name] = {
+                "requests": len(lat),
+                "errors": self.errors[name],
+                "throughput_rps": round(len(lat) / wall_s, 2),
+                "p50_ms": _pct(lat, 0.50),
+                "p95_ms": _pct(lat, 0.95),
+                "p99_ms": _pct(lat, 0.99),
+            }
+        return out
+
+async def run(args) -> dict:
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        r = await client.post("/api/auth/login", json={"token": args.token})
+        r.raise_for_status()
+
+        listing = (await client.get("/api/listings")).json()
+        ids = [row["listing_id"] for row in listing]
+        if not ids:
+            raise SystemExit("No listings to exercise; seed the database first (python -m bench.seed)")
+
+        weights = {"list": args.w_list, "list_filtered": args.w_filtered, "detail": args.w_detail, "create": args.w_create}
+        driver = Driver(client, ids, weights, args.seed)
+        remaining = [args.requests if args.requests else sys.maxsize]
+        start = time.monotonic()
+        deadline = start + args.duration
+        await asyncio.gather(*(driver.worker(deadline, remaining) for _ in range(args.concurrency)))
+        wall = time.monotonic() - start
+
+    return {
+        "recorded_at": datetime.now(timezone.utc).isoformat(),
+        "concurrency": args.concurrency,
+        "duration_s": round(wall, 2),
+        "listings": len(ids),
+        "endpoints": driver.report(wall),
+    }
+
+def compare(result: dict, baseline: dict, max_regression: float) -> list[str]:
+    failures = []
+    for name, base in baseline["endpoints"].items():
+        cur = result["endpoints"].get(name)
+        if not cur or not base.get("p95_ms"):
+            continue
+        if cur["p95_ms"] and cur["p95_ms"] > base["p95_ms"] * (1 + max_regression):
+            failures.append(f"{name}: p95 {cur['p95_ms']:.1f}ms vs baseline {base['p95_ms']:.1f}ms")
+        if base["throughput_rps"] and cur["throughput_rps"] < base["throughput_rps"] * (1 - max_regression):
+            failures.append(f"{name}: {cur['throughput_rps']} rps vs baseline {base['throughput_rps']} rps")
+    return failures
+
+def print_table(result: dict):
+    print(f"{'endpoint':<15}{'reqs':>8}{'err':>6}{'rps':>10}{'p50':>10}{'p95':>10}{'p99':>10}")
+    for name, r in result["endpoints"].items():
+        fmt = lambda v: f"{v:.1f}" if v is not None else "-"
+        print(f"{name:<15}{r['requests']:>8}{r['errors']:>6}{r['throughput_rps']:>10}"
+              f"{fmt(r['p50_ms']):>10}{fmt(r['p95_ms']):>10}{fmt(r['p99_ms']):>10}")
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--base-url", default="http://localhost:8000")
+    ap.add_argument("--token", default=os.getenv("APP_ACCESS_TOKEN"))
+    ap.add_argument("--concurrency", type=int, default=16)
+    ap.add_argument("--duration", type=float, default=30.0)
+    ap.add_argument("--requests", type=int, default=0, help="Stop after this many requests (0 = duration only)")
+    ap.add_argument("--timeout", type=float, default=30.0)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--w-list", type=float, default=0.15)
+    ap.add_argument("--w-filtered", type=float, default=0.15)
+    ap.add_argument("--w-detail", type=float, default=0.65)
+    ap.add_argument("--w-create", type=float, default=0.05)
+    ap.add_argument("--save-baseline", default=None)
+    ap.add_argument("--compare", default=None, help="Baseline JSON to compare against")
+    ap.add_argument("--max-regression", type=float, default=0.2)
+    args = ap.parse_args()
+    if not args.token:
+        ap.error("--token or APP_ACCESS_TOKEN is required")
+
+    result = asyncio.run(run(args))
+    print_table(result)
+
+    if args.save_baseline:
+        Path(args.save_baseline).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.save_baseline).write_text(json.dumps(result, indent=2))
+        print(f"baseline written to {args.save_baseline}")
+
+    if args.compare:
+        failures = compare(result, json.loads(Path(args.compare).read_text()), args.max_regression)
+        for f in failures:
+            print("REGRESSION", f)
+        if failures:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""
+Fill a local Postgres with a large, skewed synthetic dataset for load testing.
+
+    python -m bench.seed --db postgresql+psycopg2://... --listings 100000 --truncate
+
+Most listings get 1-4 price points and a couple of notes; a handful of "hot"
+listings get thousands of each, which is the worst case for DETAIL_SQL.
+Rows are streamed through COPY in chunks, so memory stays flat.
+"""
+from __future__ import annotations
+import argparse, csv, io, os
+from datetime import date, timedelta
+
+import numpy as np
+from sqlalchemy import create_engine, text
+
+from db.migrate import apply_schema, migrate, sync_url
+from services.address import address_key
+
+LOAN_TYPES = np.array(["FHA", "VA", "NVVA", "Maybe_NVVA", "CONV"])
+LOAN_TYPE_P = [0.42, 0.28, 0.10, 0.05, 0.15]
+STATUSES = np.array(["Active", "Coming Soon", "Pending", "Under Contract", "Closed", "Expired", "Withdrawn"])
+STATUS_P = [0.55, 0.05, 0.12, 0.08, 0.12, 0.05, 0.03]
+HOA_FREQ = np.array(["Monthly", "Quarterly", "Annual"])
+STREET_NAMES = [
+    "Main", "Oak", "Pine", "Maple", "Cedar", "Elm", "Aspen", "Spruce", "Willow", "Birch",
+    "Colfax", "Alameda", "Evans", "Yale", "Hampden", "Quincy", "Belleview", "Arapahoe",
+    "Federal", "Sheridan", "Wadsworth", "Kipling", "Broadway", "Logan", "Downing", "Colorado",
+]
+SUFFIXES = ["St", "Ave", "Dr", "Ct", "Way", "Blvd", "Ln", "Pl", "Cir"]
+# (city, zip prefix, lat, lon)
+CITIES = [
+    ("Denver", "802", 39.7392, -104.9903), ("Aurora", "800", 39.7294, -104.8319),
+    ("Lakewood", "802", 39.7047, -105.0814), ("Littleton", "801", 39.6133, -105.0166),
+    ("Colorado Springs", "809", 38.8339, -104.8214), ("Fort Collins", "805", 40.5853, -105.0844),
+    ("Boulder", "803", 40.0150, -105.2705), ("Thornton", "802", 39.8680, -104.9719),
+]
+CITY_P = [0.30, 0.16, 0.10, 0.08, 0.16, 0.08, 0.05, 0.07]
+NOTE_SNIPPETS = [
+    "Seller open to assumption, lender approval pending.",
+    "Realtor confirmed balance with servicer.",
+    "Price reduced, motivated seller.",
+    "Buyer must be VA eligible unless substitution of entitlement.",
+    "Called listing agent, no answer.",
+    "HOA covers exterior maintenance.",
+]
+
+def _copy(raw, table: str, cols: list[str], rows):
+    buf = io.StringIO()
+    w = csv.writer(buf)
+    for r in rows:
+        w.writerow(["" if v is None else v for v in r])
+    buf.seek(0)
+    with raw.cursor() as cur:
+        cur.copy_expert(f"COPY {table} ({', '.join(cols)}) FROM STDIN WITH (FORMAT csv, NULL '')", buf)
+
+def _next_id(conn, table: str, col: str) -> int:
+    return conn.execute(text(f"SELECT COALESCE(max({col}), 0) + 1 FROM {table}")).scalar_one()
+
+def seed(url: str, listings: int, realtors: int, hot: int, hot_prices: int, hot_notes: int,
+         chunk: int, seed_value: int, truncate: bool):
+    rng = np.random.default_rng(seed_value)
+    engine = create_engine(url)
+    with engine.begin() as conn:
+        apply_schema(conn)
+    # A scratch database: apply the out-of-band migrations too, so benches see the full schema.
+    migrate(engine, out_of_band=True)
+
+    with engine.begin() as conn:
+        if truncate:
+            conn.execute(text("TRUNCATE response, analysis, price_history, listing, loan, property, realtor RESTART IDENTITY CASCADE"))
+        rid0 = _next_id(conn, "realtor", "realtor_id")
+        pid0 = _next_id(conn, "property", "property_id")
+        lid0 = _next_id(conn, "listing", "listing_id")
+
+    raw = engine.raw_connection()
+    try:
+        _copy(raw, "realtor", ["realtor_id", "name"],
+              ((rid0 + i, f"Seed Realtor {rid0 + i}") for i in range(realtors)))
+
+        # Zipf-ish realtor skew: a few agents carry most of the inventory.
+        realtor_w = 1.0 / np.arange(1, realtors + 1) ** 0.8
+        realtor_w /= realtor_w.sum()
+        today = date.today()
+
+        for start in range(0, listings, chunk):
+            n = min(chunk, listings - start)
+            idx = np.arange(start, start + n)
+            city_i = rng.choice(len(CITIES), size=n, p=CITY_P)
+            loan_t = rng.choice(LOAN_TYPES, size=n, p=LOAN_TYPE_P)
+            status = rng.choice(STATUSES, size=n, p=STATUS_P)
+            price = np.round(rng.lognormal(np.log(520_000), 0.35, size=n), -3)
+            balance = np.round(price * rng.uniform(0.45, 0.92, size=n), 2)
+            rate = np.round(rng.choice([2.25, 2.5, 2.75, 3.0, 3.25, 3.5, 4.0, 5.0, 6.5], size=n), 3)
+            piti = np.round(balance * (rate / 1200) * 1.6 + rng.uniform(250, 700, size=n), 2)
+            beds = rng.integers(1, 6, size=n)
+            baths = np.round(rng.integers(2, 9, size=n) / 2, 1)
+            sqft = rng.integers(600, 4500, size=n)
+            has_hoa = rng.random(n) < 0.45
+            hoa = np.round(rng.uniform(40, 650, size=n), 2)
+            added = rng.integers(0, 900, size=n)
+            realtor = rid0 + rng.choice(realtors, size=n, p=realtor_w)
+            jitter = rng.normal(0, 0.08, size=(n, 2))
+
+            prop_rows, loan_rows, listing_rows = [], [], []
+            for j in range(n):
+                k = int(idx[j])
+                city, zpre, lat, lon = CITIES[city_i[j]]
+                street = f"{100 + k % 9800} {STREET_NAMES[k % len(STREET_NAMES)]} {SUFFIXES[(k // 7) % len(SUFFIXES)]}"
+                unit = f"Unit {k // 9800 + 1}" if k >= 9800 else None
+                zip_code = f"{zpre}{k % 100:02d}"
+                pid, lid = pid0 + k, lid0 + k
+                prop_rows.append((
+                    pid, street, unit, city, "CO", zip_code, address_key(street, unit, city, "CO", zip_code), int(beds[j]), float(baths[j]), int(sqft[j]),
+                    float(hoa[j]) if has_hoa[j] else None,
+                    HOA_FREQ[k % 3] if has_hoa[j] else None,
+                    round(lat + jitter[j, 0], 6), round(lon + jitter[j, 1], 6),
+                ))
+                loan_rows.append((pid, loan_t[j], float(rate[j]), float(balance[j]), float(piti[j]),
+                                  "Seed Servicing", bool(k % 4 == 0)))
+                listing_rows.append((
+                    lid, pid, int(realtor[j]), today - timedelta(days=int(added[j])),
+                    f"{7_000_000 + k}", f"https://mls.example.com/listing/{7_000_000 + k}", status[j],
+                    max(0.0, float(price[j] - balance[j])), bool(k % 5 == 0),
+                ))
+
+            _copy(raw, "property", ["property_id", "street", "unit", "city", "state", "zip", "address_key", "beds", "baths",
+                                    "sqft", "hoa_amount", "hoa_frequency", "latitude", "longitude"], prop_rows)
+            _copy(raw, "loan", ["property_id", "loan_type", "interest_rate", "balance", "piti",
+                                "loan_servicer", "investor_allowed"], loan_rows)
+            _copy(raw, "listing", ["listing_id", "property_id", "realtor_id", "date_added", "mls_id", "mls_link",
+                                   "mls_status", "equity_to_cover", "sent_to_clients"], listing_rows)
+
+            # Ordinary history: 1-4 price points drifting down, 0-2 notes.
+            n_prices = 1 + rng.poisson(0.8, size=n).clip(0, 3)
+            price_rows, note_rows = [], []
+            for j in range(n):
+                lid = lid0 + int(idx[j])
+                d0 = today - timedelta(days=int(added[j]))
+                for p in range(int(n_prices[j])):
+                    price_rows.append((lid, d0 + timedelta(days=14 * p), round(float(price[j]) * (1 - 0.015 * p), 2)))
+                # Without replacement: response_note_uidx (migration 0014) rejects repeats.
+                for k in rng.choice(len(NOTE_SNIPPETS), size=int(rng.integers(0, 3)), replace=False):
+                    note_rows.append((lid, "Realtor/Seller", NOTE_SNIPPETS[int(k)]))
+            _copy(raw, "price_history", ["listing_id", "effective_date", "price"], price_rows)
+            _copy(raw, "response", ["listing_id", "author", "note_text"], note_rows)
+            raw.commit()
+            print(f"seeded listings {start + n}/{listings}")
+
+        # Hot listings: very long histories.
+        hot_ids = lid0 + rng.choice(listings, size=min(hot, listings), replace=False)
+        for lid in hot_ids:
+            base = float(rng.lognormal(np.log(520_000), 0.3))
+            walk = base * np.exp(np.cumsum(rng.normal(0, 0.004, size=hot_prices)))
+            start_day = today - timedelta(days=hot_prices)
+            _copy(raw, "price_history", ["listing_id", "effective_date", "price"],
+                  ((int(lid), start_day + timedelta(days=d), round(float(walk[d]), 2)) for d in range(hot_prices)))
+            _copy(raw, "response", ["listing_id", "author", "note_text"],
+                  ((int(lid), "Amy" if i % 3 else "Realtor/Seller", f"{NOTE_SNIPPETS[i % len(NOTE_SNIPPETS)]} (#{i})")
+                   for i in range(hot_notes)))
+            raw.commit()
+        print(f"seeded {len(hot_ids)} hot listings ({hot_prices} prices, {hot_notes} notes each)")
+
+        with raw.cursor() as cur:
+            for table, col in (("realtor", "realtor_id"), ("property", "property_id"), ("listing", "listing_id")):
+                cur.execute(f"SELECT setval(pg_get_serial_sequence('{table}', '{col}'), (SELECT max({col}) FROM {table}))")
+            cur.execute("ANALYZE")
+        raw.commit()
+    finally:
+        raw.close()
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--db", default=None)
+    ap.add_argument("--listings", type=int, default=100_000)
+    ap.add_argument("--realtors", type=int, default=2_000)
+    ap.add_argument("--hot-listings", type=int, default=200)
+    ap.add_argument("--hot-price-points", type=int, default=10_000)
+    ap.add_argument("--hot-notes", type=int, default=500)
+    ap.add_argument("--chunk", type=int, default=10_000)
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--truncate", action="store_true", help="Empty the listing tables first")
+    args = ap.parse_args()
+
+    url = args.db or sync_url(os.environ["DATABASE_URL"])
+    seed(url, args.listings, args.realtors, args.hot_listings, args.hot_price_points, args.hot_notes,
+         args.chunk, args.seed, args.truncate)
+
+if __name__ == "__main__":
+    main()
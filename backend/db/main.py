@@ -1,17 +1,101 @@
 import os
-from pathlib import Path
-from sqlalchemy import text
+from contextlib import asynccontextmanager
+from time import perf_counter
+from fastapi import Request
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from observability.metrics import POOL_CHECKOUT_WAIT, READ_ROUTE, instrument_engine
+from observability.query_stats import QueryStats
+from services.load_shed import pool_pressure, statement_timeout_ms
+from .migrate import apply_schema, migrate_async
+from .replica import LSN_COOKIE, note_commit, replica_monitor
 
 DATABASE_URL = os.getenv("DATABASE_URL")
+# Optional hot standby for GET endpoints (see db/replica.py).
+REPLICA_DATABASE_URL = os.getenv("REPLICA_DATABASE_URL") or None
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """
+    Records how long each checkout waits for a free (or new) connection, and
+    feeds `pressure` (the load shedder's view of the pool) when set.
+    """
+    pressure = None
+
+    def _do_get(self):
+        start = perf_counter()
+        if self.pressure is not None:
+            self.pressure.checkout_started()
+        try:
+            return super()._do_get()
+        finally:
+            waited = perf_counter() - start
+            POOL_CHECKOUT_WAIT.observe(waited)
+            if self.pressure is not None:
+                self.pressure.checkout_finished(waited)
 
-async_engine = create_async_engine(DATABASE_URL, echo=False, pool_pre_ping=True)
+class PrimaryQueuePool(TimedQueuePool):
+    pressure = pool_pressure
+
+async_engine = create_async_engine(DATABASE_URL, echo=False, pool_pre_ping=True, poolclass=PrimaryQueuePool)
+instrument_engine(async_engine)
+
+query_stats = QueryStats(source="api", slow_ms=float(os.getenv("QUERY_STATS_SLOW_MS", "250")))
+if os.getenv("QUERY_STATS", "1") == "1":
+    query_stats.install(async_engine)
 AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False)
+replica_engine = None
+ReplicaSessionLocal = None
+if REPLICA_DATABASE_URL:
+    replica_engine = create_async_engine(REPLICA_DATABASE_URL, echo=False, pool_pre_ping=True, poolclass=TimedQueuePool)
+    instrument_engine(replica_engine, pool_gauges=False)
+    if os.getenv("QUERY_STATS", "1") == "1":
+        query_stats.install(replica_engine)
+    ReplicaSessionLocal = async_sessionmaker(replica_engine, expire_on_commit=False)
+
+@event.listens_for(Session, "after_begin")
+def _after_begin(session, transaction, connection):
+    # Per-route statement timeout (services/load_shed.py); SET LOCAL ends with the transaction.
+    ms = statement_timeout_ms.get()
+    if ms:
+        connection.exec_driver_sql(f"SET LOCAL statement_timeout = {int(ms)}")
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session):
+    # Flags the current request for a read-your-writes cookie (ReadYourWritesMiddleware).
+    if session.bind is async_engine.sync_engine:
+        note_commit()
+
 async def get_session():
     async with AsyncSessionLocal() as session:
         yield session
 
-SCHEMA_SQL = Path(__file__).resolve().parent.parent / "db" / "schema.sql"
+@asynccontextmanager
+async def read_session(request: Request):
+    """
+    Session for read-only work: the replica when one is configured, healthy, and
+    has replayed past this client's last write; otherwise the primary.
+    """
+    session = None
+    if ReplicaSessionLocal is not None and replica_monitor.can_serve(request.cookies.get(LSN_COOKIE)):
+        session = ReplicaSessionLocal()
+        try:
+            await session.connection()
+        except Exception:
+            await session.close()
+            replica_monitor.mark_down()
+            session = None
+    READ_ROUTE.labels("replica" if session is not None else "primary").inc()
+    async with (session or AsyncSessionLocal()) as s:
+        yield s
+
+async def get_read_session(request: Request):
+    async with read_session(request) as session:
+        yield session
+
 async def init_db():
     async with async_engine.begin() as conn:
-        await conn.execute(text(SCHEMA_SQL.read_text()))
\ No newline at end of file
+        await conn.run_sync(apply_schema)
+    await migrate_async(async_engine)
\ No newline at end of file
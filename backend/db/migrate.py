@@ -0,0 +1,252 @@
+"""
+Versioned schema migrations.
+
+`schema.sql` is the baseline; every later change is a numbered file in
+db/migrations/ named NNNN_description.sql or NNNN_description.py. Applied versions
+are recorded in `schema_migrations`, and a session advisory lock keeps concurrent
+runners (API workers starting together, an ETL run) from applying the same file twice.
+
+SQL files run in one transaction unless they start with a
+`-- migrate: no-transaction` line, in which case each statement autocommits (needed
+for CREATE INDEX CONCURRENTLY). Python files define `upgrade(conn)` taking a sync
+SQLAlchemy Connection, plus an optional `TRANSACTIONAL = False`, and report
+through this module's `log`.
+
+A migration too slow or lock-heavy for startup is marked out of band
+(`-- migrate: out-of-band` among its first lines, or `OUT_OF_BAND = True`). The
+automatic runs at API/ETL startup skip it with a warning; it is applied only with
+--out-of-band.
+
+    python -m db.migrate --db postgresql+psycopg2://... [--list] [--target N] [--out-of-band]
+"""
+from __future__ import annotations
+import argparse, importlib.util, logging, os, re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Connection, Engine
+
+log = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = Path(__file__).resolve().parent / "migrations"
+SCHEMA_SQL = Path(__file__).resolve().parent / "schema.sql"
+LOCK_KEY = 7_240_128
+# Skipped by query stats: a slow lock wait must never be sampled and re-run.
+LOCK_SQL = text("SELECT pg_advisory_lock(:k)").execution_options(query_stats_skip=True)
+UNLOCK_SQL = text("SELECT pg_advisory_unlock(:k)").execution_options(query_stats_skip=True)
+
+NO_TX_MARKER = "-- migrate: no-transaction"
+OUT_OF_BAND_MARKER = "-- migrate: out-of-band"
+_NAME_RE = re.compile(r"^(\d{4})_(\w+)\.(sql|py)$")
+
+VERSION_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version    int PRIMARY KEY,
+    name       text NOT NULL,
+    applied_at timestamptz NOT NULL DEFAULT now()
+)
+"""
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    path: Path
+
+    def _markers(self) -> set[str]:
+        """The leading `-- migrate: ...` lines of a SQL file."""
+        out = set()
+        for line in self.path.read_text().lstrip().splitlines():
+            if not line.strip().lower().startswith("-- migrate:"):
+                break
+            out.add(line.strip().lower())
+        return out
+
+    @property
+    def transactional(self) -> bool:
+        if self.path.suffix == ".sql":
+            return NO_TX_MARKER not in self._markers()
+        return getattr(self._module(), "TRANSACTIONAL", True)
+
+    @property
+    def out_of_band(self) -> bool:
+        if self.path.suffix == ".sql":
+            return OUT_OF_BAND_MARKER in self._markers()
+        return getattr(self._module(), "OUT_OF_BAND", False)
+
+    def _module(self):
+        spec = importlib.util.spec_from_file_location(f"db.migrations.m{self.version:04d}", self.path)
+        mod = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(mod)
+        return mod
+
+def discover() -> list[Migration]:
+    found = []
+    for p in sorted(MIGRATIONS_DIR.iterdir()):
+        m = _NAME_RE.match(p.name)
+        if m:
+            found.append(Migration(int(m.group(1)), m.group(2), p))
+    versions = [m.version for m in found]
+    if len(versions) != len(set(versions)):
+        raise RuntimeError(f"Duplicate migration versions in {MIGRATIONS_DIR}")
+    return found
+
+def split_sql(sql: str) -> list[str]:
+    """Split a script into statements, respecting quotes, comments and $tag$ bodies."""
+    out, buf, i, n = [], [], 0, len(sql)
+    while i < n:
+        c = sql[i]
+        if c == "-" and sql.startswith("--", i):
+            j = sql.find("\n", i)
+            j = n if j == -1 else j
+            buf.append(sql[i:j]); i = j
+        elif c == "/" and sql.startswith("/*", i):
+            j = sql.find("*/", i + 2)
+            j = n if j == -1 else j + 2
+            buf.append(sql[i:j]); i = j
+        elif c in ("'", '"'):
+            j = i + 1
+            while j < n:
+                if sql[j] == c:
+                    if j + 1 < n and sql[j + 1] == c:
+                        j += 2; continue
+                    break
+                j += 1
+            buf.append(sql[i:j + 1]); i = j + 1
+        elif c == "$":
+            m = re.match(r"\$[A-Za-z_]*\$", sql[i:])
+            if m:
+                tag = m.group(0)
+                j = sql.find(tag, i + len(tag))
+                j = n if j == -1 else j + len(tag)
+                buf.append(sql[i:j]); i = j
+            else:
+                buf.append(c); i += 1
+        elif c == ";":
+            out.append("".join(buf)); buf = []; i += 1
+        else:
+            buf.append(c); i += 1
+    out.append("".join(buf))
+    return [s.strip() for s in out if _has_code(s)]
+
+def _has_code(stmt: str) -> bool:
+    no_comments = re.sub(r"--[^\n]*|/\*.*?\*/", "", stmt, flags=re.S)
+    return bool(no_comments.strip())
+
+def apply_schema(conn: Connection):
+    for stmt in split_sql(SCHEMA_SQL.read_text()):
+        conn.exec_driver_sql(stmt)
+
+def _applied(conn: Connection) -> set[int]:
+    return set(conn.execute(text("SELECT version FROM schema_migrations")).scalars())
+
+def _pending(conn: Connection, target: Optional[int], out_of_band: bool = False) -> list[Migration]:
+    done = _applied(conn)
+    out = []
+    for m in discover():
+        if m.version in done or (target is not None and m.version > target):
+            continue
+        if m.out_of_band and not out_of_band:
+            log.warning("skipping out-of-band migration %04d %s; apply it with python -m db.migrate --out-of-band",
+                        m.version, m.name)
+            continue
+        out.append(m)
+    return out
+
+def _apply(conn: Connection, m: Migration):
+    if m.path.suffix == ".sql":
+        for stmt in split_sql(m.path.read_text()):
+            conn.exec_driver_sql(stmt)
+    else:
+        m._module().upgrade(conn)
+    conn.execute(
+        text("INSERT INTO schema_migrations (version, name) VALUES (:v, :n)"),
+        {"v": m.version, "n": m.name},
+    )
+
+def _lock(conn: Connection):
+    conn.exec_driver_sql(VERSION_TABLE_SQL)
+    conn.execute(LOCK_SQL, {"k": LOCK_KEY})
+
+def _unlock(conn: Connection):
+    conn.execute(UNLOCK_SQL, {"k": LOCK_KEY})
+
+def migrate(engine: Engine, target: Optional[int] = None, out_of_band: bool = False) -> list[Migration]:
+    """Apply pending migrations with a sync engine (ETL, CLI). Returns what ran."""
+    ran = []
+    with engine.connect() as lock:
+        lock = lock.execution_options(isolation_level="AUTOCOMMIT")
+        _lock(lock)
+        try:
+            for m in _pending(lock, target, out_of_band):
+                if m.transactional:
+                    with engine.begin() as conn:
+                        _apply(conn, m)
+                else:
+                    with engine.connect() as conn:
+                        _apply(conn.execution_options(isolation_level="AUTOCOMMIT"), m)
+                ran.append(m)
+        finally:
+            _unlock(lock)
+    return ran
+
+async def migrate_async(engine, target: Optional[int] = None, out_of_band: bool = False) -> list[Migration]:
+    """Same as `migrate` for an AsyncEngine (API startup)."""
+    ran = []
+    async with engine.connect() as lock:
+        lock = await lock.execution_options(isolation_level="AUTOCOMMIT")
+        await lock.run_sync(_lock)
+        try:
+            for m in await lock.run_sync(_pending, target, out_of_band):
+                if m.transactional:
+                    async with engine.begin() as conn:
+                        await conn.run_sync(_apply, m)
+                else:
+                    async with engine.connect() as conn:
+                        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+                        await conn.run_sync(_apply, m)
+                ran.append(m)
+        finally:
+            await lock.run_sync(_unlock)
+    return ran
+
+def main():
+    ap = argparse.ArgumentParser(description="Apply db/migrations to a database")
+    ap.add_argument("--db", default=None, help="Sync SQLAlchemy URL (defaults to DATABASE_URL with a psycopg2 driver)")
+    ap.add_argument("--target", type=int, default=None, help="Stop after this version")
+    ap.add_argument("--list", action="store_true", help="Only print applied/pending versions")
+    ap.add_argument("--with-schema", action="store_true", help="Apply schema.sql first (fresh database)")
+    ap.add_argument("--out-of-band", action="store_true", help="Also apply migrations marked out-of-band")
+    args = ap.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    url = args.db or sync_url(os.environ["DATABASE_URL"])
+    engine = create_engine(url)
+
+    if args.with_schema:
+        with engine.begin() as conn:
+            apply_schema(conn)
+
+    if args.list:
+        with engine.begin() as conn:
+            conn.exec_driver_sql(VERSION_TABLE_SQL)
+            done = _applied(conn)
+        for m in discover():
+            state = "applied" if m.version in done else "pending (out of band)" if m.out_of_band else "pending"
+            print(f"{m.version:04d} {m.name:<40} {state}")
+        return
+
+    ran = migrate(engine, target=args.target, out_of_band=args.out_of_band)
+    for m in ran:
+        print(f"applied {m.version:04d} {m.name}")
+    if not ran:
+        print("Nothing to apply.")
+
+def sync_url(url: str) -> str:
+    """Map an async driver URL (postgresql+asyncpg://) to its psycopg2 equivalent."""
+    return re.sub(r"^postgresql\+\w+://", "postgresql+psycopg2://", url)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,4 @@
+-- Formerly an ad-hoc DO $$ block at the top of every ETL run.
+ALTER TABLE property ADD COLUMN IF NOT EXISTS hoa_amount numeric(12,2);
+ALTER TABLE property ADD COLUMN IF NOT EXISTS hoa_frequency text
+    CHECK (hoa_frequency IN ('Monthly','Quarterly','Semi-Annual','Annual'));
@@ -0,0 +1,25 @@
+-- migrate: no-transaction
+-- Indexes behind BASE_LIST_SQL / DETAIL_SQL. Built CONCURRENTLY so a live API keeps
+-- writing; if a build is interrupted Postgres leaves the index INVALID, so drop it
+-- and re-run the migration. Before/after plans: python -m bench.explain_queries.
+--
+-- listing.property_id needs no index of its own: listing_prop_realtor_link_unique
+-- (property_id, realtor_id, mls_link_norm) already leads with it.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS listing_realtor_id_idx
+    ON listing (realtor_id);
+
+-- latest price (DISTINCT ON / LATERAL LIMIT 1) and the price_history json_agg;
+-- INCLUDE (price) lets the latest-price lookup run as an index-only scan.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS price_history_listing_date_idx
+    ON price_history (listing_id, effective_date DESC, price_id DESC) INCLUDE (price);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS analysis_listing_run_date_idx
+    ON analysis (listing_id, run_date DESC, analysis_id DESC);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS response_listing_created_idx
+    ON response (listing_id, created_at DESC, response_id DESC);
+
+-- Created by older ETL runs; an exact duplicate of listing_prop_realtor_link_unique
+-- that only added write cost.
+DROP INDEX CONCURRENTLY IF EXISTS uniq_listing_property_realtor_link;
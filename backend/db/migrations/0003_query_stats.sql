@@ -0,0 +1,13 @@
+-- Persisted statement fingerprints for /api/admin/query-stats (observability/query_stats.py).
+CREATE TABLE IF NOT EXISTS query_stat (
+    source      text NOT NULL,
+    fingerprint text NOT NULL,
+    query       text NOT NULL,
+    calls       bigint NOT NULL DEFAULT 0,
+    total_ms    double precision NOT NULL DEFAULT 0,
+    max_ms      double precision NOT NULL DEFAULT 0,
+    samples_ms  double precision[] NOT NULL DEFAULT '{}',
+    explains    jsonb NOT NULL DEFAULT '[]',
+    updated_at  timestamptz NOT NULL DEFAULT now(),
+    PRIMARY KEY (source, fingerprint)
+);
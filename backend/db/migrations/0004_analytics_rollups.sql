@@ -0,0 +1,36 @@
+-- Rollups behind GET /api/analytics/summary, rebuilt by jobs/rollups.py.
+-- Write paths append a marker row; a rebuild deletes the markers it has seen.
+-- Appends never contend with each other, and a marker from a transaction that
+-- commits mid-rebuild survives for the next cycle.
+CREATE TABLE IF NOT EXISTS analytics_dirty (
+    marked_at timestamptz NOT NULL DEFAULT now()
+);
+INSERT INTO analytics_dirty DEFAULT VALUES;
+
+CREATE TABLE IF NOT EXISTS analytics_segment (
+    loan_type  text NOT NULL,
+    mls_status text NOT NULL,
+    listings   int  NOT NULL,
+    PRIMARY KEY (loan_type, mls_status)
+);
+
+CREATE TABLE IF NOT EXISTS analytics_totals (
+    id            boolean PRIMARY KEY DEFAULT true CHECK (id),
+    listings      int NOT NULL,
+    rate_avg      numeric(6,3),
+    rate_median   numeric(6,3),
+    equity_median numeric(14,2),
+    price_cuts    int NOT NULL,
+    refreshed_at  timestamptz NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS analytics_bucket (
+    grain         text NOT NULL CHECK (grain IN ('week','month')),
+    bucket_start  date NOT NULL,
+    new_listings  int  NOT NULL,
+    price_cuts    int  NOT NULL,
+    rate_avg      numeric(6,3),
+    rate_median   numeric(6,3),
+    equity_median numeric(14,2),
+    PRIMARY KEY (grain, bucket_start)
+);
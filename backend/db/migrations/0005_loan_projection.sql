@@ -0,0 +1,33 @@
+-- Balance projection inputs/outputs (services/amortization.py, jobs/projections.py).
+-- balance_as_of is the date `balance` was last known to be true; a trigger moves it
+-- forward whenever a writer changes the balance without setting it explicitly.
+ALTER TABLE loan
+  ADD COLUMN IF NOT EXISTS balance_as_of     date,
+  ADD COLUMN IF NOT EXISTS projected_balance numeric(14,2),
+  ADD COLUMN IF NOT EXISTS projected_equity  numeric(14,2),
+  ADD COLUMN IF NOT EXISTS projected_on      date;
+
+UPDATE loan lo
+SET balance_as_of = COALESCE(
+      (SELECT min(l.date_added) FROM listing l WHERE l.property_id = lo.property_id),
+      CURRENT_DATE)
+WHERE balance_as_of IS NULL AND balance IS NOT NULL;
+
+CREATE OR REPLACE FUNCTION loan_stamp_balance_as_of() RETURNS trigger AS $$
+BEGIN
+  IF TG_OP = 'INSERT' THEN
+    IF NEW.balance IS NOT NULL THEN
+      NEW.balance_as_of := COALESCE(NEW.balance_as_of, CURRENT_DATE);
+    END IF;
+  ELSIF NEW.balance IS DISTINCT FROM OLD.balance
+        AND NEW.balance_as_of IS NOT DISTINCT FROM OLD.balance_as_of THEN
+    NEW.balance_as_of := CURRENT_DATE;
+  END IF;
+  RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS loan_balance_as_of ON loan;
+CREATE TRIGGER loan_balance_as_of
+  BEFORE INSERT OR UPDATE ON loan
+  FOR EACH ROW EXECUTE FUNCTION loan_stamp_balance_as_of();
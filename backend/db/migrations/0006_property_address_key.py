@@ -0,0 +1,39 @@
+"""
+Canonical property.address_key (services/address.py), uniquely indexed, replacing the
+raw-column UNIQUE (street, unit, city, state, zip) that COALESCE lookups could not use.
+
+Only keys are written here; nothing is merged or deleted. When several properties
+normalize to one key, the lowest property_id gets it and the others keep a NULL key
+until `python -m jobs.merge_properties` (reviewable with --dry-run) folds them in.
+Keys come from the normalizer current at upgrade time, the same one the API and ETL
+look up with; merge_properties re-keys after it changes.
+"""
+from sqlalchemy import text
+
+from db.migrate import log
+from services.address import address_key
+
+_CHUNK = 5_000
+
+def upgrade(conn):
+    conn.execute(text("ALTER TABLE property ADD COLUMN IF NOT EXISTS address_key text"))
+    conn.execute(text("CREATE TEMP TABLE property_key (property_id int PRIMARY KEY, key text) ON COMMIT DROP"))
+    rows = conn.execute(text("SELECT property_id, street, unit, city, state, zip FROM property")).all()
+    batch = [{"pid": r[0], "key": address_key(r[1], r[2], r[3], r[4], r[5])} for r in rows]
+    for i in range(0, len(batch), _CHUNK):
+        conn.execute(text("INSERT INTO property_key (property_id, key) VALUES (:pid, :key)"), batch[i:i + _CHUNK])
+    keyed = conn.execute(text("""
+        UPDATE property p SET address_key = k.key
+        FROM (SELECT DISTINCT ON (key) key, property_id FROM property_key
+              WHERE key IS NOT NULL ORDER BY key, property_id) k
+        WHERE p.property_id = k.property_id
+    """)).rowcount
+    unkeyed = conn.execute(text(
+        "SELECT count(*) FROM property_key k JOIN property p USING (property_id) "
+        "WHERE k.key IS NOT NULL AND p.address_key IS NULL"
+    )).scalar_one()
+    log.info("  property keys: %d keyed", keyed)
+    if unkeyed:
+        log.warning("  %d duplicate properties left unkeyed; run python -m jobs.merge_properties to merge them", unkeyed)
+    conn.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS property_address_key_uidx ON property (address_key)"))
+    conn.execute(text("ALTER TABLE property DROP CONSTRAINT IF EXISTS property_street_unit_city_state_zip_key"))
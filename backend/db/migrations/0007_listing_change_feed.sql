@@ -0,0 +1,158 @@
+-- Row versioning and the change feed behind GET /api/listings/changes.
+--
+-- updated_at/version are maintained by a BEFORE UPDATE trigger, so every writer
+-- (create_listing, the ETL, jobs) gets them without touching its SQL. Updates that
+-- change nothing (ON CONFLICT DO UPDATE with identical values) do not bump them.
+ALTER TABLE listing       ADD COLUMN IF NOT EXISTS updated_at timestamptz NOT NULL DEFAULT now(),
+                          ADD COLUMN IF NOT EXISTS version bigint NOT NULL DEFAULT 1;
+ALTER TABLE property      ADD COLUMN IF NOT EXISTS updated_at timestamptz NOT NULL DEFAULT now(),
+                          ADD COLUMN IF NOT EXISTS version bigint NOT NULL DEFAULT 1;
+ALTER TABLE loan          ADD COLUMN IF NOT EXISTS updated_at timestamptz NOT NULL DEFAULT now(),
+                          ADD COLUMN IF NOT EXISTS version bigint NOT NULL DEFAULT 1;
+ALTER TABLE price_history ADD COLUMN IF NOT EXISTS updated_at timestamptz NOT NULL DEFAULT now(),
+                          ADD COLUMN IF NOT EXISTS version bigint NOT NULL DEFAULT 1;
+
+-- Trigger arguments name extra columns to ignore (generated or derived ones).
+CREATE OR REPLACE FUNCTION touch_row() RETURNS trigger AS $$
+DECLARE
+  ignored text[] := COALESCE(TG_ARGV, '{}') || ARRAY['updated_at', 'version'];
+BEGIN
+  IF (to_jsonb(NEW) - ignored) IS DISTINCT FROM (to_jsonb(OLD) - ignored) THEN
+    NEW.updated_at := now();
+    NEW.version := OLD.version + 1;
+  END IF;
+  RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS listing_touch ON listing;
+CREATE TRIGGER listing_touch BEFORE UPDATE ON listing
+  FOR EACH ROW EXECUTE FUNCTION touch_row('mls_link_norm');
+DROP TRIGGER IF EXISTS property_touch ON property;
+CREATE TRIGGER property_touch BEFORE UPDATE ON property
+  FOR EACH ROW EXECUTE FUNCTION touch_row();
+DROP TRIGGER IF EXISTS loan_touch ON loan;
+CREATE TRIGGER loan_touch BEFORE UPDATE ON loan
+  FOR EACH ROW EXECUTE FUNCTION touch_row('projected_balance', 'projected_equity', 'projected_on');
+DROP TRIGGER IF EXISTS price_history_touch ON price_history;
+CREATE TRIGGER price_history_touch BEFORE UPDATE ON price_history
+  FOR EACH ROW EXECUTE FUNCTION touch_row();
+
+-- One row per listing, stamped with the id of the last transaction that changed it.
+-- Readers only return rows below the snapshot xmin: every transaction there has
+-- finished, so nothing can later appear behind a cursor already handed out.
+CREATE TABLE IF NOT EXISTS listing_change (
+    listing_id int PRIMARY KEY,
+    deleted    boolean NOT NULL DEFAULT false,
+    txid       xid8 NOT NULL DEFAULT pg_current_xact_id(),
+    changed_at timestamptz NOT NULL DEFAULT now()
+);
+CREATE INDEX IF NOT EXISTS listing_change_txid_idx ON listing_change (txid, listing_id);
+
+INSERT INTO listing_change (listing_id)
+SELECT listing_id FROM listing
+ON CONFLICT (listing_id) DO NOTHING;
+
+-- Statement-level triggers with transition tables: one upsert per statement, so bulk
+-- ETL/COPY loads cost one pass rather than a trigger call per row. Child-table
+-- triggers only touch listings that still exist, so a cascaded delete cannot
+-- un-delete its listing.
+CREATE OR REPLACE FUNCTION listing_change_mark(ids int[], is_deleted boolean) RETURNS void AS $$
+  INSERT INTO listing_change (listing_id, deleted, txid, changed_at)
+  SELECT DISTINCT id, is_deleted, pg_current_xact_id(), now() FROM unnest(ids) id
+  ON CONFLICT (listing_id) DO UPDATE SET
+    deleted = EXCLUDED.deleted, txid = EXCLUDED.txid, changed_at = EXCLUDED.changed_at
+  WHERE (listing_change.deleted, listing_change.txid) IS DISTINCT FROM (EXCLUDED.deleted, EXCLUDED.txid);
+$$ LANGUAGE sql;
+
+CREATE OR REPLACE FUNCTION listing_change_from_listing() RETURNS trigger AS $$
+BEGIN
+  IF TG_OP = 'DELETE' THEN
+    PERFORM listing_change_mark(ARRAY(SELECT listing_id FROM old_rows), true);
+  ELSIF TG_OP = 'INSERT' THEN
+    PERFORM listing_change_mark(ARRAY(SELECT listing_id FROM new_rows), false);
+  ELSE
+    PERFORM listing_change_mark(ARRAY(
+      SELECT n.listing_id FROM new_rows n JOIN old_rows o USING (listing_id)
+      WHERE n.version <> o.version), false);
+  END IF;
+  RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+-- Shared by property and loan, both keyed by property_id.
+CREATE OR REPLACE FUNCTION listing_change_from_property() RETURNS trigger AS $$
+BEGIN
+  IF TG_OP = 'DELETE' THEN
+    PERFORM listing_change_mark(ARRAY(
+      SELECT l.listing_id FROM old_rows o JOIN listing l ON l.property_id = o.property_id), false);
+  ELSIF TG_OP = 'INSERT' THEN
+    PERFORM listing_change_mark(ARRAY(
+      SELECT l.listing_id FROM new_rows n JOIN listing l ON l.property_id = n.property_id), false);
+  ELSE
+    PERFORM listing_change_mark(ARRAY(
+      SELECT l.listing_id FROM new_rows n JOIN old_rows o USING (property_id)
+      JOIN listing l ON l.property_id = n.property_id
+      WHERE n.version <> o.version), false);
+  END IF;
+  RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION listing_change_from_price() RETURNS trigger AS $$
+BEGIN
+  IF TG_OP = 'DELETE' THEN
+    PERFORM listing_change_mark(ARRAY(
+      SELECT l.listing_id FROM old_rows o JOIN listing l USING (listing_id)), false);
+  ELSIF TG_OP = 'INSERT' THEN
+    PERFORM listing_change_mark(ARRAY(
+      SELECT l.listing_id FROM new_rows n JOIN listing l USING (listing_id)), false);
+  ELSE
+    PERFORM listing_change_mark(ARRAY(
+      SELECT l.listing_id FROM new_rows n JOIN old_rows o USING (price_id)
+      JOIN listing l ON l.listing_id IN (n.listing_id, o.listing_id)
+      WHERE n.version <> o.version OR n.listing_id <> o.listing_id), false);
+  END IF;
+  RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS listing_change_ins ON listing;
+DROP TRIGGER IF EXISTS listing_change_upd ON listing;
+DROP TRIGGER IF EXISTS listing_change_del ON listing;
+CREATE TRIGGER listing_change_ins AFTER INSERT ON listing REFERENCING NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION listing_change_from_listing();
+CREATE TRIGGER listing_change_upd AFTER UPDATE ON listing REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION listing_change_from_listing();
+CREATE TRIGGER listing_change_del AFTER DELETE ON listing REFERENCING OLD TABLE AS old_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION listing_change_from_listing();
+
+DROP TRIGGER IF EXISTS listing_change_ins ON property;
+DROP TRIGGER IF EXISTS listing_change_upd ON property;
+DROP TRIGGER IF EXISTS listing_change_del ON property;
+CREATE TRIGGER listing_change_ins AFTER INSERT ON property REFERENCING NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION listing_change_from_property();
+CREATE TRIGGER listing_change_upd AFTER UPDATE ON property REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION listing_change_from_property();
+CREATE TRIGGER listing_change_del AFTER DELETE ON property REFERENCING OLD TABLE AS old_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION listing_change_from_property();
+
+DROP TRIGGER IF EXISTS listing_change_ins ON loan;
+DROP TRIGGER IF EXISTS listing_change_upd ON loan;
+DROP TRIGGER IF EXISTS listing_change_del ON loan;
+CREATE TRIGGER listing_change_ins AFTER INSERT ON loan REFERENCING NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION listing_change_from_property();
+CREATE TRIGGER listing_change_upd AFTER UPDATE ON loan REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION listing_change_from_property();
+CREATE TRIGGER listing_change_del AFTER DELETE ON loan REFERENCING OLD TABLE AS old_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION listing_change_from_property();
+
+DROP TRIGGER IF EXISTS listing_change_ins ON price_history;
+DROP TRIGGER IF EXISTS listing_change_upd ON price_history;
+DROP TRIGGER IF EXISTS listing_change_del ON price_history;
+CREATE TRIGGER listing_change_ins AFTER INSERT ON price_history REFERENCING NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION listing_change_from_price();
+CREATE TRIGGER listing_change_upd AFTER UPDATE ON price_history REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION listing_change_from_price();
+CREATE TRIGGER listing_change_del AFTER DELETE ON price_history REFERENCING OLD TABLE AS old_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION listing_change_from_price();
@@ -0,0 +1,15 @@
+-- Per-listing progress for the MLS refresher (jobs/mls/refresh.py). Work is claimed by
+-- pushing next_check_at forward, so a crashed or restarted refresher resumes with the
+-- listings that are still due and several processes never double-poll one listing.
+CREATE TABLE IF NOT EXISTS mls_refresh_state (
+    listing_id      int PRIMARY KEY REFERENCES listing ON DELETE CASCADE,
+    etag            text,
+    last_status     text,
+    last_price      numeric(12,2),
+    last_checked_at timestamptz,
+    last_changed_at timestamptz,
+    failures        int NOT NULL DEFAULT 0,
+    last_error      text,
+    next_check_at   timestamptz NOT NULL DEFAULT now()
+);
+CREATE INDEX IF NOT EXISTS mls_refresh_state_due_idx ON mls_refresh_state (next_check_at, listing_id);
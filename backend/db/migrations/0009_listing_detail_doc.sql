@@ -0,0 +1,171 @@
+-- Pre-rendered listing detail documents served by GET /api/listings/{lid}.
+--
+-- Writers never build documents themselves. Every change to a listing, its property,
+-- loan, prices, analyses or responses records the listing id in listing_detail_dirty,
+-- and a deferred constraint trigger rebuilds the dirty documents once, at commit, from
+-- the transaction's final state. A create_listing that touches five tables or an ETL
+-- run that touches thousands of listings therefore renders each document exactly once,
+-- and the document commits atomically with the rows it was built from.
+CREATE TABLE IF NOT EXISTS listing_detail_doc (
+    listing_id int PRIMARY KEY REFERENCES listing ON DELETE CASCADE,
+    doc        jsonb NOT NULL,
+    built_at   timestamptz NOT NULL DEFAULT now()
+);
+
+-- Keyed by transaction, so concurrent writers of one listing never wait on each
+-- other's dirty rows. Rows only ever live inside their own transaction.
+CREATE TABLE IF NOT EXISTS listing_detail_dirty (
+    txid       xid8 NOT NULL DEFAULT pg_current_xact_id(),
+    listing_id int NOT NULL,
+    PRIMARY KEY (txid, listing_id)
+);
+
+-- Same shape as routes/listings/helpers/schemas.py:ListingDetail. NaN numerics map to
+-- null, as _FiniteFloatModel does.
+CREATE OR REPLACE FUNCTION listing_detail_refresh(ids int[]) RETURNS void AS $$
+BEGIN
+  -- Serialize rebuilds per listing by locking its document row (a placeholder for a
+  -- new listing). The build below then runs on a fresh snapshot, taken after any
+  -- concurrent writer of the same listing has committed its own rebuild, so an older
+  -- document can never overwrite a newer one. Row locks rather than advisory locks:
+  -- an ETL run may rebuild tens of thousands of listings in one transaction.
+  INSERT INTO listing_detail_doc (listing_id, doc)
+  SELECT l.listing_id, '{}' FROM listing l WHERE l.listing_id = ANY(ids)
+  ON CONFLICT (listing_id) DO NOTHING;
+  PERFORM 1 FROM listing_detail_doc WHERE listing_id = ANY(ids) ORDER BY listing_id FOR UPDATE;
+
+  INSERT INTO listing_detail_doc (listing_id, doc, built_at)
+  SELECT l.listing_id,
+         jsonb_build_object(
+           'listing_id', l.listing_id,
+           'street', p.street, 'unit', p.unit, 'city', p.city, 'state', p.state, 'zip', p.zip,
+           'beds', p.beds, 'baths', NULLIF(p.baths, 'NaN'), 'sqft', p.sqft,
+           'hoa_amount', NULLIF(p.hoa_amount, 'NaN'), 'hoa_frequency', p.hoa_frequency,
+           'date_added', l.date_added, 'mls_link', l.mls_link, 'mls_status', l.mls_status,
+           'equity_to_cover', NULLIF(l.equity_to_cover, 'NaN'), 'sent_to_clients', l.sent_to_clients,
+           'investor_ok', NULL,
+           'realtor_name', r.name,
+           'loan_type', lo.loan_type, 'interest_rate', NULLIF(lo.interest_rate, 'NaN'),
+           'balance', NULLIF(lo.balance, 'NaN'), 'piti', NULLIF(lo.piti, 'NaN'),
+           'loan_servicer', lo.loan_servicer, 'investor_allowed', lo.investor_allowed,
+           'asking_price', NULLIF(ph_all.items -> 0 ->> 'price', 'NaN')::numeric,
+           'price_history', COALESCE(ph_all.items, '[]'::jsonb),
+           'analysis_url', la.url, 'roi_pass', la.roi_pass,
+           'done_running_numbers', la.run_complete, 'analysis_run_date', la.run_date,
+           'responses', COALESCE(resp_all.items, '[]'::jsonb)
+         ),
+         now()
+  FROM listing l
+  JOIN property p ON p.property_id = l.property_id
+  JOIN realtor  r ON r.realtor_id = l.realtor_id
+  LEFT JOIN loan lo ON lo.property_id = p.property_id
+  LEFT JOIN LATERAL (
+    SELECT a.url, a.roi_pass, a.run_complete, a.run_date
+    FROM analysis a
+    WHERE a.listing_id = l.listing_id
+    ORDER BY a.run_date DESC, a.analysis_id DESC
+    LIMIT 1
+  ) la ON TRUE
+  -- Newest first, so element 0 is the asking price: one pass over the history.
+  LEFT JOIN LATERAL (
+    SELECT jsonb_agg(jsonb_build_object(
+             'price_id', ph.price_id,
+             'effective_date', ph.effective_date,
+             'price', NULLIF(ph.price, 'NaN')
+           ) ORDER BY ph.effective_date DESC, ph.price_id DESC) AS items
+    FROM price_history ph
+    WHERE ph.listing_id = l.listing_id
+  ) ph_all ON TRUE
+  LEFT JOIN LATERAL (
+    SELECT jsonb_agg(jsonb_build_object(
+             'response_id', resp.response_id,
+             'author', resp.author,
+             'note_text', resp.note_text,
+             'created_at', resp.created_at
+           ) ORDER BY resp.created_at DESC, resp.response_id DESC) AS items
+    FROM response resp
+    WHERE resp.listing_id = l.listing_id
+  ) resp_all ON TRUE
+  WHERE l.listing_id = ANY(ids)
+  ON CONFLICT (listing_id) DO UPDATE SET doc = EXCLUDED.doc, built_at = EXCLUDED.built_at
+  WHERE listing_detail_doc.doc IS DISTINCT FROM EXCLUDED.doc;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION listing_detail_mark(ids int[]) RETURNS void AS $$
+  INSERT INTO listing_detail_dirty (listing_id)
+  SELECT DISTINCT id FROM unnest(ids) id WHERE id IS NOT NULL
+  ON CONFLICT DO NOTHING;
+$$ LANGUAGE sql;
+
+-- Fires once per dirty row at commit; the first call drains the whole transaction's
+-- set and the rest find nothing left.
+CREATE OR REPLACE FUNCTION listing_detail_flush() RETURNS trigger AS $$
+DECLARE
+  ids int[];
+BEGIN
+  WITH d AS (
+    DELETE FROM listing_detail_dirty WHERE txid = pg_current_xact_id() RETURNING listing_id
+  )
+  SELECT array_agg(DISTINCT listing_id) INTO ids FROM d;
+  IF ids IS NOT NULL THEN
+    PERFORM listing_detail_refresh(ids);
+  END IF;
+  RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS listing_detail_flush ON listing_detail_dirty;
+CREATE CONSTRAINT TRIGGER listing_detail_flush AFTER INSERT ON listing_detail_dirty
+  DEFERRABLE INITIALLY DEFERRED
+  FOR EACH ROW EXECUTE FUNCTION listing_detail_flush();
+
+-- listing, property, loan and price_history already funnel through
+-- listing_change_mark (0007); marking there covers them with no new triggers.
+-- Deleted listings need no document work: the FK cascade removes them.
+CREATE OR REPLACE FUNCTION listing_change_mark(ids int[], is_deleted boolean) RETURNS void AS $$
+  INSERT INTO listing_change (listing_id, deleted, txid, changed_at)
+  SELECT DISTINCT id, is_deleted, pg_current_xact_id(), now() FROM unnest(ids) id
+  ON CONFLICT (listing_id) DO UPDATE SET
+    deleted = EXCLUDED.deleted, txid = EXCLUDED.txid, changed_at = EXCLUDED.changed_at
+  WHERE (listing_change.deleted, listing_change.txid) IS DISTINCT FROM (EXCLUDED.deleted, EXCLUDED.txid);
+  SELECT listing_detail_mark(ids) WHERE NOT is_deleted;
+$$ LANGUAGE sql;
+
+-- Analyses and responses only feed the detail page, not the change feed.
+CREATE OR REPLACE FUNCTION listing_detail_from_child() RETURNS trigger AS $$
+BEGIN
+  IF TG_OP = 'DELETE' THEN
+    PERFORM listing_detail_mark(ARRAY(SELECT l.listing_id FROM old_rows o JOIN listing l USING (listing_id)));
+  ELSIF TG_OP = 'INSERT' THEN
+    PERFORM listing_detail_mark(ARRAY(SELECT listing_id FROM new_rows));
+  ELSE
+    PERFORM listing_detail_mark(ARRAY(
+      SELECT listing_id FROM new_rows UNION SELECT l.listing_id FROM old_rows o JOIN listing l USING (listing_id)));
+  END IF;
+  RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS listing_detail_ins ON analysis;
+DROP TRIGGER IF EXISTS listing_detail_upd ON analysis;
+DROP TRIGGER IF EXISTS listing_detail_del ON analysis;
+CREATE TRIGGER listing_detail_ins AFTER INSERT ON analysis REFERENCING NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION listing_detail_from_child();
+CREATE TRIGGER listing_detail_upd AFTER UPDATE ON analysis REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION listing_detail_from_child();
+CREATE TRIGGER listing_detail_del AFTER DELETE ON analysis REFERENCING OLD TABLE AS old_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION listing_detail_from_child();
+
+DROP TRIGGER IF EXISTS listing_detail_ins ON response;
+DROP TRIGGER IF EXISTS listing_detail_upd ON response;
+DROP TRIGGER IF EXISTS listing_detail_del ON response;
+CREATE TRIGGER listing_detail_ins AFTER INSERT ON response REFERENCING NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION listing_detail_from_child();
+CREATE TRIGGER listing_detail_upd AFTER UPDATE ON response REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION listing_detail_from_child();
+CREATE TRIGGER listing_detail_del AFTER DELETE ON response REFERENCING OLD TABLE AS old_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION listing_detail_from_child();
+
+-- Backfill. The API falls back to the live query for any listing without a document.
+SELECT listing_detail_refresh(ARRAY(SELECT listing_id FROM listing));
@@ -0,0 +1,24 @@
+-- Spreadsheet imports started from POST /api/imports. The API writes the upload to
+-- disk and inserts a queued row; the ETL subprocess (`--job-id`) moves it through
+-- running -> done/failed and reports progress here as it goes.
+CREATE TABLE IF NOT EXISTS import_job (
+    job_id           bigserial PRIMARY KEY,
+    filename         text NOT NULL,
+    path             text NOT NULL,
+    sheet            text,
+    status           text NOT NULL DEFAULT 'queued'
+        CHECK (status IN ('queued', 'running', 'done', 'failed')),
+    rows_total       int,
+    rows_done        int NOT NULL DEFAULT 0,
+    rows_failed      int NOT NULL DEFAULT 0,
+    geocode_enqueued int NOT NULL DEFAULT 0,
+    errors           jsonb NOT NULL DEFAULT '[]',
+    result           jsonb,
+    last_error       text,
+    pid              int,
+    created_at       timestamptz NOT NULL DEFAULT now(),
+    started_at       timestamptz,
+    finished_at      timestamptz,
+    updated_at       timestamptz NOT NULL DEFAULT now()
+);
+CREATE INDEX IF NOT EXISTS import_job_active_idx ON import_job (created_at) WHERE status IN ('queued', 'running');
@@ -0,0 +1,23 @@
+-- Saved searches (filters in the GET /api/listings vocabulary, services/filters.py)
+-- and their match inbox, filled incrementally by jobs/saved_searches/matcher.py.
+CREATE TABLE IF NOT EXISTS saved_search (
+    search_id  serial PRIMARY KEY,
+    name       text NOT NULL,
+    filters    jsonb NOT NULL DEFAULT '{}',
+    created_at timestamptz NOT NULL DEFAULT now(),
+    updated_at timestamptz NOT NULL DEFAULT now()
+);
+
+-- One row per (search, listing) the first time the listing matches. Rows present
+-- when a search is created are recorded as already seen, so the inbox only alerts
+-- on listings that start matching afterwards.
+CREATE TABLE IF NOT EXISTS saved_search_match (
+    search_id  int NOT NULL REFERENCES saved_search ON DELETE CASCADE,
+    listing_id int NOT NULL REFERENCES listing ON DELETE CASCADE,
+    matched_at timestamptz NOT NULL DEFAULT now(),
+    seen       boolean NOT NULL DEFAULT false,
+    PRIMARY KEY (search_id, listing_id)
+);
+CREATE INDEX IF NOT EXISTS saved_search_match_inbox_idx
+    ON saved_search_match (search_id, matched_at DESC) WHERE NOT seen;
+CREATE INDEX IF NOT EXISTS saved_search_match_listing_idx ON saved_search_match (listing_id);
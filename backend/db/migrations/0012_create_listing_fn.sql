@@ -0,0 +1,135 @@
+-- POST /api/listings in one round trip: every write create_listing used to issue as
+-- a separate statement now runs inside create_listing_v1(), with the same upsert and
+-- COALESCE semantics. Versioned by name so a changed document shape gets a _v2
+-- alongside, and API processes still running the old code keep working mid-deploy.
+
+-- Client retries carrying the same Idempotency-Key return the first result instead of
+-- writing again. Keys are kept for a day.
+CREATE TABLE IF NOT EXISTS listing_idempotency (
+    idempotency_key text PRIMARY KEY,
+    request_hash    text,
+    listing_id      int,
+    geocode         text,
+    created_at      timestamptz NOT NULL DEFAULT now()
+);
+CREATE INDEX IF NOT EXISTS listing_idempotency_created_idx ON listing_idempotency (created_at);
+
+-- `p_doc` is built by routes/listings/helpers/functions.py:listing_create_doc(), which
+-- does the trimming/defaulting, address_key and mls_id extraction in Python.
+-- Returns the listing id and geocode status; `replayed` is true when p_key was seen
+-- before, with the request_hash recorded for it so the caller can reject a key reused
+-- for a different body.
+CREATE OR REPLACE FUNCTION create_listing_v1(p_doc jsonb, p_key text DEFAULT NULL, p_hash text DEFAULT NULL)
+RETURNS TABLE (listing_id int, geocode text, replayed boolean, request_hash text)
+LANGUAGE plpgsql AS $$
+#variable_conflict use_column
+DECLARE
+    v_realtor  int;
+    v_property int;
+    v_listing  int;
+    v_geocode  text;
+    v_lat      double precision;
+    v_lon      double precision;
+    v_prior    listing_idempotency%ROWTYPE;
+BEGIN
+    IF p_key IS NOT NULL THEN
+        DELETE FROM listing_idempotency WHERE created_at < now() - interval '1 day';
+        -- A concurrent request with the same key blocks here until the first commits.
+        INSERT INTO listing_idempotency (idempotency_key, request_hash)
+        VALUES (p_key, p_hash)
+        ON CONFLICT (idempotency_key) DO NOTHING;
+        IF NOT FOUND THEN
+            SELECT * INTO v_prior FROM listing_idempotency WHERE idempotency_key = p_key;
+            RETURN QUERY SELECT v_prior.listing_id, v_prior.geocode, true, v_prior.request_hash;
+            RETURN;
+        END IF;
+    END IF;
+
+    INSERT INTO realtor (name)
+    VALUES (p_doc->>'realtor_name')
+    ON CONFLICT (name) DO UPDATE SET name = EXCLUDED.name
+    RETURNING realtor_id INTO v_realtor;
+
+    INSERT INTO property (street, unit, city, state, zip, address_key, beds, baths, sqft, hoa_amount, hoa_frequency)
+    VALUES (p_doc->>'street', p_doc->>'unit', p_doc->>'city', p_doc->>'state', p_doc->>'zip', p_doc->>'address_key',
+            (p_doc->>'beds')::smallint, (p_doc->>'baths')::numeric, (p_doc->>'sqft')::int,
+            (p_doc->>'hoa_amount')::numeric, p_doc->>'hoa_frequency')
+    ON CONFLICT (address_key)
+    DO UPDATE SET
+      beds = COALESCE(EXCLUDED.beds, property.beds),
+      baths = COALESCE(EXCLUDED.baths, property.baths),
+      sqft = COALESCE(EXCLUDED.sqft, property.sqft),
+      hoa_amount = COALESCE(EXCLUDED.hoa_amount, property.hoa_amount),
+      hoa_frequency = COALESCE(EXCLUDED.hoa_frequency, property.hoa_frequency)
+    RETURNING property_id INTO v_property;
+
+    -- Same as jobs/geocode/sql.py:ENQUEUE_SQL; keep the two in step.
+    INSERT INTO geocode_job (address_key, street, unit, city, state, zip, property_ids)
+    VALUES (p_doc->>'address_key', p_doc->>'street', p_doc->>'unit', p_doc->>'city', p_doc->>'state', p_doc->>'zip',
+            ARRAY[v_property])
+    ON CONFLICT (address_key) DO UPDATE SET
+      property_ids = CASE WHEN v_property = ANY(geocode_job.property_ids)
+                          THEN geocode_job.property_ids
+                          ELSE geocode_job.property_ids || v_property END,
+      status      = CASE WHEN geocode_job.status = 'failed' THEN 'pending' ELSE geocode_job.status END,
+      attempts    = CASE WHEN geocode_job.status = 'failed' THEN 0 ELSE geocode_job.attempts END,
+      run_after   = CASE WHEN geocode_job.status = 'failed' THEN now() ELSE geocode_job.run_after END,
+      enqueued_at = CASE WHEN geocode_job.status = 'failed' THEN now() ELSE geocode_job.enqueued_at END
+    RETURNING status, latitude, longitude INTO v_geocode, v_lat, v_lon;
+    IF v_geocode = 'done' THEN
+        UPDATE property
+           SET latitude = v_lat, longitude = v_lon
+         WHERE property_id = v_property
+           AND (latitude IS DISTINCT FROM v_lat OR longitude IS DISTINCT FROM v_lon);
+    END IF;
+
+    INSERT INTO listing (property_id, realtor_id, date_added, mls_id, mls_link, mls_status, equity_to_cover, sent_to_clients)
+    VALUES (v_property, v_realtor, COALESCE((p_doc->>'date_added')::date, CURRENT_DATE), p_doc->>'mls_id',
+            p_doc->>'mls_link', p_doc->>'mls_status', (p_doc->>'equity_to_cover')::numeric,
+            (p_doc->>'sent_to_clients')::boolean)
+    ON CONFLICT ON CONSTRAINT listing_prop_realtor_link_unique
+    DO UPDATE SET
+        date_added = COALESCE(EXCLUDED.date_added, listing.date_added),
+        mls_id = COALESCE(EXCLUDED.mls_id, listing.mls_id),
+        mls_status = COALESCE(EXCLUDED.mls_status, listing.mls_status),
+        equity_to_cover = COALESCE(EXCLUDED.equity_to_cover, listing.equity_to_cover),
+        sent_to_clients = COALESCE(EXCLUDED.sent_to_clients, listing.sent_to_clients)
+    RETURNING listing_id INTO v_listing;
+
+    IF p_doc->>'asking_price' IS NOT NULL THEN
+        INSERT INTO price_history (listing_id, effective_date, price)
+        VALUES (v_listing, COALESCE((p_doc->>'date_added')::date, CURRENT_DATE), (p_doc->>'asking_price')::numeric);
+    END IF;
+
+    INSERT INTO loan (property_id, loan_type, interest_rate, balance, piti, loan_servicer, investor_allowed)
+    VALUES (v_property, p_doc->>'loan_type', (p_doc->>'interest_rate')::numeric, (p_doc->>'balance')::numeric,
+            (p_doc->>'piti')::numeric, p_doc->>'loan_servicer', (p_doc->>'investor_allowed')::boolean)
+    ON CONFLICT (property_id) DO UPDATE SET
+      loan_type = EXCLUDED.loan_type,
+      interest_rate = EXCLUDED.interest_rate,
+      balance = EXCLUDED.balance,
+      piti = EXCLUDED.piti,
+      loan_servicer = EXCLUDED.loan_servicer,
+      investor_allowed = EXCLUDED.investor_allowed;
+
+    IF jsonb_typeof(p_doc->'analysis') = 'object' THEN
+        INSERT INTO analysis (listing_id, url, roi_pass, run_complete)
+        VALUES (v_listing, p_doc->'analysis'->>'url', (p_doc->'analysis'->>'roi_pass')::boolean,
+                (p_doc->'analysis'->>'run_complete')::boolean);
+    END IF;
+
+    INSERT INTO response (listing_id, author, note_text)
+    SELECT v_listing, n->>'author', n->>'note_text'
+    FROM jsonb_array_elements(COALESCE(p_doc->'notes', '[]')) AS n;
+
+    INSERT INTO analytics_dirty DEFAULT VALUES;
+
+    IF p_key IS NOT NULL THEN
+        UPDATE listing_idempotency
+           SET listing_id = v_listing, geocode = v_geocode
+         WHERE idempotency_key = p_key;
+    END IF;
+
+    RETURN QUERY SELECT v_listing, v_geocode, false, p_hash;
+END
+$$;
@@ -0,0 +1,17 @@
+-- NOTIFY listing_summary on every change the change feed records, so each API
+-- process can patch its in-memory listing snapshot (services/listing_snapshot.py).
+-- Notifications are delivered at commit. The payload is 'u:<ids>' or 'd:<ids>'
+-- (comma-separated), or 'bulk' above 500 ids, which makes listeners reload in full
+-- and keeps the payload well under the 8000-byte limit.
+CREATE OR REPLACE FUNCTION listing_change_mark(ids int[], is_deleted boolean) RETURNS void AS $$
+  INSERT INTO listing_change (listing_id, deleted, txid, changed_at)
+  SELECT DISTINCT id, is_deleted, pg_current_xact_id(), now() FROM unnest(ids) id
+  ON CONFLICT (listing_id) DO UPDATE SET
+    deleted = EXCLUDED.deleted, txid = EXCLUDED.txid, changed_at = EXCLUDED.changed_at
+  WHERE (listing_change.deleted, listing_change.txid) IS DISTINCT FROM (EXCLUDED.deleted, EXCLUDED.txid);
+  SELECT listing_detail_mark(ids) WHERE NOT is_deleted;
+  SELECT pg_notify('listing_summary',
+                   CASE WHEN cardinality(ids) > 500 THEN 'bulk'
+                        ELSE CASE WHEN is_deleted THEN 'd:' ELSE 'u:' END || array_to_string(ids, ',') END)
+  WHERE cardinality(ids) > 0;
+$$ LANGUAGE sql;
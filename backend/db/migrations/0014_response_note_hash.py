@@ -0,0 +1,38 @@
+"""
+response.note_hash (author + normalized note text) with a unique (listing_id, note_hash)
+index, so the ETL and create_listing can insert notes only when they are new.
+Existing duplicates are removed first by jobs/compact_responses.py, in batches that
+commit on their own; the index is then built CONCURRENTLY.
+"""
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+
+from db.migrate import log
+from jobs.compact_responses import compact, note_hash_sql
+
+TRANSACTIONAL = False
+
+def upgrade(conn):
+    conn.execute(text(
+        f"ALTER TABLE response ADD COLUMN IF NOT EXISTS note_hash text GENERATED ALWAYS AS ({note_hash_sql()}) STORED"
+    ))
+    # An interrupted earlier attempt leaves an invalid index that IF NOT EXISTS would keep.
+    conn.execute(text("""
+        DO $$ BEGIN
+          IF EXISTS (SELECT 1 FROM pg_index WHERE indexrelid = to_regclass('response_note_uidx') AND NOT indisvalid) THEN
+            DROP INDEX response_note_uidx;
+          END IF;
+        END $$
+    """))
+    # Writers still on the old code can add a duplicate between compaction and the
+    # index build; the build then fails, so compact again and retry.
+    for attempt in range(3):
+        log.info("  response compaction: %s", compact(conn))
+        try:
+            conn.execute(text(
+                "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS response_note_uidx ON response (listing_id, note_hash)"
+            ))
+            return
+        except IntegrityError:
+            conn.execute(text("DROP INDEX CONCURRENTLY IF EXISTS response_note_uidx"))
+    raise RuntimeError("response duplicates keep reappearing; stop writers and re-run migrations")
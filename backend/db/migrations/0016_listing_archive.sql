@@ -0,0 +1,48 @@
+-- Archive tables for listings that reached a terminal MLS status (jobs/archive.py
+-- moves them), and ensure_year_partitions() for the yearly history partitions.
+--
+-- Only cheap DDL here, so it runs with the automatic migrations at startup. The
+-- conversion of price_history and analysis to partitioned tables copies every row
+-- and lives in 0019, which runs out of band.
+
+-- Creates `<parent>_y<year>` for each year not already covered.
+CREATE OR REPLACE FUNCTION ensure_year_partitions(parent text, years int[]) RETURNS int AS $$
+DECLARE
+  y int;
+  made int := 0;
+BEGIN
+  -- Nothing to do until 0019 has partitioned the parent.
+  IF NOT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(parent)) THEN
+    RETURN 0;
+  END IF;
+  FOR y IN SELECT DISTINCT unnest(years) LOOP
+    IF to_regclass(format('%s_y%s', parent, y)) IS NULL THEN
+      BEGIN
+        EXECUTE format('CREATE TABLE %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+                       format('%s_y%s', parent, y), parent, make_date(y, 1, 1), make_date(y + 1, 1, 1));
+        made := made + 1;
+      EXCEPTION WHEN check_violation THEN
+        -- The DEFAULT partition already holds rows for that year; they stay there.
+        RAISE WARNING 'not creating %_y%: rows for that year are in the default partition', parent, y;
+      END;
+    END IF;
+  END LOOP;
+  RETURN made;
+END
+$$ LANGUAGE plpgsql;
+
+-- Archive: same columns as the live tables (generated ones stored as plain values),
+-- no triggers, no foreign keys. Properties, loans and realtors are shared and stay put.
+CREATE TABLE IF NOT EXISTS listing_archive (LIKE listing, archived_at timestamptz NOT NULL DEFAULT now());
+ALTER TABLE listing_archive ADD PRIMARY KEY (listing_id);
+CREATE INDEX IF NOT EXISTS listing_archive_property_idx ON listing_archive (property_id);
+
+CREATE TABLE IF NOT EXISTS price_history_archive (LIKE price_history);
+CREATE INDEX IF NOT EXISTS price_history_archive_listing_idx
+    ON price_history_archive (listing_id, effective_date DESC, price_id DESC) INCLUDE (price);
+
+CREATE TABLE IF NOT EXISTS analysis_archive (LIKE analysis);
+CREATE INDEX IF NOT EXISTS analysis_archive_listing_idx ON analysis_archive (listing_id, run_date DESC, analysis_id DESC);
+
+CREATE TABLE IF NOT EXISTS response_archive (LIKE response);
+CREATE INDEX IF NOT EXISTS response_archive_listing_idx ON response_archive (listing_id, created_at DESC, response_id DESC);
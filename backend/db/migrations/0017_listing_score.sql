@@ -0,0 +1,22 @@
+-- Precomputed deal score (services/deal_score.py) behind GET /api/listings/top.
+-- jobs/deal_score.py fills it in batch and keeps it current from the listing event
+-- stream. Listings in a terminal MLS status have no row.
+--
+-- Both indexes carry every column the endpoint returns, so a top-N request is an
+-- index-only scan that stops after n entries. Unchanged scores are never
+-- rewritten, which keeps the visibility map mostly all-visible between vacuums.
+CREATE TABLE IF NOT EXISTS listing_score (
+    listing_id    int PRIMARY KEY REFERENCES listing ON DELETE CASCADE,
+    score         real NOT NULL,
+    loan_type     text,
+    rate_spread   real,
+    equity_share  real,
+    payment_ratio real,
+    params_hash   text NOT NULL,
+    computed_at   timestamptz NOT NULL DEFAULT now()
+);
+CREATE INDEX IF NOT EXISTS listing_score_top_idx
+    ON listing_score (score DESC, listing_id) INCLUDE (loan_type, rate_spread, equity_share, payment_ratio);
+CREATE INDEX IF NOT EXISTS listing_score_type_top_idx
+    ON listing_score (loan_type, score DESC, listing_id) INCLUDE (rate_spread, equity_share, payment_ratio);
+ALTER TABLE listing_score SET (autovacuum_vacuum_scale_factor = 0.05);
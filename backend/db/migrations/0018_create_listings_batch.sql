@@ -0,0 +1,40 @@
+-- create_listings_v1(): several create_listing_v1() calls in one statement and one
+-- transaction, for the API's create coalescer (services/create_coalescer.py).
+-- A batch of N concurrent POST /api/listings then costs one round trip and one
+-- commit (one WAL flush) instead of N. Repeated realtor/property upserts inside
+-- the batch touch rows this transaction already holds, so they do not wait on
+-- each other.
+--
+-- Each document runs in its own exception block (a subtransaction): a document
+-- that fails is rolled back alone and reported in `error`, and the rest of the
+-- batch still commits. `ord` is the document's 1-based position in p_docs.
+--
+-- Documents are applied in (realtor_name, address_key) order, not arrival order,
+-- and the realtor/property row locks are held until the batch commits, so two
+-- batches touching the same rows take their locks in the same order. A deadlock
+-- that still happens is not a fault of one document: it aborts the whole batch,
+-- which the caller retries.
+CREATE OR REPLACE FUNCTION create_listings_v1(p_docs jsonb[], p_keys text[], p_hashes text[])
+RETURNS TABLE (ord int, listing_id int, geocode text, replayed boolean, request_hash text, error text)
+LANGUAGE plpgsql AS $$
+#variable_conflict use_column
+DECLARE
+    i int;
+BEGIN
+    FOR i IN
+        SELECT d.n::int FROM unnest(p_docs) WITH ORDINALITY d(doc, n)
+        ORDER BY d.doc->>'realtor_name', d.doc->>'address_key', d.n
+    LOOP
+        BEGIN
+            RETURN QUERY
+            SELECT i, c.listing_id, c.geocode, c.replayed, c.request_hash, NULL::text
+            FROM create_listing_v1(p_docs[i], p_keys[i], p_hashes[i]) c;
+        EXCEPTION
+            WHEN deadlock_detected THEN
+                RAISE;
+            WHEN OTHERS THEN
+                RETURN QUERY SELECT i, NULL::int, NULL::text, NULL::boolean, NULL::text, SQLERRM;
+        END;
+    END LOOP;
+END
+$$;
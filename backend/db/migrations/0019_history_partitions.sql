@@ -0,0 +1,79 @@
+-- migrate: out-of-band
+-- Yearly range partitions for the append-only history tables.
+--
+-- NOT applied by the automatic migrations at API/ETL startup. Run it in a
+-- maintenance window:
+--
+--     python -m db.migrate --out-of-band
+--
+-- Lock time: one transaction holds ACCESS EXCLUSIVE on price_history and analysis
+-- from the first RENAME to COMMIT, so every read and write of those tables (list,
+-- detail, create, ETL) waits for the whole migration. The migration copies every
+-- row, builds the indexes on the new parents and validates the foreign keys (which
+-- also takes SHARE ROW EXCLUSIVE on listing, blocking listing writes). Expect it to
+-- take about as long as a full INSERT ... SELECT of both tables plus their index
+-- builds, which is seconds per million rows on typical hardware. Time it on a
+-- restored copy first.
+--
+-- price_history is partitioned on effective_date and analysis on run_date. Rows with
+-- a NULL or out-of-range key land in the DEFAULT partition; jobs/archive.py creates
+-- next year's partition ahead of time (ensure_year_partitions, 0016). response stays
+-- a plain table: its (listing_id, note_hash) uniqueness (0014) must hold across all of
+-- a listing's notes, and a partitioned unique index would have to include the time
+-- column.
+--
+-- The partitioned parents replace the old tables in place. Their primary keys
+-- become plain indexes, since a partitioned primary key must include the partition
+-- column; ids still come from the original sequences. The triggers from 0007/0009
+-- are recreated on the parents. Statement-level triggers see the transition rows
+-- of every affected partition.
+
+-- price_history
+ALTER TABLE price_history RENAME TO price_history_unpartitioned;
+CREATE TABLE price_history (LIKE price_history_unpartitioned INCLUDING DEFAULTS) PARTITION BY RANGE (effective_date);
+CREATE TABLE price_history_default PARTITION OF price_history DEFAULT;
+SELECT ensure_year_partitions('price_history', ARRAY(
+  SELECT DISTINCT extract(year FROM effective_date)::int FROM price_history_unpartitioned WHERE effective_date IS NOT NULL
+) || ARRAY[extract(year FROM current_date)::int, extract(year FROM current_date)::int + 1]);
+INSERT INTO price_history SELECT * FROM price_history_unpartitioned;
+ALTER SEQUENCE price_history_price_id_seq OWNED BY price_history.price_id;
+DROP TABLE price_history_unpartitioned;
+
+ALTER TABLE price_history ADD CONSTRAINT price_history_listing_id_fkey
+  FOREIGN KEY (listing_id) REFERENCES listing ON DELETE CASCADE;
+CREATE INDEX price_history_price_id_idx ON price_history (price_id);
+CREATE INDEX price_history_listing_date_idx
+    ON price_history (listing_id, effective_date DESC, price_id DESC) INCLUDE (price);
+
+CREATE TRIGGER price_history_touch BEFORE UPDATE ON price_history
+  FOR EACH ROW EXECUTE FUNCTION touch_row();
+CREATE TRIGGER listing_change_ins AFTER INSERT ON price_history REFERENCING NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION listing_change_from_price();
+CREATE TRIGGER listing_change_upd AFTER UPDATE ON price_history REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION listing_change_from_price();
+CREATE TRIGGER listing_change_del AFTER DELETE ON price_history REFERENCING OLD TABLE AS old_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION listing_change_from_price();
+
+-- analysis (url_norm stays generated)
+ALTER TABLE analysis RENAME TO analysis_unpartitioned;
+CREATE TABLE analysis (LIKE analysis_unpartitioned INCLUDING DEFAULTS INCLUDING GENERATED) PARTITION BY RANGE (run_date);
+CREATE TABLE analysis_default PARTITION OF analysis DEFAULT;
+SELECT ensure_year_partitions('analysis', ARRAY(
+  SELECT DISTINCT extract(year FROM run_date)::int FROM analysis_unpartitioned WHERE run_date IS NOT NULL
+) || ARRAY[extract(year FROM current_date)::int, extract(year FROM current_date)::int + 1]);
+INSERT INTO analysis (analysis_id, listing_id, run_date, url, roi_category, roi_pass, run_complete)
+SELECT analysis_id, listing_id, run_date, url, roi_category, roi_pass, run_complete FROM analysis_unpartitioned;
+ALTER SEQUENCE analysis_analysis_id_seq OWNED BY analysis.analysis_id;
+DROP TABLE analysis_unpartitioned;
+
+ALTER TABLE analysis ADD CONSTRAINT analysis_listing_id_fkey
+  FOREIGN KEY (listing_id) REFERENCES listing ON DELETE CASCADE;
+CREATE INDEX analysis_analysis_id_idx ON analysis (analysis_id);
+CREATE INDEX analysis_listing_run_date_idx ON analysis (listing_id, run_date DESC, analysis_id DESC);
+
+CREATE TRIGGER listing_detail_ins AFTER INSERT ON analysis REFERENCING NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION listing_detail_from_child();
+CREATE TRIGGER listing_detail_upd AFTER UPDATE ON analysis REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION listing_detail_from_child();
+CREATE TRIGGER listing_detail_del AFTER DELETE ON analysis REFERENCING OLD TABLE AS old_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION listing_detail_from_child();
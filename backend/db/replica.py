@@ -0,0 +1,162 @@
+"""
+Read-replica routing for GET endpoints.
+
+`ReplicaMonitor` polls the replica's replay LSN against the primary's current WAL
+LSN. The replica serves reads only while it is reachable and within
+REPLICA_MAX_LAG_BYTES; otherwise reads fall back to the primary.
+
+Read-your-writes: a request that committed on the primary gets the primary's WAL
+LSN back in the `rw_lsn` cookie (ReadYourWritesMiddleware). Until the replica has
+replayed past that LSN, or the cookie expires, that client's reads stay on the
+primary, so a listing it just created never disappears on the next page load.
+The listings list uses the same cookie to bypass its in-process snapshot.
+"""
+from __future__ import annotations
+import asyncio, logging, os
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from observability.metrics import REPLICA_HEALTHY, REPLICA_LAG_BYTES
+
+log = logging.getLogger(__name__)
+
+LSN_COOKIE = "rw_lsn"
+STICKY_SECONDS = int(os.getenv("READ_YOUR_WRITES_SECONDS", "30"))
+MAX_LAG_BYTES = int(os.getenv("REPLICA_MAX_LAG_BYTES", str(16 * 1024 * 1024)))
+CHECK_SECONDS = float(os.getenv("REPLICA_CHECK_SECONDS", "1"))
+# Cookie value when the LSN is unknown: no replica position satisfies it, so the
+# client simply reads from the primary until the cookie expires.
+_PIN_TO_PRIMARY = "FFFFFFFF/FFFFFFFF"
+
+PRIMARY_LSN_SQL = text("SELECT pg_current_wal_lsn()::text")
+# NULL replay LSN means the server is not in recovery (e.g. pointed at the primary
+# itself in development); its own WAL position is then authoritative.
+REPLICA_LSN_SQL = text("""
+SELECT CASE WHEN pg_is_in_recovery() THEN pg_last_wal_replay_lsn() ELSE pg_current_wal_lsn() END::text
+""")
+
+def parse_lsn(value: Optional[str]) -> Optional[int]:
+    """'16/B374D848' -> byte position; None for anything malformed."""
+    try:
+        hi, lo = value.split("/")
+        return (int(hi, 16) << 32) | int(lo, 16)
+    except (AttributeError, ValueError):
+        return None
+
+# Per-request flag set when a primary session commits; see note_commit().
+_request_state: ContextVar[Optional[dict]] = ContextVar("request_state", default=None)
+
+def note_commit():
+    state = _request_state.get()
+    if state is not None:
+        state["wrote"] = True
+
+class ReplicaMonitor:
+    def __init__(self, max_lag_bytes: int = MAX_LAG_BYTES, interval: float = CHECK_SECONDS):
+        self.max_lag_bytes = max_lag_bytes
+        self.interval = interval
+        self.primary: Optional[AsyncEngine] = None
+        self.replica: Optional[AsyncEngine] = None
+        self.healthy = False
+        self.replay_lsn: Optional[int] = None
+        self.lag_bytes: Optional[int] = None
+        self.fallbacks = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self, primary: AsyncEngine, replica: Optional[AsyncEngine]):
+        if replica is not None and self._task is None:
+            self.primary, self.replica = primary, replica
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        self.healthy = False
+
+    def can_serve(self, min_lsn: Optional[str]) -> bool:
+        if not self.healthy:
+            return False
+        needed = parse_lsn(min_lsn) if min_lsn else None
+        return needed is None or (self.replay_lsn is not None and self.replay_lsn >= needed)
+
+    def mark_down(self):
+        """A replica checkout failed: stop routing to it until the next good check."""
+        self.healthy = False
+        self.fallbacks += 1
+        REPLICA_HEALTHY.set(0)
+
+    def stats(self) -> dict:
+        return {
+            "configured": self.replica is not None,
+            "healthy": self.healthy,
+            "lag_bytes": self.lag_bytes,
+            "max_lag_bytes": self.max_lag_bytes,
+            "fallbacks": self.fallbacks,
+        }
+
+    async def check(self):
+        async with self.replica.connect() as rc:
+            replay = parse_lsn((await rc.execute(REPLICA_LSN_SQL)).scalar_one())
+        async with self.primary.connect() as pc:
+            current = parse_lsn((await pc.execute(PRIMARY_LSN_SQL)).scalar_one())
+        self.replay_lsn = replay
+        self.lag_bytes = max(0, current - replay) if None not in (current, replay) else None
+        self.healthy = self.lag_bytes is not None and self.lag_bytes <= self.max_lag_bytes
+        REPLICA_LAG_BYTES.set(self.lag_bytes if self.lag_bytes is not None else -1)
+        REPLICA_HEALTHY.set(1 if self.healthy else 0)
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self.check(), timeout=max(2.0, self.interval * 2))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if self.healthy:
+                    log.warning("replica check failed, reading from primary: %s", e)
+                self.healthy = False
+                REPLICA_HEALTHY.set(0)
+            await asyncio.sleep(self.interval)
+
+class ReadYourWritesMiddleware:
+    """
+    Pure ASGI middleware. When the request committed on the primary, the response
+    carries the primary's WAL LSN as a short-lived cookie that pins the client's
+    reads to the primary until the replica has caught up to it.
+    """
+    def __init__(self, app, engine: AsyncEngine, enabled: bool = True):
+        self.app = app
+        self.engine = engine
+        self.enabled = enabled
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        state = {"wrote": False}
+        token = _request_state.set(state)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and state["wrote"]:
+                try:
+                    async with self.engine.connect() as conn:
+                        lsn = (await conn.execute(PRIMARY_LSN_SQL)).scalar_one()
+                except Exception:
+                    log.exception("could not read the primary WAL LSN")
+                    lsn = _PIN_TO_PRIMARY
+                cookie = f"{LSN_COOKIE}={lsn}; Max-Age={STICKY_SECONDS}; Path=/; HttpOnly; SameSite=Lax"
+                message = {**message, "headers": [*message.get("headers", []), (b"set-cookie", cookie.encode())]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_state.reset(token)
+
+replica_monitor = ReplicaMonitor()
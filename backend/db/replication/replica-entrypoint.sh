@@ -0,0 +1,13 @@
+#!/bin/sh
+# Hot standby for local testing (docker compose --profile replica up db-replica).
+# Clones the primary on first start; after that Postgres resumes streaming on its own.
+set -e
+export PGPASSWORD="$POSTGRES_PASSWORD"
+until pg_isready -h db -U "$POSTGRES_USER" -q; do sleep 1; done
+if [ ! -s "$PGDATA/PG_VERSION" ]; then
+  mkdir -p "$PGDATA"
+  chown postgres:postgres "$PGDATA"
+  chmod 700 "$PGDATA"
+  gosu postgres pg_basebackup -h db -U "$POSTGRES_USER" -D "$PGDATA" -R -X stream -P
+fi
+exec docker-entrypoint.sh postgres
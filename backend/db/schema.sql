@@ -70,4 +70,24 @@ CREATE TABLE IF NOT EXISTS response (
     author      text,
     note_text   text,
     created_at  timestamptz default now()
-);
\ No newline at end of file
+);
+
+-- Geocode job queue (claimed with FOR UPDATE SKIP LOCKED)
+CREATE TABLE IF NOT EXISTS geocode_job (
+    job_id       bigserial PRIMARY KEY,
+    address_key  text NOT NULL UNIQUE,
+    street text, unit text, city text, state char(2), zip text,
+    property_ids int[] NOT NULL DEFAULT '{}',
+    status       text NOT NULL DEFAULT 'pending'
+        CHECK (status IN ('pending','running','done','failed')),
+    attempts     smallint NOT NULL DEFAULT 0,
+    run_after    timestamptz NOT NULL DEFAULT now(),
+    enqueued_at  timestamptz NOT NULL DEFAULT now(),
+    started_at   timestamptz,
+    finished_at  timestamptz,
+    latitude double precision, longitude double precision,
+    last_error   text
+);
+
+CREATE INDEX IF NOT EXISTS geocode_job_ready_idx
+    ON geocode_job (run_after, job_id) WHERE status IN ('pending','running');
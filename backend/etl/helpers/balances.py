@@ -2,6 +2,7 @@ from sqlalchemy import text
 
 from .type_conversion import to_decimal
 from .address import parse_address
+from services.address import address_key
 
 def backfill_balances_pass(conn, df, col_addr, col_bal, dry_run=False):
     if not col_addr or not col_bal:
@@ -20,14 +21,8 @@ def backfill_balances_pass(conn, df, col_addr, col_bal, dry_run=False):
             skipped += 1
             continue
 
-        pid = conn.execute(text("""
-            SELECT property_id FROM property
-             WHERE COALESCE(street,'') = COALESCE(:street,'')
-               AND COALESCE(unit,'')   = COALESCE(:unit,'')
-               AND COALESCE(city,'')   = COALESCE(:city,'')
-               AND COALESCE(state,'')  = COALESCE(:state,'')
-               AND COALESCE(zip,'')    = COALESCE(:zip,'')
-        """), {"street": street, "unit": unit, "city": city, "state": state, "zip": zip_code}).scalar()
+        pid = conn.execute(text("SELECT property_id FROM property WHERE address_key = :key"),
+                           {"key": address_key(street, unit, city, state, zip_code)}).scalar()
         if pid is None:
             skipped += 1
             continue
@@ -1,7 +1,14 @@
 import os, time
 import httpx
 
+from services.geo_index import POINTER, GeoIndex
+
 GOOGLE_MAPS_KEY = os.getenv("GOOGLE_MAPS_KEY")
+GEOCODER_INDEX = os.getenv("GEOCODER_INDEX")
+LOCAL_ACCEPT = int(os.getenv("GEOCODER_LOCAL_ACCEPT", "3"))
+LOCAL_MIN_SCORE = int(os.getenv("GEOCODER_LOCAL_MIN_SCORE", "1"))
+
+_index: GeoIndex | None = None
 
 def _geo_score(result: dict) -> int:
     t = (result.get("geometry", {}).get("location_type") or "APPROXIMATE").upper()
@@ -10,15 +17,25 @@ def _geo_score(result: dict) -> int:
     bonus = 1 if "street_address" in (result.get("types") or []) else 0
     return loc + partial + bonus
 
-def geocode_address_sync(client: httpx.Client, street: str, city: str, state: str, zip_code: str, unit: str | None = None):
+def _local_index() -> GeoIndex | None:
+    global _index
+    if _index is None and GEOCODER_INDEX and os.path.exists(os.path.join(GEOCODER_INDEX, POINTER)):
+        _index = GeoIndex(GEOCODER_INDEX)
+    return _index
+
+def local_geocode(street: str, zip_code: str):
     """
-    Returns (lat, lon) or None.
+    Returns ((lat, lon), score) from the offline index, or None.
     """
-    if not GOOGLE_MAPS_KEY:
-        return None
-    if not (street and city and state and zip_code):
+    index = _local_index()
+    candidates = index.candidates(street, zip_code) if index is not None else []
+    if not candidates:
         return None
+    best = max(candidates, key=_geo_score)
+    loc = best["geometry"]["location"]
+    return (loc["lat"], loc["lng"]), _geo_score(best)
 
+def _google_sync(client: httpx.Client, street: str, city: str, state: str, zip_code: str, unit: str | None):
     line1 = f"{street}{(' ' + unit) if unit else ''}"
     params = {
         "address": f"{line1}, {city}, {state} {zip_code}, USA",
@@ -43,6 +60,29 @@ def geocode_address_sync(client: httpx.Client, street: str, city: str, state: st
         return float(lat), float(lng)
     return None
 
+def geocode_address_sync(client: httpx.Client, street: str, city: str, state: str, zip_code: str,
+                         unit: str | None = None, limiter: "QPSLimiter | None" = None):
+    """
+    Returns (lat, lon) or None. The offline index (GEOCODER_INDEX) answers first;
+    Google is only called, through `limiter`, when the local match scores below
+    GEOCODER_LOCAL_ACCEPT. A weaker local match is the fallback.
+    """
+    if not (street and city and state and zip_code):
+        return None
+
+    local = local_geocode(street, zip_code)
+    if local and local[1] >= LOCAL_ACCEPT:
+        return local[0]
+
+    if GOOGLE_MAPS_KEY:
+        if limiter is not None:
+            limiter.wait()
+        coords = _google_sync(client, street, city, state, zip_code, unit)
+        if coords:
+            return coords
+
+    return local[0] if local and local[1] >= LOCAL_MIN_SCORE else None
+
 class QPSLimiter:
     def __init__(self, qps: float = 10.0):
         self.min_interval = 1.0 / max(qps, 0.1)
@@ -0,0 +1,139 @@
+"""
+Moves listings that reached a terminal MLS status (Sold, Closed, Expired, Withdrawn)
+into the archive tables from migration 0016, together with their price history,
+analyses and notes. The hot tables, and every list/map/search scan over them,
+then track the active inventory instead of all history.
+
+A listing is archived ARCHIVE_AFTER_DAYS after its last change, so a status that
+gets corrected back within that window never leaves the live tables. Each batch is
+a single statement: the children are copied, the listing row is copied, and then
+it is deleted. The delete cascades to the live children and fires the usual change
+triggers, so the change feed, snapshots, detail docs and saved-search inboxes drop
+it. Every run also creates next year's history partitions before they are needed
+(once migration 0019 has partitioned the history tables).
+
+    python -m jobs.archive --db postgresql+psycopg2://... [--days 30] [--batch 1000] [--dry-run]
+"""
+from __future__ import annotations
+import argparse, asyncio, logging, os
+
+from redis import Redis
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Connection
+
+from db.migrate import sync_url
+from services.events import event_hub, listing_events, publish_sync
+
+log = logging.getLogger(__name__)
+
+LOCK_KEY = 7_240_140
+TRY_LOCK_SQL = text("SELECT pg_try_advisory_lock(:k)").execution_options(query_stats_skip=True)
+UNLOCK_SQL = text("SELECT pg_advisory_unlock(:k)").execution_options(query_stats_skip=True)
+TERMINAL_STATUSES = ("sold", "closed", "expired", "withdrawn")
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "30"))
+
+_DUE = """
+SELECT listing_id FROM listing
+WHERE lower(btrim(mls_status)) = ANY(:terminal)
+  AND updated_at < now() - make_interval(days => :days)
+"""
+
+COUNT_SQL = text(f"SELECT count(*) FROM ({_DUE}) due")
+
+# Copied by name, not position: a column added to a live table must be added to its
+# archive table (and here) too, or archiving fails instead of shifting values.
+ARCHIVED_COLUMNS = {
+    "listing": ("listing_id", "property_id", "realtor_id", "date_added", "mls_id", "mls_link", "mls_link_norm",
+                "mls_status", "equity_to_cover", "sent_to_clients", "updated_at", "version"),
+    "price_history": ("price_id", "listing_id", "effective_date", "price", "updated_at", "version"),
+    "analysis": ("analysis_id", "listing_id", "run_date", "url", "url_norm", "roi_category", "roi_pass",
+                 "run_complete"),
+    "response": ("response_id", "listing_id", "author", "note_text", "created_at", "note_hash"),
+}
+
+def _copy(table: str, extra: tuple[str, str] | None = None) -> str:
+    cols = ARCHIVED_COLUMNS[table]
+    into, values = ", ".join(cols), ", ".join(f"x.{c}" for c in cols)
+    if extra:
+        into, values = f"{into}, {extra[0]}", f"{values}, {extra[1]}"
+    return f"INSERT INTO {table}_archive ({into}) SELECT {values} FROM {table} x JOIN picked USING (listing_id)"
+
+ARCHIVE_SQL = text(f"""
+WITH picked AS (
+  {_DUE}
+  ORDER BY listing_id
+  LIMIT :batch
+  FOR UPDATE SKIP LOCKED
+),
+ph AS ({_copy("price_history")}),
+an AS ({_copy("analysis")}),
+rs AS ({_copy("response")}),
+la AS ({_copy("listing", ("archived_at", "now()"))}),
+gone AS (DELETE FROM listing l USING picked WHERE l.listing_id = picked.listing_id RETURNING l.listing_id)
+SELECT listing_id FROM gone
+""").execution_options(metric_name="archive_listings")
+
+ENSURE_PARTITIONS_SQL = text("""
+SELECT ensure_year_partitions(t, ARRAY[extract(year FROM current_date)::int, extract(year FROM current_date)::int + 1])
+FROM unnest(ARRAY['price_history', 'analysis']) t
+""")
+
+def archive(conn: Connection, days: int = ARCHIVE_AFTER_DAYS, batch: int = 1_000, max_batches: int = 1_000) -> list[int]:
+    """
+    Archives due listings `batch` at a time and returns their ids. On an AUTOCOMMIT
+    connection every batch commits on its own.
+    """
+    conn.execute(ENSURE_PARTITIONS_SQL)
+    moved: list[int] = []
+    params = {"terminal": list(TERMINAL_STATUSES), "days": days, "batch": batch}
+    for _ in range(max_batches):
+        ids = conn.execute(ARCHIVE_SQL, params).scalars().all()
+        moved.extend(ids)
+        if len(ids) < batch:
+            break
+    return moved
+
+def _locked_archive(conn: Connection, days: int) -> list[int] | None:
+    if not conn.execute(TRY_LOCK_SQL, {"k": LOCK_KEY}).scalar_one():
+        return None
+    try:
+        return archive(conn, days=days)
+    finally:
+        conn.execute(UNLOCK_SQL, {"k": LOCK_KEY})
+
+async def run_scheduler(engine, interval_s: float, days: int = ARCHIVE_AFTER_DAYS):
+    """API background task; one process at a time does the work (session advisory lock)."""
+    while True:
+        try:
+            async with engine.connect() as conn:
+                conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+                moved = await conn.run_sync(_locked_archive, days)
+            if moved:
+                log.info("archived %d listings", len(moved))
+                for kind, data in listing_events(moved, op="delete", source="archive"):
+                    await event_hub.publish(kind, **data)
+        except Exception:
+            log.exception("listing archival failed")
+        await asyncio.sleep(interval_s)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--db", default=None)
+    ap.add_argument("--days", type=int, default=ARCHIVE_AFTER_DAYS, help="Only listings unchanged for this long")
+    ap.add_argument("--batch", type=int, default=1_000, help="Listings per transaction")
+    ap.add_argument("--dry-run", action="store_true", help="Only count listings due for archival")
+    args = ap.parse_args()
+
+    engine = create_engine(args.db or sync_url(os.environ["DATABASE_URL"]))
+    with engine.connect() as conn:
+        conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+        if args.dry_run:
+            print({"due": conn.execute(COUNT_SQL, {"terminal": list(TERMINAL_STATUSES), "days": args.days}).scalar_one()})
+            return
+        moved = archive(conn, days=args.days, batch=args.batch)
+    print({"archived": len(moved)})
+    if moved and os.getenv("REDIS_URL"):
+        publish_sync(Redis.from_url(os.environ["REDIS_URL"]), listing_events(moved, op="delete", source="archive"))
+
+if __name__ == "__main__":
+    main()
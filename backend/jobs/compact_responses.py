@@ -0,0 +1,76 @@
+"""
+Removes duplicate `response` notes: rows of one listing whose author and normalized
+text (case, surrounding and repeated whitespace ignored) are the same. The oldest
+row of each group survives. The duplicates piled up because every ETL run and
+create_listing resubmit re-inserted the sheet's notes.
+
+Migration 0014 runs this before adding the unique (listing_id, note_hash) index
+that stops new duplicates. It works in listing-id ranges, so a large table is
+compacted in short transactions that each commit on their own:
+
+    python -m jobs.compact_responses --db postgresql+psycopg2://... [--batch 5000] [--dry-run]
+"""
+from __future__ import annotations
+import argparse, os
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Connection
+
+from db.migrate import sync_url
+
+def note_hash_sql(alias: str = "") -> str:
+    """The response.note_hash expression, over `alias`'s columns (bare for the column definition)."""
+    p = f"{alias}." if alias else ""
+    return (f"md5(COALESCE({p}author, '') || '|' || "
+            f"lower(btrim(regexp_replace(COALESCE({p}note_text, ''), '\\s+', ' ', 'g'))))")
+
+_RANGE_SQL = text("SELECT min(listing_id), max(listing_id) FROM response")
+
+_DUPLICATES_SQL = text("SELECT count(*) - count(DISTINCT (listing_id, note_hash)) FROM response")
+
+_DELETE_SQL = text("""
+DELETE FROM response
+WHERE response_id IN (
+  SELECT response_id FROM (
+    SELECT response_id,
+           row_number() OVER (PARTITION BY listing_id, note_hash ORDER BY response_id) AS rn
+    FROM response
+    WHERE listing_id >= :lo AND listing_id < :hi
+  ) s
+  WHERE rn > 1
+)
+""")
+
+def compact(conn: Connection, batch: int = 5_000) -> dict:
+    """
+    Deletes duplicates `batch` listing ids at a time. On an AUTOCOMMIT connection
+    each batch is its own transaction; otherwise everything joins the caller's.
+    """
+    lo, hi = conn.execute(_RANGE_SQL).one()
+    deleted = batches = 0
+    if lo is None:
+        return {"deleted": 0, "batches": 0}
+    start = lo
+    while start <= hi:
+        deleted += conn.execute(_DELETE_SQL, {"lo": start, "hi": start + batch}).rowcount
+        batches += 1
+        start += batch
+    return {"deleted": deleted, "batches": batches}
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--db", default=None)
+    ap.add_argument("--batch", type=int, default=5_000, help="Listing ids per transaction")
+    ap.add_argument("--dry-run", action="store_true", help="Only count duplicate notes")
+    args = ap.parse_args()
+
+    engine = create_engine(args.db or sync_url(os.environ["DATABASE_URL"]))
+    with engine.connect() as conn:
+        conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+        if args.dry_run:
+            print({"duplicates": conn.execute(_DUPLICATES_SQL).scalar_one()})
+        else:
+            print(compact(conn, batch=args.batch))
+
+if __name__ == "__main__":
+    main()
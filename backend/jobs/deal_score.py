@@ -0,0 +1,246 @@
+"""
+Keeps listing_score (migration 0017) current.
+
+The full pass scores every listing in listing-id batches: one facts query per
+batch, services/deal_score.score_rows over the whole batch, and one upsert that
+skips rows whose score did not change. It runs:
+
+    python -m jobs.deal_score --db postgresql+psycopg2://... [--batch 5000]
+
+and at API startup whenever a stored score was computed under other inputs
+(DEAL_* settings) or a listing has none yet.
+
+Between full passes, DealScorer reads the listing event stream through its own
+consumer group and rescores only the listings that changed. Every listing, loan
+and price write publishes such an event. A "bulk" event triggers a full pass.
+"""
+from __future__ import annotations
+import argparse, asyncio, logging, os, socket
+from typing import Iterable, Optional
+
+import numpy as np
+from redis.asyncio import Redis
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from db.migrate import sync_url
+from services.deal_score import DealScoreParams, score_rows
+from services.events import StreamConsumer
+from .archive import TERMINAL_STATUSES
+
+log = logging.getLogger(__name__)
+
+GROUP = "deal-score"
+LOCK_KEY = 7_240_144
+TRY_LOCK_SQL = text("SELECT pg_try_advisory_lock(:k)").execution_options(query_stats_skip=True)
+UNLOCK_SQL = text("SELECT pg_advisory_unlock(:k)").execution_options(query_stats_skip=True)
+
+_FACTS = """
+SELECT l.listing_id,
+       NULLIF(lp.price, 'NaN')::float8 AS price,
+       NULLIF(lo.interest_rate, 'NaN')::float8 AS interest_rate,
+       NULLIF(l.equity_to_cover, 'NaN')::float8 AS equity_to_cover,
+       NULLIF(lo.piti, 'NaN')::float8 AS piti,
+       NULLIF(p.hoa_amount, 'NaN')::float8 / CASE p.hoa_frequency
+         WHEN 'Quarterly' THEN 3 WHEN 'Semi-Annual' THEN 6 WHEN 'Annual' THEN 12 ELSE 1 END AS hoa_monthly,
+       lo.loan_type,
+       COALESCE(lower(btrim(l.mls_status)) = ANY(:terminal), false) AS closed
+FROM listing l
+JOIN property p ON p.property_id = l.property_id
+LEFT JOIN loan lo ON lo.property_id = l.property_id
+LEFT JOIN LATERAL (
+  SELECT ph.price FROM price_history ph
+  WHERE ph.listing_id = l.listing_id
+  ORDER BY ph.effective_date DESC, ph.price_id DESC
+  LIMIT 1
+) lp ON TRUE
+"""
+
+RANGE_FACTS_SQL = text(_FACTS + " WHERE l.listing_id >= :lo AND l.listing_id < :hi").execution_options(
+    metric_name="deal_score_facts_range")
+IDS_FACTS_SQL = text(_FACTS + " WHERE l.listing_id = ANY(:ids)").execution_options(metric_name="deal_score_facts")
+
+RANGE_SQL = text("SELECT min(listing_id), max(listing_id) FROM listing")
+
+UPSERT_SQL = text("""
+INSERT INTO listing_score (listing_id, score, loan_type, rate_spread, equity_share, payment_ratio, params_hash)
+SELECT u.*, :hash
+FROM unnest(CAST(:ids AS int[]), CAST(:scores AS real[]), CAST(:types AS text[]),
+            CAST(:spreads AS real[]), CAST(:equity AS real[]), CAST(:payment AS real[])) u
+ON CONFLICT (listing_id) DO UPDATE SET
+  score = EXCLUDED.score, loan_type = EXCLUDED.loan_type, rate_spread = EXCLUDED.rate_spread,
+  equity_share = EXCLUDED.equity_share, payment_ratio = EXCLUDED.payment_ratio,
+  params_hash = EXCLUDED.params_hash, computed_at = now()
+WHERE (listing_score.score, listing_score.loan_type, listing_score.rate_spread,
+       listing_score.equity_share, listing_score.payment_ratio, listing_score.params_hash)
+  IS DISTINCT FROM
+      (EXCLUDED.score, EXCLUDED.loan_type, EXCLUDED.rate_spread,
+       EXCLUDED.equity_share, EXCLUDED.payment_ratio, EXCLUDED.params_hash)
+""").execution_options(metric_name="deal_score_upsert")
+
+DELETE_SQL = text("DELETE FROM listing_score WHERE listing_id = ANY(:ids)").execution_options(
+    metric_name="deal_score_delete")
+
+STALE_SQL = text("""
+SELECT EXISTS (SELECT 1 FROM listing_score WHERE params_hash <> :hash)
+    OR EXISTS (
+      SELECT 1 FROM listing l
+      WHERE NOT COALESCE(lower(btrim(l.mls_status)) = ANY(:terminal), false)
+        AND NOT EXISTS (SELECT 1 FROM listing_score s WHERE s.listing_id = l.listing_id)
+    )
+""")
+
+def _nullable(a: np.ndarray) -> list:
+    return [None if np.isnan(x) else float(x) for x in a]
+
+def _write(conn: Connection, rows, params: DealScoreParams, asked: Iterable[int] = ()) -> tuple[int, int]:
+    """Scores `rows` and removes closed listings (and `asked` ids that no longer exist)."""
+    live = [r for r in rows if not r["closed"]]
+    gone = {r["listing_id"] for r in rows if r["closed"]} | (set(asked) - {r["listing_id"] for r in rows})
+    written = 0
+    if live:
+        s = score_rows(live, params)
+        written = conn.execute(UPSERT_SQL, {
+            "ids": [r["listing_id"] for r in live],
+            "scores": _nullable(s["score"]),
+            "types": [r["loan_type"] for r in live],
+            "spreads": _nullable(s["rate_spread"]),
+            "equity": _nullable(s["equity_share"]),
+            "payment": _nullable(s["payment_ratio"]),
+            "hash": params.fingerprint(),
+        }).rowcount
+    removed = conn.execute(DELETE_SQL, {"ids": sorted(gone)}).rowcount if gone else 0
+    return written, removed
+
+def recompute(conn: Connection, ids: Optional[Iterable[int]] = None, params: Optional[DealScoreParams] = None,
+              batch: int = 5_000) -> dict:
+    """
+    Rescores `ids`, or every listing when None. On an AUTOCOMMIT connection each
+    batch commits on its own; otherwise everything joins the caller's transaction.
+    """
+    params = params or DealScoreParams.from_env()
+    terminal = list(TERMINAL_STATUSES)
+    written = removed = 0
+    if ids is not None:
+        ids = sorted(set(ids))
+        for i in range(0, len(ids), batch):
+            chunk = ids[i:i + batch]
+            rows = conn.execute(IDS_FACTS_SQL, {"ids": chunk, "terminal": terminal}).mappings().all()
+            w, r = _write(conn, rows, params, asked=chunk)
+            written, removed = written + w, removed + r
+        return {"written": written, "removed": removed}
+
+    lo, hi = conn.execute(RANGE_SQL).one()
+    start = lo or 0
+    while hi is not None and start <= hi:
+        rows = conn.execute(RANGE_FACTS_SQL, {"lo": start, "hi": start + batch, "terminal": terminal}).mappings().all()
+        w, r = _write(conn, rows, params)
+        written, removed = written + w, removed + r
+        start += batch
+    return {"written": written, "removed": removed}
+
+def _locked_recompute(conn: Connection, params: DealScoreParams, only_if_stale: bool) -> Optional[dict]:
+    if not conn.execute(TRY_LOCK_SQL, {"k": LOCK_KEY}).scalar_one():
+        return None
+    try:
+        if only_if_stale and not conn.execute(
+                STALE_SQL, {"hash": params.fingerprint(), "terminal": list(TERMINAL_STATUSES)}).scalar_one():
+            return None
+        return recompute(conn, params=params)
+    finally:
+        conn.execute(UNLOCK_SQL, {"k": LOCK_KEY})
+
+class DealScorer:
+    def __init__(self, batch_size: int = 500):
+        self.batch_size = batch_size
+        self.params = DealScoreParams.from_env()
+        self._engine: Optional[AsyncEngine] = None
+        self._consumer: Optional[StreamConsumer] = None
+        self._task: Optional[asyncio.Task] = None
+        self.events = 0
+        self.written = 0
+        self.removed = 0
+        self.full_runs = 0
+
+    def start(self, engine: AsyncEngine, redis: Redis):
+        if self._task is None:
+            self._engine = engine
+            self._consumer = StreamConsumer(redis, GROUP, f"{socket.gethostname()}-{os.getpid()}")
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "params": self.params.fingerprint(),
+            "market_rate": self.params.market_rate,
+            "events": self.events,
+            "written": self.written,
+            "removed": self.removed,
+            "full_runs": self.full_runs,
+        }
+
+    def _count(self, result: Optional[dict]):
+        if result:
+            self.written += result["written"]
+            self.removed += result["removed"]
+
+    async def full(self, only_if_stale: bool = False):
+        """Full pass under the advisory lock; skipped when another process holds it."""
+        async with self._engine.connect() as conn:
+            conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+            result = await conn.run_sync(_locked_recompute, self.params, only_if_stale)
+        if result is not None:
+            self.full_runs += 1
+            self._count(result)
+
+    async def process(self, listing_ids: set[int]):
+        async with self._engine.begin() as conn:
+            self._count(await conn.run_sync(recompute, listing_ids, self.params))
+
+    async def _run(self):
+        ready = False
+        while True:
+            try:
+                if not ready:
+                    await self._consumer.ensure_group()
+                    await self.full(only_if_stale=True)
+                    ready = True
+                events = await self._consumer.read(count=self.batch_size)
+                if not events:
+                    continue
+                if any(e.type == "bulk" for e in events):
+                    await self.full()
+                else:
+                    ids = {e.data["id"] for e in events if e.type == "listing" and e.data.get("op") != "delete"}
+                    if ids:
+                        await self.process(ids)
+                await self._consumer.ack(events)
+                self.events += len(events)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                log.exception("deal scoring failed; will retry the batch")
+                self._consumer.retry()
+                await asyncio.sleep(5.0)
+
+deal_scorer = DealScorer()
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--db", default=None)
+    ap.add_argument("--batch", type=int, default=5_000, help="Listing ids per transaction")
+    args = ap.parse_args()
+
+    engine = create_engine(args.db or sync_url(os.environ["DATABASE_URL"]))
+    with engine.connect() as conn:
+        conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+        print(recompute(conn, batch=args.batch))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Builds the local geocoder's index (services/geo_index.py) from offline datasets:
+
+    python -m jobs.geocode.build_index --out data/geoindex \\
+        --zips 2023_Gaz_zcta_national.txt --ranges co_address_ranges.csv [--states CO,WY]
+
+--zips     ZIP centroids, e.g. the Census ZCTA gazetteer: a zip/GEOID column and
+           lat/INTPTLAT + lon/INTPTLONG columns; comma or tab separated.
+--ranges   Street address ranges, one row per street segment side, e.g. a flat
+           export of TIGER/Line address features: street, zip, from/to house
+           number, the segment's end coordinates (lat0/lon0/lat1/lon1) and
+           optionally parity (odd/even/both) and state.
+
+Street names go through the same normalization as property.address_key, so
+"123 North Main Street" in the sheet finds "N MAIN ST" in the dataset.
+"""
+from __future__ import annotations
+import argparse, csv, time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterator
+
+import numpy as np
+
+from services.address import normalize_zip
+from services.geo_index import BOTH, EVEN, ODD, RANGE_DTYPE, ZIP_DTYPE, GeoIndex, split_street, street_key, write_index
+
+_ALIASES = {
+    "zip": ("zip", "zip5", "zipcode", "postal_code", "geoid", "zcta5"),
+    "lat": ("lat", "latitude", "intptlat"),
+    "lon": ("lon", "lng", "longitude", "intptlong"),
+    "street": ("street", "street_name", "fullname", "name"),
+    "from_num": ("from_num", "from", "fromhn", "from_hn", "lfromhn"),
+    "to_num": ("to_num", "to", "tohn", "to_hn", "ltohn"),
+    "lat0": ("lat0", "from_lat", "start_lat"),
+    "lon0": ("lon0", "from_lon", "start_lon"),
+    "lat1": ("lat1", "to_lat", "end_lat"),
+    "lon1": ("lon1", "to_lon", "end_lon"),
+    "parity": ("parity", "side_parity"),
+    "state": ("state", "stusps", "state_code"),
+}
+_PARITY = {"o": ODD, "odd": ODD, "e": EVEN, "even": EVEN}
+
+def _rows(path: str, required: tuple[str, ...]) -> Iterator[dict]:
+    """Rows keyed by canonical column name; only the columns we know are kept."""
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        dialect = csv.Sniffer().sniff(f.read(64 * 1024), delimiters=",\t|")
+        f.seek(0)
+        reader = csv.reader(f, dialect)
+        header = [h.strip().lower() for h in next(reader)]
+        cols = {}
+        for canon, names in _ALIASES.items():
+            for n in names:
+                if n in header:
+                    cols[canon] = header.index(n)
+                    break
+        missing = [c for c in required if c not in cols]
+        if missing:
+            raise SystemExit(f"{path}: no column for {', '.join(missing)} (header: {', '.join(header)})")
+        for rec in reader:
+            if rec:
+                yield {canon: rec[i].strip() for canon, i in cols.items() if i < len(rec)}
+
+def load_zips(path: str, states: set[str]) -> np.ndarray:
+    out = []
+    for r in _rows(path, ("zip", "lat", "lon")):
+        if states and r.get("state") and r["state"].upper() not in states:
+            continue
+        z = normalize_zip(r["zip"])
+        try:
+            if len(z) == 5:
+                out.append((int(z), float(r["lat"]), float(r["lon"])))
+        except ValueError:
+            continue
+    return np.array(out, dtype=ZIP_DTYPE)
+
+def load_ranges(path: str, states: set[str]) -> tuple[np.ndarray, np.ndarray]:
+    keys, out = [], []
+    for r in _rows(path, ("street", "zip", "from_num", "to_num", "lat0", "lon0", "lat1", "lon1")):
+        if states and r.get("state") and r["state"].upper() not in states:
+            continue
+        z = normalize_zip(r["zip"])
+        # Normalized behind a dummy house number so the suffix/directional rules see
+        # the same token layout as a property's street.
+        _, name = split_street(f"0 {r['street']}")
+        if len(z) != 5 or not name:
+            continue
+        try:
+            row = (
+                int(float(r["from_num"])), int(float(r["to_num"])), _PARITY.get(r.get("parity", "").lower(), BOTH),
+                float(r["lat0"]), float(r["lon0"]), float(r["lat1"]), float(r["lon1"]),
+            )
+        except ValueError:
+            continue
+        keys.append(street_key(name, z))
+        out.append(row)
+    return np.array(keys, dtype="<u8"), np.array(out, dtype=RANGE_DTYPE)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--out", required=True, help="Index directory (GEOCODER_INDEX)")
+    ap.add_argument("--zips", required=True, help="ZIP centroid file")
+    ap.add_argument("--ranges", default=None, help="Street address range file")
+    ap.add_argument("--states", default="", help="Comma-separated state codes to keep, e.g. CO,WY")
+    args = ap.parse_args()
+
+    states = {s.strip().upper() for s in args.states.split(",") if s.strip()}
+    t0 = time.perf_counter()
+    zips = load_zips(args.zips, states)
+    keys, ranges = load_ranges(args.ranges, states) if args.ranges else (np.array([], "<u8"), np.array([], RANGE_DTYPE))
+    write_index(args.out, zips, keys, ranges, {
+        "built_at": datetime.now(timezone.utc).isoformat(),
+        "sources": [Path(p).name for p in (args.zips, args.ranges) if p],
+        "states": sorted(states),
+    })
+    print({**GeoIndex(args.out).stats(), "build_s": round(time.perf_counter() - t0, 1)})
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+from __future__ import annotations
+from typing import Optional
+
+from services.address import address_key
+from .sql import ENQUEUE_SQL
+
+def _enqueue_params(property_id: int, street: str, city: str, state: str, zip_code: str, unit: Optional[str]) -> dict:
+    return {
+        "key": address_key(street, unit, city, state, zip_code),
+        "pid": property_id,
+        "street": street.strip(),
+        "unit": unit,
+        "city": city.strip(),
+        "state": state.strip().upper(),
+        "zip": zip_code.strip(),
+    }
+
+async def enqueue_geocode(
+        session, property_id: int, street: str, city: str, state: str, zip_code: str, unit: Optional[str] = None
+) -> str:
+    """
+    Queues a geocode for the property inside the caller's transaction.
+    Returns the job status: 'done' when the address was already resolved, else 'pending'/'running'.
+    """
+    res = await session.execute(ENQUEUE_SQL, _enqueue_params(property_id, street, city, state, zip_code, unit))
+    return res.scalar_one()
+
+def enqueue_geocode_sync(
+        conn, property_id: int, street: str, city: str, state: str, zip_code: str, unit: Optional[str] = None
+) -> str:
+    return conn.execute(ENQUEUE_SQL, _enqueue_params(property_id, street, city, state, zip_code, unit)).scalar_one()
@@ -0,0 +1,93 @@
+from sqlalchemy import text
+
+# One row per distinct address. Re-enqueueing an address that is already queued only
+# appends the property id, so duplicate addresses share a single upstream lookup. If the
+# address was already resolved, the cached coordinates are copied onto the property.
+ENQUEUE_SQL = text("""
+WITH job AS (
+  INSERT INTO geocode_job (address_key, street, unit, city, state, zip, property_ids)
+  VALUES (:key, :street, :unit, :city, :state, :zip, ARRAY[CAST(:pid AS int)])
+  ON CONFLICT (address_key) DO UPDATE SET
+    property_ids = CASE WHEN CAST(:pid AS int) = ANY(geocode_job.property_ids)
+                        THEN geocode_job.property_ids
+                        ELSE geocode_job.property_ids || CAST(:pid AS int) END,
+    status      = CASE WHEN geocode_job.status = 'failed' THEN 'pending' ELSE geocode_job.status END,
+    attempts    = CASE WHEN geocode_job.status = 'failed' THEN 0 ELSE geocode_job.attempts END,
+    run_after   = CASE WHEN geocode_job.status = 'failed' THEN now() ELSE geocode_job.run_after END,
+    enqueued_at = CASE WHEN geocode_job.status = 'failed' THEN now() ELSE geocode_job.enqueued_at END
+  RETURNING status, latitude, longitude
+),
+cached AS (
+  UPDATE property p
+     SET latitude = job.latitude, longitude = job.longitude
+    FROM job
+   WHERE p.property_id = :pid
+     AND job.status = 'done'
+     AND (p.latitude IS DISTINCT FROM job.latitude OR p.longitude IS DISTINCT FROM job.longitude)
+  RETURNING p.property_id
+)
+SELECT status FROM job
+""")
+
+# Jobs left 'running' longer than the lease belong to a worker that died; they are reclaimed
+# until they have used :max_attempts, then failed, so an address that keeps crashing its
+# worker is not retried forever.
+CLAIM_SQL = text("""
+WITH expired AS (
+  UPDATE geocode_job
+     SET status = 'failed', finished_at = now(), last_error = 'lease expired on the last attempt'
+   WHERE status = 'running' AND attempts >= :max_attempts
+     AND started_at < now() - make_interval(secs => :lease)
+)
+UPDATE geocode_job
+   SET status = 'running', started_at = now(), attempts = attempts + 1
+ WHERE job_id = (
+   SELECT job_id FROM geocode_job
+    WHERE (status = 'pending' AND run_after <= now())
+       OR (status = 'running' AND attempts < :max_attempts
+           AND started_at < now() - make_interval(secs => :lease))
+    ORDER BY run_after, job_id
+    FOR UPDATE SKIP LOCKED
+    LIMIT 1
+ )
+RETURNING job_id, street, unit, city, state, zip, attempts, enqueued_at
+""")
+
+COMPLETE_SQL = text("""
+WITH job AS (
+  UPDATE geocode_job
+     SET status = 'done', latitude = :lat, longitude = :lon,
+         finished_at = now(), last_error = NULL
+   WHERE job_id = :jid
+  RETURNING property_ids
+)
+UPDATE property p
+   SET latitude = :lat, longitude = :lon
+  FROM job
+ WHERE p.property_id = ANY(job.property_ids)
+   AND (p.latitude IS DISTINCT FROM :lat OR p.longitude IS DISTINCT FROM :lon)
+""")
+
+NO_RESULT_SQL = text("""
+UPDATE geocode_job
+   SET status = 'failed', finished_at = now(), last_error = 'no result'
+ WHERE job_id = :jid
+""")
+
+RETRY_SQL = text("""
+UPDATE geocode_job
+   SET status = CASE WHEN attempts >= :max_attempts THEN 'failed' ELSE 'pending' END,
+       run_after = now() + make_interval(secs => :delay),
+       finished_at = CASE WHEN attempts >= :max_attempts THEN now() END,
+       last_error = :err
+ WHERE job_id = :jid
+""")
+
+DEPTH_SQL = text("""
+SELECT status,
+       count(*) AS jobs,
+       EXTRACT(EPOCH FROM now() - min(enqueued_at)) AS oldest_age_s
+FROM   geocode_job
+WHERE  status IN ('pending', 'running')
+GROUP  BY status
+""")
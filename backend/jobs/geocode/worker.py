@@ -0,0 +1,145 @@
+from __future__ import annotations
+import asyncio, logging, os, random
+from collections import deque
+from datetime import datetime, timezone
+
+from db.main import AsyncSessionLocal
+from observability.metrics import GEOCODE_JOBS, GEOCODE_JOB_LATENCY
+from services.geocoder import get_geocoder
+from .sql import CLAIM_SQL, COMPLETE_SQL, NO_RESULT_SQL, RETRY_SQL
+
+log = logging.getLogger(__name__)
+
+def _percentile(sorted_vals: list[float], q: float) -> float | None:
+    if not sorted_vals:
+        return None
+    idx = min(len(sorted_vals) - 1, int(round(q * (len(sorted_vals) - 1))))
+    return sorted_vals[idx]
+
+class GeocodeWorkerPool:
+    """
+    In-process asyncio workers that drain the geocode_job table.
+    Each job is claimed and finished in short transactions; the HTTP call to the
+    geocoder happens with no DB connection held.
+    """
+    def __init__(
+            self,
+            workers: int = 2,
+            poll_interval: float = 5.0,
+            max_attempts: int = 5,
+            backoff_base: float = 2.0,
+            backoff_cap: float = 300.0,
+            lease_seconds: float = 120.0,
+    ):
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.lease_seconds = lease_seconds
+
+        self._tasks: list[asyncio.Task] = []
+        self._wake = asyncio.Event()
+        self._stopping = False
+
+        self.processed = 0
+        self.resolved = 0
+        self.unresolved = 0
+        self.retried = 0
+        self._latencies: deque[float] = deque(maxlen=1000)
+
+    def start(self):
+        if self._tasks or self.workers <= 0:
+            return
+        self._stopping = False
+        self._tasks = [asyncio.create_task(self._run(i)) for i in range(self.workers)]
+
+    async def stop(self):
+        self._stopping = True
+        self._wake.set()
+        for t in self._tasks:
+            t.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def notify(self):
+        """Wake idle workers, e.g. right after a transaction that enqueued jobs commits."""
+        self._wake.set()
+
+    def stats(self) -> dict:
+        lat = sorted(self._latencies)
+        return {
+            "workers": len(self._tasks),
+            "processed": self.processed,
+            "resolved": self.resolved,
+            "unresolved": self.unresolved,
+            "retried": self.retried,
+            "latency_p50_s": _percentile(lat, 0.50),
+            "latency_p95_s": _percentile(lat, 0.95),
+        }
+
+    async def _run(self, n: int):
+        while not self._stopping:
+            try:
+                job = await self._claim()
+            except Exception:
+                log.exception("geocode worker %s: claim failed", n)
+                await asyncio.sleep(self.poll_interval)
+                continue
+
+            if job is None:
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            try:
+                await self._process(job)
+            except Exception:
+                log.exception("geocode worker %s: job %s failed to finish", n, job["job_id"])
+
+    async def _claim(self):
+        async with AsyncSessionLocal() as session:
+            row = (await session.execute(CLAIM_SQL, {
+                "lease": self.lease_seconds, "max_attempts": self.max_attempts,
+            })).mappings().first()
+            await session.commit()
+            return row
+
+    async def _process(self, job):
+        try:
+            coords = await get_geocoder().geocode(job["street"], job["city"], job["state"], job["zip"], job["unit"])
+        except Exception as e:
+            delay = min(self.backoff_cap, self.backoff_base * 2 ** (job["attempts"] - 1))
+            delay *= random.uniform(0.5, 1.0)
+            async with AsyncSessionLocal() as session:
+                await session.execute(RETRY_SQL, {
+                    "jid": job["job_id"], "delay": delay,
+                    "max_attempts": self.max_attempts, "err": str(e)[:500],
+                })
+                await session.commit()
+            self.retried += 1
+            GEOCODE_JOBS.labels("retry").inc()
+            return
+
+        async with AsyncSessionLocal() as session:
+            if coords:
+                lat, lon = coords
+                await session.execute(COMPLETE_SQL, {"jid": job["job_id"], "lat": lat, "lon": lon})
+                self.resolved += 1
+                GEOCODE_JOBS.labels("resolved").inc()
+            else:
+                await session.execute(NO_RESULT_SQL, {"jid": job["job_id"]})
+                self.unresolved += 1
+                GEOCODE_JOBS.labels("unresolved").inc()
+            await session.commit()
+
+        self.processed += 1
+        enqueued_at: datetime = job["enqueued_at"]
+        latency = (datetime.now(timezone.utc) - enqueued_at).total_seconds()
+        self._latencies.append(latency)
+        GEOCODE_JOB_LATENCY.observe(latency)
+
+geocode_workers = GeocodeWorkerPool(workers=int(os.getenv("GEOCODE_WORKERS", "2")))
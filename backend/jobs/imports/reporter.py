@@ -0,0 +1,85 @@
+"""
+Spreadsheet imports run as a separate ETL process.
+
+The API side (`ImportRunner`) writes uploads to IMPORT_DIR, records an `import_job`
+row and launches `python -m etl.sheet_insertion <file> --job-id N` as a child
+process, so a multi-minute load never runs on the event loop. The ETL side
+(`ImportReporter`) reports progress on its own autocommit connection, because the
+load itself is one long transaction whose rows stay invisible until commit.
+
+Every ETL run, shell or API, holds LOCK_KEY for its whole load, so concurrent
+uploads queue up behind each other (status `queued`) instead of interleaving.
+"""
+from __future__ import annotations
+import json, os
+from contextlib import contextmanager
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from .sql import FAIL_SQL, FINISH_SQL, PROGRESS_SQL, START_SQL
+
+LOCK_KEY = 7_240_136
+LOCK_SQL = text("SELECT pg_advisory_lock(:k)").execution_options(query_stats_skip=True)
+UNLOCK_SQL = text("SELECT pg_advisory_unlock(:k)").execution_options(query_stats_skip=True)
+MAX_ERRORS = 100
+
+@contextmanager
+def import_lock(engine: Engine):
+    """Session advisory lock held for a whole load; blocks while another import runs."""
+    with engine.connect() as conn:
+        conn.execute(LOCK_SQL, {"k": LOCK_KEY})
+        conn.commit()
+        try:
+            yield
+        finally:
+            conn.execute(UNLOCK_SQL, {"k": LOCK_KEY})
+            conn.commit()
+
+class ImportReporter:
+    """Progress writer used by the ETL when it runs with `--job-id`."""
+    def __init__(self, engine: Engine, job_id: int, every: int = 25):
+        self.job_id = job_id
+        self.every = every
+        self.done = 0
+        self.failed = 0
+        self.geocoded = 0
+        self.errors: list[dict] = []
+        self._conn = engine.connect().execution_options(isolation_level="AUTOCOMMIT")
+
+    def start(self, total: int):
+        self._conn.execute(START_SQL, {"jid": self.job_id, "pid": os.getpid(), "total": total})
+
+    def row_done(self, geocode_enqueued: bool = False):
+        self.done += 1
+        self.geocoded += geocode_enqueued
+        self._maybe_flush()
+
+    def row_failed(self, row: int, err: Exception):
+        self.done += 1
+        self.failed += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append({"row": row, "error": str(err)[:500]})
+        self._maybe_flush()
+
+    def flush(self):
+        self._conn.execute(PROGRESS_SQL, {
+            "jid": self.job_id, "done": self.done, "failed": self.failed,
+            "geocoded": self.geocoded, "errors": json.dumps(self.errors),
+        })
+
+    def finish(self, result: dict):
+        self.flush()
+        self._conn.execute(FINISH_SQL, {"jid": self.job_id, "result": json.dumps(result, default=str)})
+        self._conn.close()
+
+    def fail(self, err: BaseException):
+        try:
+            self.flush()
+            self._conn.execute(FAIL_SQL, {"jid": self.job_id, "err": f"{type(err).__name__}: {err}"[:2000]})
+        finally:
+            self._conn.close()
+
+    def _maybe_flush(self):
+        if self.done % self.every == 0:
+            self.flush()
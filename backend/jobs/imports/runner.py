@@ -0,0 +1,64 @@
+from __future__ import annotations
+import asyncio, logging, os, sys, uuid
+from pathlib import Path
+from typing import Optional
+
+from db.main import AsyncSessionLocal
+from .sql import FAIL_SQL
+
+log = logging.getLogger(__name__)
+
+IMPORT_DIR = Path(os.getenv("IMPORT_DIR", "/tmp/assumables-imports"))
+BACKEND_DIR = Path(__file__).resolve().parents[2]
+
+class ImportRunner:
+    """Launches ETL child processes and marks their jobs failed if they die without reporting."""
+    def __init__(self, upload_dir: Path = IMPORT_DIR):
+        self.upload_dir = upload_dir
+        self._procs: dict[int, asyncio.subprocess.Process] = {}
+        self._reapers: set[asyncio.Task] = set()
+        self.started = 0
+        self.failed = 0
+
+    def new_upload_path(self, filename: str) -> Path:
+        self.upload_dir.mkdir(parents=True, exist_ok=True)
+        return self.upload_dir / f"{uuid.uuid4().hex}{Path(filename).suffix.lower()}"
+
+    async def launch(self, job_id: int, path: Path, sheet: Optional[str] = None):
+        cmd = [sys.executable, "-m", "etl.sheet_insertion", str(path), "--job-id", str(job_id), "--geocode", "queue"]
+        if sheet:
+            cmd += ["--sheet", sheet]
+        # No --db: the child reads DATABASE_URL from the environment it inherits. On the
+        # command line, ps and /proc would show the password to every local user.
+        with open(path.with_suffix(".log"), "wb") as logf:
+            proc = await asyncio.create_subprocess_exec(*cmd, cwd=BACKEND_DIR, stdout=logf, stderr=asyncio.subprocess.STDOUT)
+        self._procs[job_id] = proc
+        self.started += 1
+        task = asyncio.create_task(self._reap(job_id, proc, path))
+        self._reapers.add(task)
+        task.add_done_callback(self._reapers.discard)
+
+    async def _reap(self, job_id: int, proc: asyncio.subprocess.Process, path: Path):
+        code = await proc.wait()
+        self._procs.pop(job_id, None)
+        if code == 0:
+            path.unlink(missing_ok=True)
+            return
+        # The upload and log are kept for inspection.
+        self.failed += 1
+        log.warning("import %s exited with %s; see %s", job_id, code, path.with_suffix(".log"))
+        async with AsyncSessionLocal() as session:
+            await session.execute(FAIL_SQL, {"jid": job_id, "err": f"ETL process exited with status {code}"})
+            await session.commit()
+
+    async def stop(self):
+        """Stop watching. Running imports keep going and still report their own outcome."""
+        for t in list(self._reapers):
+            t.cancel()
+        await asyncio.gather(*self._reapers, return_exceptions=True)
+        self._procs.clear()
+
+    def stats(self) -> dict:
+        return {"running": len(self._procs), "started": self.started, "failed": self.failed}
+
+import_runner = ImportRunner()
@@ -0,0 +1,35 @@
+from sqlalchemy import text
+
+CREATE_SQL = text("""
+INSERT INTO import_job (filename, path, sheet) VALUES (:filename, :path, :sheet)
+RETURNING job_id
+""")
+
+GET_SQL = text("""
+SELECT job_id, filename, sheet, status, rows_total, rows_done, rows_failed, geocode_enqueued,
+       errors, result, last_error, created_at, started_at, finished_at, updated_at
+FROM import_job WHERE job_id = :jid
+""").execution_options(metric_name="import_job")
+
+START_SQL = text("""
+UPDATE import_job SET status = 'running', pid = :pid, rows_total = :total,
+       started_at = now(), updated_at = now()
+WHERE job_id = :jid
+""")
+
+PROGRESS_SQL = text("""
+UPDATE import_job SET rows_done = :done, rows_failed = :failed, geocode_enqueued = :geocoded,
+       errors = CAST(:errors AS jsonb), updated_at = now()
+WHERE job_id = :jid
+""")
+
+FINISH_SQL = text("""
+UPDATE import_job SET status = 'done', result = CAST(:result AS jsonb),
+       finished_at = now(), updated_at = now()
+WHERE job_id = :jid
+""")
+
+FAIL_SQL = text("""
+UPDATE import_job SET status = 'failed', last_error = :err, finished_at = now(), updated_at = now()
+WHERE job_id = :jid AND status IN ('queued', 'running')
+""")
@@ -0,0 +1,163 @@
+"""
+Recomputes `property.address_key` with services/address.py and merges properties
+that normalize to the same key ("123 Main St" vs "123 MAIN STREET"). The lowest
+property_id in each group survives. Its listings, loan and geocode jobs absorb the
+duplicates'. Listings that collide on (realtor, MLS link) are folded into one,
+and their price history, analyses and notes move with them.
+
+Migration 0006 only keys properties; it leaves duplicates unkeyed for this job.
+Run it by hand after that migration and after changing the normalizer:
+
+    python -m jobs.merge_properties --db postgresql+psycopg2://... [--dry-run]
+"""
+from __future__ import annotations
+import argparse, os
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Connection
+
+from db.migrate import sync_url
+from services.address import address_key
+from jobs.compact_responses import note_hash_sql
+from jobs.rollups import MARK_DIRTY_SQL
+
+_CHUNK = 5_000
+
+_MERGE_STEPS = [
+    # Fill gaps on the surviving property from its duplicates.
+    """
+    UPDATE property k SET
+      beds = COALESCE(k.beds, x.beds), baths = COALESCE(k.baths, x.baths), sqft = COALESCE(k.sqft, x.sqft),
+      hoa_amount = COALESCE(k.hoa_amount, x.hoa_amount), hoa_frequency = COALESCE(k.hoa_frequency, x.hoa_frequency),
+      latitude = COALESCE(k.latitude, x.latitude), longitude = COALESCE(k.longitude, x.longitude)
+    FROM (
+      SELECT DISTINCT ON (m.keeper) m.keeper, p.beds, p.baths, p.sqft, p.hoa_amount, p.hoa_frequency,
+             p.latitude, p.longitude
+      FROM property_merge m JOIN property p ON p.property_id = m.dup
+      ORDER BY m.keeper, m.dup
+    ) x
+    WHERE k.property_id = x.keeper
+    """,
+    # Loans: the keeper's loan wins, gaps filled from the oldest duplicate's; a keeper
+    # without a loan adopts that loan instead.
+    """
+    UPDATE loan k SET
+      interest_rate = COALESCE(k.interest_rate, x.interest_rate), balance = COALESCE(k.balance, x.balance),
+      piti = COALESCE(k.piti, x.piti), loan_servicer = COALESCE(k.loan_servicer, x.loan_servicer),
+      investor_allowed = COALESCE(k.investor_allowed, x.investor_allowed)
+    FROM (
+      SELECT DISTINCT ON (m.keeper) m.keeper, l.*
+      FROM property_merge m JOIN loan l ON l.property_id = m.dup
+      ORDER BY m.keeper, m.dup
+    ) x
+    WHERE k.property_id = x.keeper
+    """,
+    """
+    UPDATE loan SET property_id = x.keeper
+    FROM (
+      SELECT DISTINCT ON (m.keeper) m.keeper, l.loan_id
+      FROM property_merge m JOIN loan l ON l.property_id = m.dup
+      WHERE NOT EXISTS (SELECT 1 FROM loan k WHERE k.property_id = m.keeper)
+      ORDER BY m.keeper, m.dup
+    ) x
+    WHERE loan.loan_id = x.loan_id
+    """,
+    "DELETE FROM loan WHERE property_id IN (SELECT dup FROM property_merge)",
+    # Listings that would collide on listing_prop_realtor_link_unique fold into the oldest.
+    """
+    CREATE TEMP TABLE listing_merge ON COMMIT DROP AS
+    SELECT dup, keeper FROM (
+      SELECT l.listing_id AS dup,
+             min(l.listing_id) OVER (PARTITION BY g.keeper, l.realtor_id, l.mls_link_norm) AS keeper
+      FROM listing l
+      JOIN (SELECT dup AS pid, keeper FROM property_merge
+            UNION SELECT keeper, keeper FROM property_merge) g ON g.pid = l.property_id
+    ) s
+    WHERE dup <> keeper
+    """,
+    "UPDATE price_history SET listing_id = m.keeper FROM listing_merge m WHERE price_history.listing_id = m.dup",
+    "UPDATE analysis SET listing_id = m.keeper FROM listing_merge m WHERE analysis.listing_id = m.dup",
+    # Notes repeated across the folded listings would collide on response_note_uidx; keep the oldest.
+    f"""
+    WITH g AS (SELECT dup AS lid, keeper FROM listing_merge UNION SELECT keeper, keeper FROM listing_merge)
+    DELETE FROM response r USING g
+    WHERE r.listing_id = g.lid
+      AND EXISTS (
+        SELECT 1 FROM response o JOIN g og ON og.lid = o.listing_id
+        WHERE og.keeper = g.keeper AND o.response_id < r.response_id
+          AND {note_hash_sql('o')} = {note_hash_sql('r')}
+      )
+    """,
+    "UPDATE response SET listing_id = m.keeper FROM listing_merge m WHERE response.listing_id = m.dup",
+    """
+    UPDATE listing k SET
+      date_added = LEAST(k.date_added, x.date_added), mls_id = COALESCE(k.mls_id, x.mls_id),
+      mls_status = COALESCE(k.mls_status, x.mls_status),
+      equity_to_cover = COALESCE(k.equity_to_cover, x.equity_to_cover),
+      sent_to_clients = COALESCE(k.sent_to_clients, x.sent_to_clients)
+    FROM (
+      SELECT DISTINCT ON (m.keeper) m.keeper, l.date_added, l.mls_id, l.mls_status, l.equity_to_cover, l.sent_to_clients
+      FROM listing_merge m JOIN listing l ON l.listing_id = m.dup
+      ORDER BY m.keeper, m.dup
+    ) x
+    WHERE k.listing_id = x.keeper
+    """,
+    "DELETE FROM listing WHERE listing_id IN (SELECT dup FROM listing_merge)",
+    "UPDATE listing SET property_id = m.keeper FROM property_merge m WHERE listing.property_id = m.dup",
+    """
+    UPDATE geocode_job j SET property_ids = ARRAY(
+      SELECT DISTINCT COALESCE(m.keeper, pid) FROM unnest(j.property_ids) pid
+      LEFT JOIN property_merge m ON m.dup = pid
+    )
+    WHERE j.property_ids && ARRAY(SELECT dup FROM property_merge)
+    """,
+    "DELETE FROM property WHERE property_id IN (SELECT dup FROM property_merge)",
+]
+
+def _load_keys(conn: Connection):
+    conn.execute(text("CREATE TEMP TABLE property_key (property_id int PRIMARY KEY, key text) ON COMMIT DROP"))
+    rows = conn.execute(text("SELECT property_id, street, unit, city, state, zip FROM property")).all()
+    batch = [{"pid": r[0], "key": address_key(r[1], r[2], r[3], r[4], r[5])} for r in rows]
+    for i in range(0, len(batch), _CHUNK):
+        conn.execute(text("INSERT INTO property_key (property_id, key) VALUES (:pid, :key)"), batch[i:i + _CHUNK])
+
+def merge_duplicates(conn: Connection, dry_run: bool = False) -> dict:
+    """Re-key and merge in the caller's transaction. Returns counts."""
+    _load_keys(conn)
+    conn.execute(text("""
+        CREATE TEMP TABLE property_merge ON COMMIT DROP AS
+        SELECT property_id AS dup, min(property_id) OVER (PARTITION BY key) AS keeper
+        FROM property_key WHERE key IS NOT NULL
+    """))
+    conn.execute(text("DELETE FROM property_merge WHERE dup = keeper"))
+    merged = conn.execute(text("SELECT count(*) FROM property_merge")).scalar_one()
+    if dry_run:
+        return {"duplicates": merged, "rekeyed": 0}
+
+    if merged:
+        for step in _MERGE_STEPS:
+            conn.execute(text(step))
+        conn.execute(MARK_DIRTY_SQL)
+    # Clear changed keys first so two rows swapping keys never trip the unique index.
+    conn.execute(text("""
+        UPDATE property p SET address_key = NULL FROM property_key k
+        WHERE p.property_id = k.property_id AND p.address_key IS DISTINCT FROM k.key AND p.address_key IS NOT NULL
+    """))
+    rekeyed = conn.execute(text("""
+        UPDATE property p SET address_key = k.key FROM property_key k
+        WHERE p.property_id = k.property_id AND p.address_key IS DISTINCT FROM k.key
+    """)).rowcount
+    return {"duplicates": merged, "rekeyed": rekeyed}
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--db", default=None)
+    ap.add_argument("--dry-run", action="store_true", help="Only count duplicate properties")
+    args = ap.parse_args()
+
+    engine = create_engine(args.db or sync_url(os.environ["DATABASE_URL"]))
+    with engine.begin() as conn:
+        print(merge_duplicates(conn, dry_run=args.dry_run))
+
+if __name__ == "__main__":
+    main()
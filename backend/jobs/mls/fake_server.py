@@ -0,0 +1,44 @@
+"""
+Local stand-in for an MLS API, for development and load testing the refresher:
+
+    uvicorn jobs.mls.fake_server:app --port 8100
+    MLS_PROVIDER=http MLS_BASE_URL=http://localhost:8100 uvicorn main:app
+
+Serves the same drifting records as FakeMlsClient, honours If-None-Match, and
+answers 429 with Retry-After once its own token bucket (FAKE_MLS_QPS) runs dry.
+"""
+import os, time
+
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse
+
+from services.mls import fake_record, record_etag
+
+QPS = float(os.getenv("FAKE_MLS_QPS", "20"))
+PERIOD_S = float(os.getenv("MLS_FAKE_PERIOD", "3600"))
+
+app = FastAPI(title="Fake MLS")
+_bucket = {"tokens": QPS, "at": time.monotonic()}
+
+def _take() -> float:
+    """0 when a request may proceed, otherwise seconds until a token frees up."""
+    now = time.monotonic()
+    _bucket["tokens"] = min(QPS, _bucket["tokens"] + (now - _bucket["at"]) * QPS)
+    _bucket["at"] = now
+    if _bucket["tokens"] >= 1:
+        _bucket["tokens"] -= 1
+        return 0.0
+    return (1 - _bucket["tokens"]) / QPS
+
+@app.get("/listings/{mls_id}")
+async def get_listing(mls_id: str, request: Request):
+    wait = _take()
+    if wait:
+        return Response(status_code=429, headers={"Retry-After": f"{max(1, round(wait))}"})
+    if not mls_id.isdigit():
+        return JSONResponse({"detail": "Not found"}, status_code=404)
+    rec = fake_record(mls_id, period_s=PERIOD_S)
+    tag = record_etag(rec)
+    if request.headers.get("if-none-match") == tag:
+        return Response(status_code=304, headers={"ETag": tag})
+    return JSONResponse({"mls_id": rec.mls_id, "status": rec.status, "price": rec.price}, headers={"ETag": tag})
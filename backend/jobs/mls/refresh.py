@@ -0,0 +1,221 @@
+"""
+Keeps `listing.mls_status` and the price history in step with the MLS.
+
+Due listings are leased from `mls_refresh_state` in batches, looked up
+concurrently through services/mls.py (rate-limited, conditional requests), and
+the whole batch is written back in one transaction of set-based statements that
+only touch rows whose status or price actually moved. Unchanged listings get their
+next check pushed out by REFRESH_INTERVAL; failures back off exponentially.
+
+Runs inside the API when MLS_PROVIDER is set, or standalone:
+
+    python -m jobs.mls.refresh [--once] [--batch 200]
+"""
+from __future__ import annotations
+import argparse, asyncio, logging, os, random
+from dataclasses import dataclass
+from typing import Optional
+
+from db.main import AsyncSessionLocal
+from etl.helpers.mls import extract_mls_id
+from jobs.rollups import MARK_DIRTY_SQL
+from observability.metrics import MLS_FETCHES
+from services.events import event_hub, listing_events
+from services.mls import MlsClient, MlsResult, build_mls_client
+from .sql import (
+    CLAIM_SQL, INACTIVE_STATUSES, PRICE_SQL, PROGRESS_SQL, RETIRE_SQL, SEED_SQL, STATE_SQL, STATUS_SQL,
+)
+
+log = logging.getLogger(__name__)
+
+@dataclass
+class _Outcome:
+    listing_id: int
+    result: Optional[MlsResult] = None
+    error: Optional[str] = None
+
+class MlsRefresher:
+    def __init__(
+            self,
+            batch_size: int = 200,
+            refresh_interval: float = 6 * 3600.0,
+            poll_interval: float = 30.0,
+            seed_interval: float = 300.0,
+            lease_seconds: float = 600.0,
+            backoff_base: float = 60.0,
+            backoff_cap: float = 24 * 3600.0,
+    ):
+        self.batch_size = batch_size
+        self.refresh_interval = refresh_interval
+        self.poll_interval = poll_interval
+        self.seed_interval = seed_interval
+        self.lease_seconds = lease_seconds
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+
+        self.client: Optional[MlsClient] = None
+        self._task: Optional[asyncio.Task] = None
+
+        self.checked = 0
+        self.not_modified = 0
+        self.status_changes = 0
+        self.price_changes = 0
+        self.failed = 0
+
+    def start(self, client: MlsClient):
+        if self._task is None:
+            self.client = client
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "running": self._task is not None,
+            "provider": self.client.name if self.client else None,
+            "checked": self.checked,
+            "not_modified": self.not_modified,
+            "status_changes": self.status_changes,
+            "price_changes": self.price_changes,
+            "failed": self.failed,
+        }
+
+    async def seed(self) -> int:
+        async with AsyncSessionLocal() as session:
+            n = (await session.execute(SEED_SQL, {"inactive": list(INACTIVE_STATUSES)})).rowcount
+            await session.commit()
+            return n
+
+    async def run_batch(self) -> int:
+        """Refresh one batch of due listings. Returns how many were claimed."""
+        async with AsyncSessionLocal() as session:
+            rows = (await session.execute(CLAIM_SQL, {"batch": self.batch_size, "lease": self.lease_seconds})).mappings().all()
+            await session.commit()
+        if not rows:
+            return 0
+
+        outcomes = await asyncio.gather(*(self._lookup(r) for r in rows))
+        changed = await self._apply(rows, outcomes)
+        if changed:
+            for kind, data in listing_events(changed, op="upsert", source="mls"):
+                await event_hub.publish(kind, **data)
+        return len(rows)
+
+    async def _lookup(self, row) -> _Outcome:
+        mls_id = row["mls_id"] or extract_mls_id(row["mls_link"])
+        if not mls_id:
+            return _Outcome(row["listing_id"], error="no MLS id")
+        try:
+            return _Outcome(row["listing_id"], result=await self.client.fetch(mls_id, row["etag"]))
+        except Exception as e:
+            return _Outcome(row["listing_id"], error=f"{type(e).__name__}: {e}"[:500])
+
+    def _delay(self, failures: int) -> float:
+        if failures:
+            return min(self.backoff_cap, self.backoff_base * 2 ** (failures - 1)) * random.uniform(0.5, 1.0)
+        # Jitter spreads listings first seeded together across the interval.
+        return self.refresh_interval * random.uniform(0.8, 1.2)
+
+    async def _apply(self, rows, outcomes: list[_Outcome]) -> set[int]:
+        by_id = {r["listing_id"]: r for r in rows}
+        state = {k: [] for k in ("lids", "etags", "statuses", "prices", "changed", "errs", "delays")}
+        price_lids, prices, status_lids, statuses = [], [], [], []
+
+        for o in outcomes:
+            row = by_id[o.listing_id]
+            rec = o.result.record if o.result else None
+            moved = False
+            if o.error:
+                self.failed += 1
+                MLS_FETCHES.labels("error").inc()
+            elif o.result.not_modified:
+                self.not_modified += 1
+                MLS_FETCHES.labels("not_modified").inc()
+            elif rec is None:
+                MLS_FETCHES.labels("not_found").inc()
+            else:
+                MLS_FETCHES.labels("fetched").inc()
+                if rec.status and rec.status != row["mls_status"]:
+                    status_lids.append(o.listing_id)
+                    statuses.append(rec.status)
+                    moved = True
+                if rec.price is not None and (row["current_price"] is None or float(row["current_price"]) != rec.price):
+                    price_lids.append(o.listing_id)
+                    prices.append(rec.price)
+                    moved = True
+            self.checked += 1
+
+            state["lids"].append(o.listing_id)
+            state["etags"].append(o.result.etag if o.result else None)
+            state["statuses"].append(rec.status if rec else None)
+            state["prices"].append(rec.price if rec else None)
+            state["changed"].append(moved)
+            state["errs"].append(o.error)
+            state["delays"].append(self._delay(row["failures"] + 1 if o.error else 0))
+
+        changed: set[int] = set()
+        async with AsyncSessionLocal() as session:
+            if price_lids:
+                ids = (await session.execute(PRICE_SQL, {"lids": price_lids, "prices": prices})).scalars().all()
+                self.price_changes += len(ids)
+                changed.update(ids)
+            if status_lids:
+                ids = (await session.execute(STATUS_SQL, {"lids": status_lids, "statuses": statuses})).scalars().all()
+                self.status_changes += len(ids)
+                changed.update(ids)
+            await session.execute(STATE_SQL, state)
+            if status_lids:
+                await session.execute(RETIRE_SQL, {"lids": status_lids, "inactive": list(INACTIVE_STATUSES)})
+            if changed:
+                await session.execute(MARK_DIRTY_SQL)
+            await session.commit()
+        return changed
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        next_seed = 0.0
+        while True:
+            try:
+                if loop.time() >= next_seed:
+                    await self.seed()
+                    next_seed = loop.time() + self.seed_interval
+                claimed = await self.run_batch()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                log.exception("MLS refresh batch failed")
+                claimed = 0
+            if claimed < self.batch_size:
+                await asyncio.sleep(self.poll_interval * random.uniform(0.8, 1.2))
+
+mls_refresher = MlsRefresher(
+    batch_size=int(os.getenv("MLS_REFRESH_BATCH", "200")),
+    refresh_interval=float(os.getenv("MLS_REFRESH_INTERVAL", str(6 * 3600))),
+)
+
+async def _main(args):
+    client = build_mls_client()
+    mls_refresher.client = client
+    mls_refresher.batch_size = args.batch
+    try:
+        print("seeded", await mls_refresher.seed())
+        while await mls_refresher.run_batch() and not args.once:
+            pass
+        print(mls_refresher.stats())
+        async with AsyncSessionLocal() as session:
+            print(dict((await session.execute(PROGRESS_SQL)).mappings().one()))
+    finally:
+        await client.aclose()
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--once", action="store_true", help="Refresh a single batch and exit")
+    ap.add_argument("--batch", type=int, default=mls_refresher.batch_size)
+    asyncio.run(_main(ap.parse_args()))
+
+if __name__ == "__main__":
+    main()
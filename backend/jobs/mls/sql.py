@@ -0,0 +1,95 @@
+from sqlalchemy import text
+
+# Terminal statuses are not polled. Compared case-insensitively.
+INACTIVE_STATUSES = ("closed", "sold", "expired", "withdrawn", "canceled", "cancelled", "off market")
+
+SEED_SQL = text("""
+INSERT INTO mls_refresh_state (listing_id)
+SELECT l.listing_id
+FROM listing l
+WHERE COALESCE(l.mls_id, l.mls_link) IS NOT NULL
+  AND lower(btrim(COALESCE(l.mls_status, ''))) <> ALL(:inactive)
+  AND NOT EXISTS (SELECT 1 FROM mls_refresh_state s WHERE s.listing_id = l.listing_id)
+ON CONFLICT (listing_id) DO NOTHING
+""")
+
+# Claim a batch by leasing it: next_check_at moves past the lease, so a crash just
+# makes the batch due again later.
+CLAIM_SQL = text("""
+WITH due AS (
+  SELECT s.listing_id
+  FROM mls_refresh_state s
+  WHERE s.next_check_at <= now()
+  ORDER BY s.next_check_at, s.listing_id
+  LIMIT :batch
+  FOR UPDATE SKIP LOCKED
+)
+UPDATE mls_refresh_state s
+SET next_check_at = now() + make_interval(secs => :lease)
+FROM due
+JOIN listing l ON l.listing_id = due.listing_id
+LEFT JOIN LATERAL (
+  SELECT ph.price FROM price_history ph
+  WHERE ph.listing_id = l.listing_id
+  ORDER BY ph.effective_date DESC, ph.price_id DESC
+  LIMIT 1
+) lp ON TRUE
+WHERE s.listing_id = due.listing_id
+RETURNING s.listing_id, l.mls_id, l.mls_link, l.mls_status, s.etag, s.failures, lp.price AS current_price
+""")
+
+# Writes only what moved. The latest-price guard keeps a concurrent import (or a
+# re-run) from adding a duplicate point.
+PRICE_SQL = text("""
+INSERT INTO price_history (listing_id, effective_date, price)
+SELECT v.lid, CURRENT_DATE, v.price
+FROM unnest(CAST(:lids AS int[]), CAST(:prices AS numeric[])) AS v(lid, price)
+WHERE v.price IS DISTINCT FROM (
+  SELECT ph.price FROM price_history ph
+  WHERE ph.listing_id = v.lid
+  ORDER BY ph.effective_date DESC, ph.price_id DESC
+  LIMIT 1
+)
+RETURNING listing_id
+""")
+
+STATUS_SQL = text("""
+UPDATE listing l SET mls_status = v.status
+FROM unnest(CAST(:lids AS int[]), CAST(:statuses AS text[])) AS v(lid, status)
+WHERE l.listing_id = v.lid AND l.mls_status IS DISTINCT FROM v.status
+RETURNING l.listing_id
+""")
+
+STATE_SQL = text("""
+UPDATE mls_refresh_state s SET
+  etag = COALESCE(v.etag, s.etag),
+  last_status = COALESCE(v.status, s.last_status),
+  last_price = COALESCE(v.price, s.last_price),
+  last_checked_at = now(),
+  last_changed_at = CASE WHEN v.changed THEN now() ELSE s.last_changed_at END,
+  failures = CASE WHEN v.err IS NULL THEN 0 ELSE s.failures + 1 END,
+  last_error = v.err,
+  next_check_at = now() + make_interval(secs => v.delay)
+FROM unnest(CAST(:lids AS int[]), CAST(:etags AS text[]), CAST(:statuses AS text[]),
+            CAST(:prices AS numeric[]), CAST(:changed AS boolean[]), CAST(:errs AS text[]),
+            CAST(:delays AS double precision[]))
+     AS v(lid, etag, status, price, changed, err, delay)
+WHERE s.listing_id = v.lid
+""")
+
+# Listings that went terminal stop being polled.
+RETIRE_SQL = text("""
+DELETE FROM mls_refresh_state s
+USING listing l
+WHERE s.listing_id = l.listing_id
+  AND s.listing_id = ANY(CAST(:lids AS int[]))
+  AND lower(btrim(COALESCE(l.mls_status, ''))) = ANY(:inactive)
+""")
+
+PROGRESS_SQL = text("""
+SELECT count(*) AS tracked,
+       count(*) FILTER (WHERE next_check_at <= now()) AS due,
+       count(*) FILTER (WHERE failures > 0) AS failing,
+       max(last_checked_at) AS last_checked_at
+FROM mls_refresh_state
+""")
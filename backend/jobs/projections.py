@@ -0,0 +1,64 @@
+"""
+Writes each loan's projected balance and equity (services/amortization.py) back onto
+`loan`, so SQL consumers can filter on them. Runs as an ETL post-step and on demand:
+
+    python -m jobs.projections --db postgresql+psycopg2://... [--at 2026-01-01] [--term-months 300]
+"""
+from __future__ import annotations
+import argparse, os
+from datetime import date
+from time import perf_counter
+from typing import Optional
+
+import numpy as np
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Connection
+
+from db.migrate import sync_url
+from services.amortization import DEFAULT_TERM_MONTHS, LoanBook, book_query, project
+
+# Only rows whose projection actually moved are rewritten.
+STORE_SQL = text("""
+UPDATE loan lo
+SET projected_balance = v.bal, projected_equity = v.eq, projected_on = CAST(:at AS date)
+FROM unnest(CAST(:ids AS int[]), CAST(:bal AS numeric[]), CAST(:eq AS numeric[])) AS v(loan_id, bal, eq)
+WHERE lo.loan_id = v.loan_id
+  AND (lo.projected_balance, lo.projected_equity, lo.projected_on)
+      IS DISTINCT FROM (v.bal, v.eq, CAST(:at AS date))
+""")
+
+def _rounded(a: np.ndarray) -> list:
+    return [None if np.isnan(v) else round(float(v), 2) for v in a]
+
+def refresh_projections(conn: Connection, at: Optional[date] = None,
+                        term_months: int = DEFAULT_TERM_MONTHS, chunk: int = 10_000) -> dict:
+    at = at or date.today()
+    t0 = perf_counter()
+    sql, params = book_query()
+    book = LoanBook.from_rows(conn.execute(sql, params).all())
+    t1 = perf_counter()
+    p = project(book, at, term_months)
+    t2 = perf_counter()
+
+    ids, bal, eq = book.loan_id.tolist(), _rounded(p.balance), _rounded(p.equity_to_cover)
+    updated = 0
+    for i in range(0, len(ids), chunk):
+        res = conn.execute(STORE_SQL, {"at": at, "ids": ids[i:i + chunk],
+                                       "bal": bal[i:i + chunk], "eq": eq[i:i + chunk]})
+        updated += res.rowcount
+    return {"loans": len(book), "updated": updated,
+            "load_s": round(t1 - t0, 3), "project_s": round(t2 - t1, 4), "store_s": round(perf_counter() - t2, 3)}
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--db", default=None)
+    ap.add_argument("--at", type=date.fromisoformat, default=None, help="Projection date (default today)")
+    ap.add_argument("--term-months", type=int, default=DEFAULT_TERM_MONTHS)
+    args = ap.parse_args()
+
+    engine = create_engine(args.db or sync_url(os.environ["DATABASE_URL"]))
+    with engine.begin() as conn:
+        print(refresh_projections(conn, args.at, args.term_months))
+
+if __name__ == "__main__":
+    main()
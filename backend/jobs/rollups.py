@@ -0,0 +1,139 @@
+"""
+Rebuilds the analytics_* rollup tables read by GET /api/analytics/summary.
+
+Write paths (create_listing, the ETL) run MARK_DIRTY_SQL alongside their writes;
+the API's scheduler rebuilds only when markers exist, so the summary endpoint
+never aggregates raw tables. Archived listings (jobs/archive.py) still count.
+For cron-style use:
+
+    python -m jobs.rollups --db postgresql+psycopg2://... [--force]
+"""
+from __future__ import annotations
+import argparse, asyncio, logging, os
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Connection
+
+from db.migrate import sync_url
+
+log = logging.getLogger(__name__)
+
+LOCK_KEY = 7_240_132
+TRY_LOCK_SQL = text("SELECT pg_try_advisory_xact_lock(:k)").execution_options(query_stats_skip=True)
+
+MARK_DIRTY_SQL = text("INSERT INTO analytics_dirty DEFAULT VALUES")
+
+_PRICE_CUTS = """
+SELECT effective_date
+FROM (
+  SELECT effective_date,
+         price < lag(price) OVER (PARTITION BY listing_id ORDER BY effective_date, price_id) AS cut
+  FROM (SELECT listing_id, effective_date, price_id, price FROM price_history
+        UNION ALL
+        SELECT listing_id, effective_date, price_id, price FROM price_history_archive) ph
+) s
+WHERE cut
+"""
+
+_LISTING_FACTS = """
+SELECT l.date_added,
+       COALESCE(lo.loan_type, 'Unknown') AS loan_type,
+       COALESCE(NULLIF(btrim(l.mls_status), ''), 'Unknown') AS mls_status,
+       NULLIF(lo.interest_rate, 'NaN') AS interest_rate,
+       NULLIF(l.equity_to_cover, 'NaN') AS equity_to_cover
+FROM (SELECT property_id, date_added, mls_status, equity_to_cover FROM listing
+      UNION ALL
+      SELECT property_id, date_added, mls_status, equity_to_cover FROM listing_archive) l
+LEFT JOIN loan lo ON lo.property_id = l.property_id
+"""
+
+REBUILD_SEGMENTS_SQL = text(f"""
+INSERT INTO analytics_segment (loan_type, mls_status, listings)
+SELECT loan_type, mls_status, count(*)
+FROM ({_LISTING_FACTS}) f
+GROUP BY loan_type, mls_status
+""")
+
+REBUILD_TOTALS_SQL = text(f"""
+INSERT INTO analytics_totals (id, listings, rate_avg, rate_median, equity_median, price_cuts, refreshed_at)
+SELECT true,
+       count(*),
+       avg(interest_rate),
+       percentile_cont(0.5) WITHIN GROUP (ORDER BY interest_rate),
+       percentile_cont(0.5) WITHIN GROUP (ORDER BY equity_to_cover),
+       (SELECT count(*) FROM ({_PRICE_CUTS}) c),
+       now()
+FROM ({_LISTING_FACTS}) f
+""")
+
+REBUILD_BUCKETS_SQL = text(f"""
+WITH added AS (
+  SELECT date_trunc(:grain, date_added)::date AS bucket_start,
+         count(*) AS new_listings,
+         avg(interest_rate) AS rate_avg,
+         percentile_cont(0.5) WITHIN GROUP (ORDER BY interest_rate) AS rate_median,
+         percentile_cont(0.5) WITHIN GROUP (ORDER BY equity_to_cover) AS equity_median
+  FROM ({_LISTING_FACTS}) f
+  WHERE date_added IS NOT NULL
+  GROUP BY 1
+),
+cuts AS (
+  SELECT date_trunc(:grain, effective_date)::date AS bucket_start, count(*) AS price_cuts
+  FROM ({_PRICE_CUTS}) c
+  WHERE effective_date IS NOT NULL
+  GROUP BY 1
+)
+INSERT INTO analytics_bucket (grain, bucket_start, new_listings, price_cuts, rate_avg, rate_median, equity_median)
+SELECT CAST(:grain AS text), bucket_start,
+       COALESCE(a.new_listings, 0), COALESCE(c.price_cuts, 0),
+       a.rate_avg, a.rate_median, a.equity_median
+FROM added a
+FULL JOIN cuts c USING (bucket_start)
+""")
+
+def rebuild(conn: Connection, force: bool = False) -> bool:
+    """Rebuild every rollup in the caller's transaction. Returns False if skipped."""
+    if not conn.execute(TRY_LOCK_SQL, {"k": LOCK_KEY}).scalar_one():
+        return False
+    # Consume markers first. Each aggregate below runs with a later snapshot, so every
+    # write whose marker was deleted here is included; markers still uncommitted now
+    # are left for the next cycle.
+    consumed = conn.execute(text("""
+        WITH d AS (DELETE FROM analytics_dirty RETURNING 1)
+        SELECT count(*) FROM d
+    """)).scalar_one()
+    if not consumed and not force:
+        return False
+
+    conn.execute(text("DELETE FROM analytics_segment"))
+    conn.execute(REBUILD_SEGMENTS_SQL)
+    conn.execute(text("DELETE FROM analytics_totals"))
+    conn.execute(REBUILD_TOTALS_SQL)
+    conn.execute(text("DELETE FROM analytics_bucket"))
+    for grain in ("week", "month"):
+        conn.execute(REBUILD_BUCKETS_SQL, {"grain": grain})
+    return True
+
+async def run_scheduler(engine, interval_s: float):
+    """API background task: rebuild the rollups whenever a write marked them dirty."""
+    while True:
+        try:
+            async with engine.begin() as conn:
+                if await conn.run_sync(rebuild):
+                    log.info("analytics rollups rebuilt")
+        except Exception:
+            log.exception("analytics rollup rebuild failed")
+        await asyncio.sleep(interval_s)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--db", default=None)
+    ap.add_argument("--force", action="store_true", help="Rebuild even if nothing was marked dirty")
+    args = ap.parse_args()
+
+    engine = create_engine(args.db or sync_url(os.environ["DATABASE_URL"]))
+    with engine.begin() as conn:
+        print("rebuilt" if rebuild(conn, force=args.force) else "skipped (no changes or another rebuild running)")
+
+if __name__ == "__main__":
+    main()
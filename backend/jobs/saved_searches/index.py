@@ -0,0 +1,51 @@
+"""
+Inverted index over saved-search predicates.
+
+Each search is filed under its most selective equality filter: every ZIP it names,
+else every loan type, else a catch-all bucket. A changed listing is only evaluated
+against the searches filed under its own ZIP and loan type plus the catch-all, so
+the cost of a write grows with the searches that could match it rather than with
+every saved search.
+"""
+from __future__ import annotations
+from collections import defaultdict
+from typing import Any, Iterable, Mapping
+
+from services.filters import ListingFilters
+
+ANY = ("*",)
+
+def _keys(f: ListingFilters) -> list[tuple]:
+    if f.zip:
+        return [("zip", z[:5]) for z in f.zip]
+    if f.loan_type:
+        return [("loan_type", t) for t in f.loan_type]
+    return [ANY]
+
+class SavedSearchIndex:
+    def __init__(self, searches: Iterable[tuple[int, ListingFilters]] = ()):
+        self.filters: dict[int, ListingFilters] = {}
+        self._buckets: dict[tuple, set[int]] = defaultdict(set)
+        for sid, f in searches:
+            self.add(sid, f)
+
+    def __len__(self) -> int:
+        return len(self.filters)
+
+    def add(self, search_id: int, f: ListingFilters):
+        self.remove(search_id)
+        self.filters[search_id] = f
+        for k in _keys(f):
+            self._buckets[k].add(search_id)
+
+    def remove(self, search_id: int):
+        f = self.filters.pop(search_id, None)
+        if f is not None:
+            for k in _keys(f):
+                self._buckets[k].discard(search_id)
+
+    def candidates(self, facts: Mapping[str, Any]) -> set[int]:
+        out = set(self._buckets.get(ANY, ()))
+        out |= self._buckets.get(("zip", (facts.get("zip") or "")[:5]), set())
+        out |= self._buckets.get(("loan_type", facts.get("loan_type")), set())
+        return out
@@ -0,0 +1,119 @@
+"""
+Checks changed listings against saved searches and files new matches in their inbox.
+
+Reads the listing event stream through a Redis consumer group, so with several API
+processes each event is handled once, and events published while the API was down
+are processed on restart. A batch of events costs one facts query plus an
+in-memory evaluation of the candidate searches from SavedSearchIndex. A "bulk"
+event (a large import) re-runs every search in SQL instead.
+"""
+from __future__ import annotations
+import asyncio, json, logging, os, socket
+from typing import Optional
+
+from redis.asyncio import Redis
+
+from db.main import AsyncSessionLocal
+from services.events import StreamConsumer
+from services.filters import ListingFilters
+from .index import SavedSearchIndex
+from .sql import FACTS_SQL, RECORD_MATCHES_SQL, SEARCHES_SQL, SEARCHES_VERSION_SQL, full_match_sql
+
+log = logging.getLogger(__name__)
+
+GROUP = "saved-search-matcher"
+
+def parse_filters(raw) -> ListingFilters:
+    return ListingFilters.model_validate(json.loads(raw) if isinstance(raw, str) else raw or {})
+
+class SavedSearchMatcher:
+    def __init__(self, batch_size: int = 500):
+        self.batch_size = batch_size
+        self.index = SavedSearchIndex()
+        self._version = None
+        self._consumer: Optional[StreamConsumer] = None
+        self._task: Optional[asyncio.Task] = None
+        self.events = 0
+        self.evaluated = 0
+        self.matches = 0
+        self.full_runs = 0
+
+    def start(self, redis: Redis):
+        if self._task is None:
+            self._consumer = StreamConsumer(redis, GROUP, f"{socket.gethostname()}-{os.getpid()}")
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "searches": len(self.index),
+            "events": self.events,
+            "evaluated": self.evaluated,
+            "matches": self.matches,
+            "full_runs": self.full_runs,
+        }
+
+    async def _sync_index(self, session):
+        """Reload the predicates when saved searches were added, edited or deleted."""
+        version = tuple((await session.execute(SEARCHES_VERSION_SQL)).one())
+        if version != self._version:
+            rows = (await session.execute(SEARCHES_SQL)).all()
+            self.index = SavedSearchIndex((sid, parse_filters(f)) for sid, f in rows)
+            self._version = version
+
+    async def process(self, listing_ids: set[int], bulk: bool = False) -> int:
+        async with AsyncSessionLocal() as session:
+            await self._sync_index(session)
+            if not len(self.index):
+                return 0
+            if bulk:
+                self.full_runs += 1
+                new = 0
+                for sid, f in self.index.filters.items():
+                    where, params = f.where()
+                    new += (await session.execute(full_match_sql(where, seen=False), {**params, "search_id": sid})).rowcount
+            else:
+                facts = (await session.execute(FACTS_SQL, {"ids": sorted(listing_ids)})).mappings().all()
+                sids, lids = [], []
+                for row in facts:
+                    candidates = self.index.candidates(row)
+                    self.evaluated += len(candidates)
+                    hits = [sid for sid in candidates if self.index.filters[sid].matches(row)]
+                    sids += hits
+                    lids += [row["listing_id"]] * len(hits)
+                new = 0
+                if sids:
+                    new = len((await session.execute(RECORD_MATCHES_SQL, {"sids": sids, "lids": lids})).all())
+            await session.commit()
+        self.matches += new
+        return new
+
+    async def _run(self):
+        ready = False
+        while True:
+            try:
+                if not ready:
+                    await self._consumer.ensure_group()
+                    ready = True
+                events = await self._consumer.read(count=self.batch_size)
+                if not events:
+                    continue
+                ids = {e.data["id"] for e in events if e.type == "listing" and e.data.get("op") != "delete"}
+                bulk = any(e.type == "bulk" for e in events)
+                if ids or bulk:
+                    await self.process(ids, bulk=bulk)
+                await self._consumer.ack(events)
+                self.events += len(events)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                log.exception("saved search matching failed; will retry the batch")
+                self._consumer.retry()
+                await asyncio.sleep(5.0)
+
+saved_search_matcher = SavedSearchMatcher()
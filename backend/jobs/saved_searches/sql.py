@@ -0,0 +1,45 @@
+from sqlalchemy import text
+
+# Same aliases as BASE_LIST_SQL, so ListingFilters.where() applies unchanged.
+LISTING_FROM = """
+FROM listing l
+JOIN property p ON p.property_id = l.property_id
+LEFT JOIN loan lo ON lo.property_id = l.property_id
+LEFT JOIN LATERAL (
+  SELECT ph.price FROM price_history ph
+  WHERE ph.listing_id = l.listing_id
+  ORDER BY ph.effective_date DESC, ph.price_id DESC
+  LIMIT 1
+) lp ON TRUE
+"""
+
+# Everything ListingFilters.matches() reads.
+FACTS_SQL = text(f"""
+SELECT l.listing_id, lo.loan_type, p.zip, l.mls_status, lo.interest_rate, lo.investor_allowed,
+       l.equity_to_cover, lp.price, p.beds
+{LISTING_FROM}
+WHERE l.listing_id = ANY(:ids)
+""").execution_options(metric_name="saved_search_facts")
+
+SEARCHES_SQL = text("SELECT search_id, filters FROM saved_search")
+
+SEARCHES_VERSION_SQL = text("SELECT count(*), max(updated_at) FROM saved_search")
+
+RECORD_MATCHES_SQL = text("""
+INSERT INTO saved_search_match (search_id, listing_id)
+SELECT s, l FROM unnest(CAST(:sids AS int[]), CAST(:lids AS int[])) AS m(s, l)
+WHERE EXISTS (SELECT 1 FROM listing WHERE listing_id = m.l)
+ON CONFLICT DO NOTHING
+RETURNING search_id, listing_id
+""")
+
+def full_match_sql(where: list[str], seen: bool):
+    """INSERT of every current match for one search (backfill, or after a bulk event)."""
+    cond = " AND ".join(where) if where else "TRUE"
+    return text(f"""
+    INSERT INTO saved_search_match (search_id, listing_id, seen)
+    SELECT :search_id, l.listing_id, {'true' if seen else 'false'}
+    {LISTING_FROM}
+    WHERE {cond}
+    ON CONFLICT DO NOTHING
+    """).execution_options(metric_name="saved_search_full_match")
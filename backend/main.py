@@ -1,13 +1,110 @@
-import os
+import asyncio, os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from redis.asyncio import Redis
 from fastapi_limiter import FastAPILimiter
+from redis.asyncio import Redis
 
 from routes.listings.router import router as listings_router
 from routes.auth.router import router as auth_router
+from routes.admin.router import router as admin_router
+from routes.analytics.router import router as analytics_router
+from routes.imports.router import router as imports_router
+from routes.saved_searches.router import router as saved_searches_router
+from db.main import AsyncSessionLocal, async_engine, init_db, query_stats, replica_engine
+from db.replica import ReadYourWritesMiddleware, replica_monitor
+from jobs.geocode.worker import geocode_workers
+from jobs.imports.runner import import_runner
+from jobs.mls.refresh import mls_refresher
+from jobs.saved_searches.matcher import saved_search_matcher
+from jobs.archive import run_scheduler as run_archive
+from jobs.deal_score import deal_scorer
+from jobs.rollups import run_scheduler as run_rollups
+from services.comparables import comparables
+from services.create_coalescer import create_coalescer
+from services.events import event_hub
+from services.geocoder import build_geocoder, set_geocoder
+from services.listing_snapshot import listing_snapshot
+from services.mls import build_mls_client
+from observability.metrics import InstrumentedRedis, MetricsMiddleware, metrics_endpoint
+
+LISTING_SNAPSHOT = os.getenv("LISTING_SNAPSHOT", "1") == "1"
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if os.getenv("DB_AUTO_MIGRATE", "1") == "1":
+        await init_db()
+
+    redis = InstrumentedRedis.from_url(os.environ["REDIS_URL"], encoding="utf-8", decode_responses=True)
+    async def id_fn(request):
+        fwd = request.headers.get("x-forwarded-for")
+        return fwd.split(",")[0].strip() if fwd else request.client.host
+    await FastAPILimiter.init(redis, identifier=id_fn)
+    replica_monitor.start(async_engine, replica_engine)
+
+    # Separate client: the hub parks a blocking XREAD on it, which would otherwise
+    # skew the rate limiter's Redis latency metrics.
+    events_redis = Redis.from_url(os.environ["REDIS_URL"], encoding="utf-8", decode_responses=True)
+    event_hub.start(events_redis)
+    comparables.start(async_engine)
+    if LISTING_SNAPSHOT:
+        listing_snapshot.start(async_engine)
+    saved_search_matcher.start(events_redis)
+    deal_scorer.start(async_engine, events_redis)
 
-app = FastAPI(title="Assumables API")
+    geocoder = build_geocoder()
+    set_geocoder(geocoder)
+    app.state.geocoder = geocoder
+    geocode_workers.start()
+    create_coalescer.start(AsyncSessionLocal)
+
+    mls_client = build_mls_client()
+    if mls_client.name != "none":
+        mls_refresher.start(mls_client)
+
+    persist_stats = os.getenv("QUERY_STATS_PERSIST", "0") == "1"
+    if persist_stats:
+        async with async_engine.connect() as conn:
+            await conn.run_sync(query_stats.load)
+    background = [
+        asyncio.create_task(query_stats.run_explainer(async_engine)),
+        asyncio.create_task(run_rollups(async_engine, float(os.getenv("ANALYTICS_REFRESH_SECONDS", "60")))),
+    ]
+    archive_every = float(os.getenv("ARCHIVE_INTERVAL_SECONDS", "86400"))
+    if archive_every > 0:
+        background.append(asyncio.create_task(run_archive(async_engine, archive_every)))
+    if persist_stats:
+        background.append(asyncio.create_task(
+            query_stats.run_persister(async_engine, float(os.getenv("QUERY_STATS_PERSIST_INTERVAL", "60")))
+        ))
+
+    yield
+
+    for t in background:
+        t.cancel()
+    await asyncio.gather(*background, return_exceptions=True)
+    if persist_stats:
+        async with async_engine.begin() as conn:
+            await conn.run_sync(query_stats.persist)
+    await saved_search_matcher.stop()
+    await deal_scorer.stop()
+    await comparables.stop()
+    await listing_snapshot.stop()
+    await event_hub.stop()
+    await events_redis.aclose()
+    await create_coalescer.stop()
+    await import_runner.stop()
+    await mls_refresher.stop()
+    await mls_client.aclose()
+    await geocode_workers.stop()
+    await geocoder.aclose()
+    set_geocoder(None)
+    await redis.aclose()
+    await replica_monitor.stop()
+    if replica_engine is not None:
+        await replica_engine.dispose()
+
+app = FastAPI(title="Assumables API", lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:5173"],
@@ -15,14 +112,14 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
-
-@app.on_event("startup")
-async def startup():
-    redis = Redis.from_url(os.environ["REDIS_URL"], encoding="utf-8", decode_responses=True)
-    async def id_fn(request):
-        fwd = request.headers.get("x-forwarded-for")
-        return fwd.split(",")[0].strip() if fwd else request.client.host
-    await FastAPILimiter.init(redis, identifier=id_fn)
+app.add_middleware(MetricsMiddleware)
+# The rw_lsn cookie also keeps a writer's list reads off the snapshot until NOTIFY has patched it.
+app.add_middleware(ReadYourWritesMiddleware, engine=async_engine, enabled=replica_engine is not None or LISTING_SNAPSHOT)
+app.add_route("/metrics", metrics_endpoint, include_in_schema=False)
 
 app.include_router(auth_router, prefix="/api")
-app.include_router(listings_router, prefix="/api")
\ No newline at end of file
+app.include_router(listings_router, prefix="/api")
+app.include_router(admin_router, prefix="/api")
+app.include_router(analytics_router, prefix="/api")
+app.include_router(imports_router, prefix="/api")
+app.include_router(saved_searches_router, prefix="/api")
\ No newline at end of file
@@ -0,0 +1,153 @@
+from __future__ import annotations
+import re
+from time import perf_counter
+
+from prometheus_client import Counter, Gauge, Histogram, generate_latest, CONTENT_TYPE_LATEST
+from redis.asyncio import Redis
+from sqlalchemy import event
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.routing import Match
+
+_FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template",
+    ["method", "route", "status"], buckets=_FAST_BUCKETS,
+)
+HTTP_IN_FLIGHT = Gauge("http_requests_in_flight", "Requests currently being served", ["method", "route"])
+LOAD_SHED = Counter("http_shed_total", "Requests rejected with 503 by a route limit", ["limit", "reason"])
+ROUTE_ACTIVE = Gauge("http_limit_active", "Requests holding a slot of a route limit", ["limit"])
+ROUTE_WAITING = Gauge("http_limit_waiting", "Requests queued for a slot of a route limit", ["limit"])
+
+SQL_LATENCY = Histogram(
+    "sql_statement_duration_seconds", "Time spent in cursor.execute per statement",
+    ["statement"], buckets=_FAST_BUCKETS,
+)
+SQL_ERRORS = Counter("sql_statement_errors_total", "Statements that raised", ["statement"])
+
+POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds", "Time to obtain a pooled connection (includes connects)",
+    buckets=_FAST_BUCKETS,
+)
+POOL_SIZE = Gauge("db_pool_size", "Configured pool size")
+POOL_CHECKED_OUT = Gauge("db_pool_checked_out", "Connections currently checked out")
+POOL_OVERFLOW = Gauge("db_pool_overflow", "Connections open beyond the pool size")
+
+GEOCODER_LATENCY = Histogram(
+    "geocoder_request_duration_seconds", "Upstream geocoder call latency",
+    ["provider", "outcome"], buckets=_FAST_BUCKETS,
+)
+GEOCODER_COALESCED = Counter("geocoder_coalesced_total", "Lookups served by an in-flight call for the same address")
+GEOCODER_LOCAL_MATCHES = Counter("geocoder_local_matches_total", "Local index lookups by best match kind", ["match"])
+GEOCODE_JOBS = Counter("geocode_jobs_total", "Geocode queue jobs finished", ["outcome"])
+GEOCODE_JOB_LATENCY = Histogram(
+    "geocode_job_latency_seconds", "Enqueue-to-finish latency of geocode jobs",
+    buckets=(0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 900, 3600),
+)
+
+REPLICA_LAG_BYTES = Gauge("db_replica_lag_bytes", "Primary WAL position minus replica replay position (-1 unknown)")
+REPLICA_HEALTHY = Gauge("db_replica_healthy", "1 while GET endpoints are being served from the replica")
+READ_ROUTE = Counter("db_read_route_total", "Read sessions by the engine they were routed to", ["target"])
+
+MLS_FETCHES = Counter("mls_fetches_total", "MLS refresher lookups", ["outcome"])
+
+REDIS_LATENCY = Histogram(
+    "redis_command_duration_seconds", "Redis command latency (rate limiter)",
+    ["command"], buckets=_FAST_BUCKETS,
+)
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware: labels by route template (`/api/listings/{lid}`), never by raw
+    path, so label cardinality stays bounded. Unmatched paths are reported as "unmatched".
+    """
+    def __init__(self, app, skip_paths: tuple[str, ...] = ("/metrics",)):
+        self.app = app
+        self.skip_paths = skip_paths
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.skip_paths:
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        route = _route_template(scope)
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        in_flight = HTTP_IN_FLIGHT.labels(method, route)
+        in_flight.inc()
+        start = perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            in_flight.dec()
+            HTTP_LATENCY.labels(method, route, str(status["code"])).observe(perf_counter() - start)
+
+def _route_template(scope) -> str:
+    app = scope.get("app")
+    router = getattr(app, "router", None)
+    for route in getattr(router, "routes", ()):
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return getattr(route, "path", "unmatched")
+    return "unmatched"
+
+_WITH_PREFIX = r"^\s*(?:WITH\b.*?\)\s*)?"
+_WRITE_RE = re.compile(_WITH_PREFIX + r"(INSERT\s+INTO|UPDATE)\s+([a-z_][\w.]*)", re.IGNORECASE | re.DOTALL)
+_READ_RE = re.compile(_WITH_PREFIX + r"(SELECT|DELETE)\b.*?\bFROM\s+([a-z_][\w.]*)", re.IGNORECASE | re.DOTALL)
+_label_cache: dict[str, str] = {}
+
+def statement_label(statement: str, execution_options=None) -> str:
+    """`metric_name` execution option if set, else verb:table from the SQL text."""
+    if execution_options and execution_options.get("metric_name"):
+        return execution_options["metric_name"]
+    label = _label_cache.get(statement)
+    if label is None:
+        m = _WRITE_RE.match(statement) or _READ_RE.match(statement)
+        label = f"{m.group(1).split()[0].lower()}:{m.group(2).lower()}" if m else "other"
+        if len(_label_cache) < 1024:
+            _label_cache[statement] = label
+    return label
+
+def instrument_engine(engine, pool_gauges: bool = True):
+    """Attach SQL timing and (for the primary engine) pool gauges to an Engine or AsyncEngine."""
+    sync_engine = getattr(engine, "sync_engine", engine)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        context._metrics_start = perf_counter()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        start = getattr(context, "_metrics_start", None)
+        if start is not None:
+            SQL_LATENCY.labels(statement_label(statement, context.execution_options)).observe(perf_counter() - start)
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _error(exc_ctx):
+        if exc_ctx.statement:
+            opts = exc_ctx.execution_context.execution_options if exc_ctx.execution_context else None
+            SQL_ERRORS.labels(statement_label(exc_ctx.statement, opts)).inc()
+
+    pool = sync_engine.pool
+    if pool_gauges and hasattr(pool, "size"):
+        POOL_SIZE.set_function(pool.size)
+        POOL_CHECKED_OUT.set_function(pool.checkedout)
+        POOL_OVERFLOW.set_function(lambda: max(0, pool.overflow()))
+
+class InstrumentedRedis(Redis):
+    async def execute_command(self, *args, **options):
+        start = perf_counter()
+        try:
+            return await super().execute_command(*args, **options)
+        finally:
+            REDIS_LATENCY.labels(str(args[0]).lower() if args else "unknown").observe(perf_counter() - start)
+
+async def metrics_endpoint(request: Request) -> Response:
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,287 @@
+from __future__ import annotations
+import asyncio, hashlib, json, logging, re, time
+from collections import deque
+from dataclasses import dataclass, field
+from time import perf_counter
+from typing import Optional
+
+from sqlalchemy import event, text
+
+log = logging.getLogger(__name__)
+
+_COMMENT_RE = re.compile(r"--[^\n]*|/\*.*?\*/", re.S)
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_PARAM_RE = re.compile(r"\$\d+|%\([^)]+\)s|%s|(?<![:\w]):\w+")
+_NUMBER_RE = re.compile(r"(?<![\w.$])-?\d+(?:\.\d+)?\b")
+_IN_LIST_RE = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WS_RE = re.compile(r"\s+")
+_WRITE_RE = re.compile(r"\b(INSERT|UPDATE|DELETE|MERGE|CREATE|ALTER|DROP|TRUNCATE|COPY|CALL|LOCK|SET)\b", re.I)
+
+def normalize_statement(statement: str) -> str:
+    """Strip comments, literals and placeholders so one query shape maps to one fingerprint."""
+    s = _COMMENT_RE.sub(" ", statement)
+    s = _STRING_RE.sub("?", s)
+    s = _PARAM_RE.sub("?", s)
+    s = _NUMBER_RE.sub("?", s)
+    s = _IN_LIST_RE.sub("(?)", s)
+    return _WS_RE.sub(" ", s).strip().rstrip(";")
+
+def fingerprint(normalized: str) -> str:
+    return hashlib.sha1(normalized.encode()).hexdigest()[:16]
+
+_CALL_RE = re.compile(r"\b([A-Za-z_][\w.]*)\s*\(")
+# Words followed by "(" that are syntax, not function calls.
+_NOT_CALLS = frozenset({
+    "select", "from", "where", "and", "or", "not", "in", "any", "all", "some", "exists", "values", "as", "on",
+    "using", "over", "filter", "within", "lateral", "join", "then", "else", "when", "case", "is", "by", "with",
+    "cast", "row", "array", "interval", "numeric", "decimal", "varchar", "char", "timestamp", "time", "union",
+})
+# Built-ins with no side effects. EXPLAIN ANALYZE runs the statement, so only a
+# statement that calls nothing outside this set is sampled with ANALYZE: a SELECT
+# can take locks (pg_advisory_lock), bump sequences (nextval/setval) or write
+# through a plpgsql function (create_listing_v1), and rolling back undoes none of
+# the waiting and not all of the effects.
+_PURE_CALLS = frozenset({
+    "count", "sum", "avg", "min", "max", "bool_and", "bool_or", "array_agg", "json_agg", "jsonb_agg",
+    "string_agg", "percentile_cont", "percentile_disc", "stddev", "row_number", "rank", "dense_rank",
+    "lag", "lead", "coalesce", "nullif", "greatest", "least", "lower", "upper", "btrim", "trim", "length",
+    "substring", "replace", "concat", "abs", "round", "floor", "ceil", "power", "sqrt", "extract",
+    "date_trunc", "date_part", "to_char", "age", "now", "make_date", "generate_series", "unnest",
+    "array_length", "cardinality", "jsonb_build_object", "json_build_object", "jsonb_build_array",
+    "to_jsonb", "jsonb_object_agg", "jsonb_array_elements", "jsonb_array_length", "md5",
+})
+
+def _is_read_only(statement: str) -> bool:
+    head = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+    return head in ("SELECT", "WITH") and not _WRITE_RE.search(_STRING_RE.sub("", statement))
+
+def _safe_to_analyze(statement: str) -> bool:
+    """True when re-running `statement` cannot lock or write anything (see _PURE_CALLS)."""
+    s = _STRING_RE.sub("", _COMMENT_RE.sub(" ", statement))
+    return all(
+        name.lower() in _NOT_CALLS or name.lower() in _PURE_CALLS
+        for name in _CALL_RE.findall(s)
+    )
+
+def _pct(sorted_vals: list[float], q: float) -> Optional[float]:
+    if not sorted_vals:
+        return None
+    return sorted_vals[min(len(sorted_vals) - 1, int(round(q * (len(sorted_vals) - 1))))]
+
+@dataclass
+class _Entry:
+    query: str
+    calls: int = 0
+    total_ms: float = 0.0
+    max_ms: float = 0.0
+    samples: deque = field(default_factory=lambda: deque(maxlen=1024))
+    explains: deque = field(default_factory=lambda: deque(maxlen=3))
+    last_explain_at: float = 0.0
+
+class QueryStats:
+    """
+    Per-fingerprint call counts and a rolling window of latencies for every statement an
+    engine executes. Read-only statements slower than `slow_ms` get a plan captured on
+    a separate connection, at most once per `explain_interval_s` per fingerprint:
+    EXPLAIN (ANALYZE, BUFFERS) when the statement only calls side-effect-free
+    built-ins, plain EXPLAIN otherwise.
+    """
+    def __init__(self, source: str = "api", slow_ms: float = 250.0, explain_interval_s: float = 300.0):
+        self.source = source
+        self.slow_ms = slow_ms
+        self.explain_interval_s = explain_interval_s
+        self._entries: dict[str, _Entry] = {}
+        self._fp_cache: dict[str, tuple[str, str]] = {}
+        self._pending_explains: deque = deque(maxlen=32)
+        self._wake: Optional[asyncio.Event] = None
+
+    # --- collection -------------------------------------------------------
+
+    def install(self, engine):
+        sync_engine = getattr(engine, "sync_engine", engine)
+
+        @event.listens_for(sync_engine, "before_cursor_execute")
+        def _before(conn, cursor, statement, parameters, context, executemany):
+            context._qs_start = perf_counter()
+
+        @event.listens_for(sync_engine, "after_cursor_execute")
+        def _after(conn, cursor, statement, parameters, context, executemany):
+            start = getattr(context, "_qs_start", None)
+            if start is None or context.execution_options.get("query_stats_skip"):
+                return
+            self.record(statement, (perf_counter() - start) * 1000.0, parameters, executemany)
+
+    def record(self, statement: str, elapsed_ms: float, parameters=None, executemany: bool = False):
+        cached = self._fp_cache.get(statement)
+        if cached is None:
+            norm = normalize_statement(statement)
+            cached = (fingerprint(norm), norm)
+            if len(self._fp_cache) < 4096:
+                self._fp_cache[statement] = cached
+        fid, norm = cached
+
+        e = self._entries.get(fid)
+        if e is None:
+            e = self._entries[fid] = _Entry(query=norm)
+        e.calls += 1
+        e.total_ms += elapsed_ms
+        e.max_ms = max(e.max_ms, elapsed_ms)
+        e.samples.append(elapsed_ms)
+
+        if (
+            elapsed_ms >= self.slow_ms
+            and not executemany
+            and time.monotonic() - e.last_explain_at >= self.explain_interval_s
+            and _is_read_only(statement)
+        ):
+            e.last_explain_at = time.monotonic()
+            self._pending_explains.append((fid, statement, parameters, elapsed_ms))
+            if self._wake is not None:
+                self._wake.set()
+
+    # --- reporting --------------------------------------------------------
+
+    def snapshot(self, order: str = "total", limit: int = 50) -> list[dict]:
+        rows = []
+        for fid, e in self._entries.items():
+            s = sorted(e.samples)
+            rows.append({
+                "source": self.source,
+                "fingerprint": fid,
+                "query": e.query,
+                "calls": e.calls,
+                "total_ms": round(e.total_ms, 3),
+                "mean_ms": round(e.total_ms / e.calls, 3) if e.calls else None,
+                "max_ms": round(e.max_ms, 3),
+                "p50_ms": _pct(s, 0.50),
+                "p95_ms": _pct(s, 0.95),
+                "p99_ms": _pct(s, 0.99),
+                "window": len(s),
+                "explains": list(e.explains),
+            })
+        key = {"total": "total_ms", "calls": "calls", "p95": "p95_ms", "p99": "p99_ms", "max": "max_ms"}.get(order, "total_ms")
+        rows.sort(key=lambda r: r[key] or 0, reverse=True)
+        return rows[:limit]
+
+    # --- EXPLAIN sampling -------------------------------------------------
+
+    def _explain(self, conn, fid: str, statement: str, parameters, elapsed_ms: float):
+        conn = conn.execution_options(query_stats_skip=True)
+        if isinstance(parameters, list):
+            parameters = tuple(parameters)
+        analyze = _safe_to_analyze(statement)
+        options = "ANALYZE, BUFFERS, FORMAT JSON" if analyze else "FORMAT JSON"
+        trans = conn.begin()
+        try:
+            conn.exec_driver_sql("SET LOCAL statement_timeout = '30s'")
+            plan = conn.exec_driver_sql(f"EXPLAIN ({options}) {statement}", parameters or ()).scalar_one()
+        finally:
+            trans.rollback()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        e = self._entries.get(fid)
+        if e is not None:
+            e.explains.append({
+                "captured_at": time.time(),
+                "observed_ms": round(elapsed_ms, 3),
+                "analyzed": analyze,
+                "plan": plan,
+            })
+
+    def drain_explains_sync(self, engine):
+        while self._pending_explains:
+            item = self._pending_explains.popleft()
+            try:
+                with engine.connect() as conn:
+                    self._explain(conn, *item)
+            except Exception:
+                log.exception("EXPLAIN sample failed for %s", item[0])
+
+    async def run_explainer(self, engine):
+        """Background task: EXPLAIN queued slow statements on their own connection."""
+        self._wake = asyncio.Event()
+        while True:
+            await self._wake.wait()
+            self._wake.clear()
+            while self._pending_explains:
+                item = self._pending_explains.popleft()
+                try:
+                    async with engine.connect() as conn:
+                        await conn.run_sync(lambda c: self._explain(c, *item))
+                except Exception:
+                    log.exception("EXPLAIN sample failed for %s", item[0])
+
+    # --- persistence ------------------------------------------------------
+
+    def persist(self, conn):
+        """Upsert this source's counters into query_stat (sync Connection)."""
+        for fid, e in list(self._entries.items()):
+            conn.execute(PERSIST_SQL, {
+                "source": self.source, "fp": fid, "query": e.query,
+                "calls": e.calls, "total": e.total_ms, "max": e.max_ms,
+                "samples": list(e.samples),
+                "explains": json.dumps(list(e.explains)),
+            })
+
+    def load(self, conn):
+        rows = conn.execute(LOAD_SQL, {"source": self.source}).mappings()
+        for r in rows:
+            e = _Entry(query=r["query"], calls=r["calls"], total_ms=r["total_ms"], max_ms=r["max_ms"])
+            e.samples.extend(r["samples_ms"] or [])
+            e.explains.extend(r["explains"] or [])
+            self._entries[r["fingerprint"]] = e
+
+    async def run_persister(self, engine, interval_s: float):
+        while True:
+            await asyncio.sleep(interval_s)
+            try:
+                async with engine.begin() as conn:
+                    await conn.run_sync(self.persist)
+            except Exception:
+                log.exception("Persisting query stats failed")
+
+PERSIST_SQL = text("""
+INSERT INTO query_stat (source, fingerprint, query, calls, total_ms, max_ms, samples_ms, explains, updated_at)
+VALUES (:source, :fp, :query, :calls, :total, :max, :samples, CAST(:explains AS jsonb), now())
+ON CONFLICT (source, fingerprint) DO UPDATE SET
+  calls = EXCLUDED.calls,
+  total_ms = EXCLUDED.total_ms,
+  max_ms = EXCLUDED.max_ms,
+  samples_ms = EXCLUDED.samples_ms,
+  explains = EXCLUDED.explains,
+  updated_at = now()
+""").execution_options(query_stats_skip=True)
+
+LOAD_SQL = text("""
+SELECT fingerprint, query, calls, total_ms, max_ms, samples_ms, explains
+FROM query_stat WHERE source = :source
+""").execution_options(query_stats_skip=True)
+
+OTHER_SOURCES_SQL = text("""
+SELECT source, fingerprint, query, calls, total_ms, max_ms, samples_ms, explains, updated_at
+FROM query_stat WHERE source <> :source
+ORDER BY total_ms DESC
+LIMIT :limit
+""").execution_options(query_stats_skip=True)
+
+def persisted_rows(rows) -> list[dict]:
+    """Shape rows from OTHER_SOURCES_SQL like `QueryStats.snapshot` output."""
+    out = []
+    for r in rows:
+        s = sorted(r["samples_ms"] or [])
+        out.append({
+            "source": r["source"],
+            "fingerprint": r["fingerprint"],
+            "query": r["query"],
+            "calls": r["calls"],
+            "total_ms": r["total_ms"],
+            "mean_ms": round(r["total_ms"] / r["calls"], 3) if r["calls"] else None,
+            "max_ms": r["max_ms"],
+            "p50_ms": _pct(s, 0.50),
+            "p95_ms": _pct(s, 0.95),
+            "p99_ms": _pct(s, 0.99),
+            "window": len(s),
+            "explains": r["explains"] or [],
+            "updated_at": r["updated_at"],
+        })
+    return out
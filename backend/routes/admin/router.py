@@ -0,0 +1,80 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db.main import get_session, query_stats
+from db.replica import replica_monitor
+from observability.query_stats import OTHER_SOURCES_SQL, persisted_rows
+from jobs.geocode.sql import DEPTH_SQL
+from jobs.deal_score import deal_scorer
+from jobs.geocode.worker import geocode_workers
+from jobs.mls.refresh import mls_refresher
+from jobs.mls.sql import PROGRESS_SQL as MLS_PROGRESS_SQL
+from jobs.saved_searches.matcher import saved_search_matcher
+from services.comparables import comparables
+from services.create_coalescer import create_coalescer
+from services.events import event_hub
+from services.listing_snapshot import listing_snapshot
+from services.load_shed import load_shed_stats
+from ..auth.router import require_auth
+
+router = APIRouter(prefix="/admin", tags=["admin"], dependencies=[Depends(require_auth)])
+
+@router.get("/geocode-queue")
+async def geocode_queue(session: AsyncSession = Depends(get_session)):
+    rows = (await session.execute(DEPTH_SQL)).mappings().all()
+    depth = {r["status"]: {"jobs": r["jobs"], "oldest_age_s": float(r["oldest_age_s"] or 0)} for r in rows}
+    return {
+        "pending": depth.get("pending", {"jobs": 0, "oldest_age_s": 0.0}),
+        "running": depth.get("running", {"jobs": 0, "oldest_age_s": 0.0}),
+        "workers": geocode_workers.stats(),
+    }
+
+@router.get("/mls-refresh")
+async def mls_refresh(session: AsyncSession = Depends(get_session)):
+    progress = (await session.execute(MLS_PROGRESS_SQL)).mappings().one()
+    return {**dict(progress), "refresher": mls_refresher.stats()}
+
+@router.get("/events")
+async def events_report():
+    return event_hub.stats()
+
+@router.get("/saved-search-matcher")
+async def saved_search_matcher_report():
+    return saved_search_matcher.stats()
+
+@router.get("/replica")
+async def replica_report():
+    return replica_monitor.stats()
+
+@router.get("/listing-snapshot")
+async def listing_snapshot_report():
+    return listing_snapshot.stats()
+
+@router.get("/load-shed")
+async def load_shed_report():
+    return load_shed_stats()
+
+@router.get("/deal-score")
+async def deal_score_report():
+    return deal_scorer.stats()
+
+@router.get("/create-coalescer")
+async def create_coalescer_report():
+    return create_coalescer.stats()
+
+@router.get("/comparables")
+async def comparables_report():
+    return comparables.stats()
+
+@router.get("/query-stats")
+async def query_stats_report(
+        order: str = Query("total", pattern="^(total|calls|p95|p99|max)$"),
+        limit: int = Query(50, ge=1, le=500),
+        session: AsyncSession = Depends(get_session),
+):
+    rows = await session.execute(OTHER_SOURCES_SQL, {"source": query_stats.source, "limit": limit})
+    return {
+        "slow_ms": query_stats.slow_ms,
+        "statements": query_stats.snapshot(order=order, limit=limit),
+        "other_sources": persisted_rows(rows.mappings()),
+    }
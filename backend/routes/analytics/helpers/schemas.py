@@ -0,0 +1,51 @@
+from pydantic import BaseModel
+from datetime import date, datetime
+from typing import Optional, List
+
+class SegmentCount(BaseModel):
+    loan_type: str
+    mls_status: str
+    listings: int
+
+class BucketRow(BaseModel):
+    bucket_start: date
+    new_listings: int
+    price_cuts: int
+    rate_avg: Optional[float] = None
+    rate_median: Optional[float] = None
+    equity_median: Optional[float] = None
+
+class AnalyticsSummary(BaseModel):
+    listings: int = 0
+    rate_avg: Optional[float] = None
+    rate_median: Optional[float] = None
+    equity_median: Optional[float] = None
+    price_cuts: int = 0
+    refreshed_at: Optional[datetime] = None
+    segments: List[SegmentCount] = []
+    bucket: Optional[str] = None
+    buckets: List[BucketRow] = []
+
+class LoanProjection(BaseModel):
+    loan_id: int
+    listing_id: Optional[int] = None
+    loan_type: Optional[str] = None
+    balance: Optional[float] = None
+    balance_as_of: date
+    interest_rate: Optional[float] = None
+    monthly_payment: Optional[float] = None
+    months_paid: int
+    projected_balance: Optional[float] = None
+    principal_paid: Optional[float] = None
+    interest_paid: Optional[float] = None
+    next_interest: Optional[float] = None
+    next_principal: Optional[float] = None
+    payoff_date: date
+    latest_price: Optional[float] = None
+    equity_to_cover: Optional[float] = None
+
+class LoanProjections(BaseModel):
+    at: date
+    term_months: int
+    loans: int
+    projections: List[LoanProjection]
@@ -0,0 +1,20 @@
+from sqlalchemy import text
+
+SEGMENTS_SQL = text("""
+SELECT loan_type, mls_status, listings
+FROM analytics_segment
+ORDER BY loan_type, mls_status
+""").execution_options(metric_name="analytics_segments")
+
+TOTALS_SQL = text("""
+SELECT listings, rate_avg, rate_median, equity_median, price_cuts, refreshed_at
+FROM analytics_totals
+""").execution_options(metric_name="analytics_totals")
+
+BUCKETS_SQL = text("""
+SELECT bucket_start, new_listings, price_cuts, rate_avg, rate_median, equity_median
+FROM analytics_bucket
+WHERE grain = :grain
+  AND (CAST(:since AS date) IS NULL OR bucket_start >= date_trunc(:grain, CAST(:since AS date))::date)
+ORDER BY bucket_start
+""").execution_options(metric_name="analytics_buckets")
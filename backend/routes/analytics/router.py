@@ -0,0 +1,48 @@
+from datetime import date
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+
+from db.main import get_read_session
+from ..auth.router import require_auth
+from services.amortization import DEFAULT_TERM_MONTHS, LoanBook, book_query, project, projection_rows
+from services.load_shed import HIGH, ConcurrencyLimit
+from .helpers.schemas import AnalyticsSummary, BucketRow, LoanProjections, SegmentCount
+from .helpers.sql import BUCKETS_SQL, SEGMENTS_SQL, TOTALS_SQL
+
+router = APIRouter(prefix="/analytics", tags=["analytics"])
+
+SUMMARY_LIMIT = ConcurrencyLimit("analytics_summary", limit=16, priority=HIGH, statement_timeout_ms=2_000)
+PROJECTIONS_LIMIT = ConcurrencyLimit("loan_projections", limit=4, statement_timeout_ms=10_000)
+
+@router.get("/summary", response_model=AnalyticsSummary, dependencies=[Depends(require_auth), Depends(SUMMARY_LIMIT)])
+async def analytics_summary(
+        bucket: Optional[str] = Query(None, pattern="^(week|month)$"),
+        since: Optional[date] = Query(None),
+        session: AsyncSession = Depends(get_read_session),
+):
+    # Reads only the rollup tables (jobs/rollups.py), so cost does not grow with listings.
+    totals = (await session.execute(TOTALS_SQL)).mappings().first()
+    segments = (await session.execute(SEGMENTS_SQL)).mappings().all()
+    summary = AnalyticsSummary(**(totals or {}), segments=[SegmentCount(**r) for r in segments])
+    if bucket:
+        rows = (await session.execute(BUCKETS_SQL, {"grain": bucket, "since": since})).mappings().all()
+        summary.bucket = bucket
+        summary.buckets = [BucketRow(**r) for r in rows]
+    return summary
+
+@router.get("/loan-projections", response_model=LoanProjections,
+            dependencies=[Depends(require_auth), Depends(PROJECTIONS_LIMIT)])
+async def loan_projections(
+        at: Optional[date] = Query(None, description="Assumption date to project to (default today)"),
+        term_months: int = Query(DEFAULT_TERM_MONTHS, ge=1, le=480),
+        loan_type: Optional[List[str]] = Query(None),
+        listing_id: Optional[List[int]] = Query(None),
+        limit: int = Query(1000, ge=1, le=100_000),
+        session: AsyncSession = Depends(get_read_session),
+):
+    at = at or date.today()
+    sql, params = book_query(loan_type, listing_id)
+    book = LoanBook.from_rows((await session.execute(sql, params)).all())
+    rows = projection_rows(book, project(book, at, term_months), limit)
+    return {"at": at, "term_months": term_months, "loans": len(book), "projections": rows}
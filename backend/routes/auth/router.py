@@ -4,16 +4,19 @@ from pydantic import BaseModel
 import hmac
 from itsdangerous import TimestampSigner, BadSignature, SignatureExpired
 from config import settings
+from services.load_shed import HIGH, ConcurrencyLimit
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
 COOKIE_NAME = settings.COOKIE_NAME.get_secret_value()
 signer = TimestampSigner(settings.APP_SESSION_SECRET.get_secret_value())
+# No database work; never shed for pool pressure.
+AUTH_LIMIT = ConcurrencyLimit("auth", limit=64, priority=HIGH)
 
 class LoginIn(BaseModel):
     token: str
 
-@router.post("/login", dependencies=[Depends(RateLimiter(times=5, seconds=60))])
+@router.post("/login", dependencies=[Depends(AUTH_LIMIT), Depends(RateLimiter(times=5, seconds=60))])
 async def login(payload: LoginIn, response: Response):
     expected = settings.APP_ACCESS_TOKEN.get_secret_value()
     if not hmac.compare_digest(expected, payload.token):
@@ -40,7 +43,7 @@ def require_auth(request: Request):
     except (BadSignature, SignatureExpired):
         raise HTTPException(status_code=401, detail="Not authenticated")
 
-@router.get("/me")
+@router.get("/me", dependencies=[Depends(AUTH_LIMIT)])
 async def me(request: Request):
     require_auth(request)
     return {"ok": True}
@@ -0,0 +1,25 @@
+from pydantic import BaseModel
+from datetime import datetime
+from typing import Optional, List
+
+class ImportRowError(BaseModel):
+    row: int
+    error: str
+
+class ImportJob(BaseModel):
+    job_id: int
+    filename: str
+    sheet: Optional[str] = None
+    status: str
+    rows_total: Optional[int] = None
+    rows_done: int = 0
+    rows_failed: int = 0
+    errors: List[ImportRowError] = []
+    geocode_enqueued: int = 0
+    geocode_pending: Optional[int] = None
+    result: Optional[dict] = None
+    last_error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    updated_at: datetime
@@ -0,0 +1,112 @@
+import asyncio, json, os
+from pathlib import Path
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db.main import AsyncSessionLocal, get_session
+from ..auth.router import require_auth
+from .helpers.schemas import ImportJob
+from jobs.geocode.sql import DEPTH_SQL
+from jobs.imports.runner import import_runner
+from jobs.imports.sql import CREATE_SQL, FAIL_SQL, GET_SQL
+
+router = APIRouter(prefix="/imports", tags=["imports"], dependencies=[Depends(require_auth)])
+
+ALLOWED_SUFFIXES = {".xlsx", ".xlsm", ".csv"}
+MAX_UPLOAD_BYTES = int(os.getenv("IMPORT_MAX_BYTES", str(50 * 1024 * 1024)))
+PROGRESS_POLL_SECONDS = 1.0
+SSE_HEARTBEAT_SECONDS = 15.0
+
+def _json(v):
+    return json.loads(v) if isinstance(v, str) else v
+
+async def _load_job(session: AsyncSession, job_id: int) -> Optional[ImportJob]:
+    row = (await session.execute(GET_SQL, {"jid": job_id})).mappings().first()
+    if row is None:
+        return None
+    job = ImportJob(**{**row, "errors": _json(row["errors"]), "result": _json(row["result"])})
+    if job.status in ("queued", "running"):
+        depth = {r["status"]: r["jobs"] for r in (await session.execute(DEPTH_SQL)).mappings()}
+        job.geocode_pending = depth.get("pending", 0) + depth.get("running", 0)
+    return job
+
+@router.post("", status_code=202, response_model=ImportJob)
+async def create_import(
+        request: Request,
+        filename: str = Query(..., description="Original file name; .xlsx, .xlsm or .csv"),
+        sheet: Optional[str] = Query(None, description="Worksheet to load; defaults to the first"),
+):
+    """
+    Upload the spreadsheet as the raw request body. It is streamed to disk in chunks,
+    never held in memory, and loaded by a separate ETL process.
+    """
+    if Path(filename).suffix.lower() not in ALLOWED_SUFFIXES:
+        raise HTTPException(status_code=415, detail=f"Expected one of {', '.join(sorted(ALLOWED_SUFFIXES))}")
+
+    path = import_runner.new_upload_path(filename)
+    size = 0
+    try:
+        with open(path, "wb") as f:
+            async for chunk in request.stream():
+                size += len(chunk)
+                if size > MAX_UPLOAD_BYTES:
+                    raise HTTPException(status_code=413, detail="Upload too large")
+                await asyncio.to_thread(f.write, chunk)
+        if size == 0:
+            raise HTTPException(status_code=400, detail="Empty upload")
+    except BaseException:
+        path.unlink(missing_ok=True)
+        raise
+
+    async with AsyncSessionLocal() as session:
+        job_id = (await session.execute(CREATE_SQL, {"filename": filename, "path": str(path), "sheet": sheet})).scalar_one()
+        await session.commit()
+        try:
+            await import_runner.launch(job_id, path, sheet)
+        except Exception as e:
+            await session.execute(FAIL_SQL, {"jid": job_id, "err": f"could not start the ETL: {e}"})
+            await session.commit()
+            raise HTTPException(status_code=500, detail="Could not start the import")
+        job = await _load_job(session, job_id)
+    return JSONResponse(job.model_dump(mode="json"), status_code=202, headers={"Location": f"/api/imports/{job_id}"})
+
+@router.get("/{job_id}", response_model=ImportJob)
+async def get_import(job_id: int, session: AsyncSession = Depends(get_session)):
+    job = await _load_job(session, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Import not found")
+    return job
+
+@router.get("/{job_id}/events")
+async def import_events(job_id: int, request: Request):
+    """SSE: a `progress` event whenever the job row changes, then `done` once it finishes."""
+    async with AsyncSessionLocal() as session:
+        if await _load_job(session, job_id) is None:
+            raise HTTPException(status_code=404, detail="Import not found")
+
+    async def events():
+        yield "retry: 3000\n\n"
+        last_update, idle = None, 0.0
+        while not await request.is_disconnected():
+            # A short session per poll, so an open stream never pins a pooled connection.
+            async with AsyncSessionLocal() as session:
+                job = await _load_job(session, job_id)
+            if job is None:
+                return
+            if job.updated_at != last_update:
+                last_update, idle = job.updated_at, 0.0
+                kind = "done" if job.status in ("done", "failed") else "progress"
+                yield f"event: {kind}\ndata: {job.model_dump_json()}\n\n"
+                if kind == "done":
+                    return
+            elif idle >= SSE_HEARTBEAT_SECONDS:
+                idle = 0.0
+                yield ": ping\n\n"
+            await asyncio.sleep(PROGRESS_POLL_SECONDS)
+            idle += PROGRESS_POLL_SECONDS
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
@@ -1,5 +1,9 @@
+import base64
 from datetime import date
 
+from etl.helpers.mls import extract_mls_id
+from services.address import address_key
+
 def _to_date_or_none(v) -> date | None:
     if v is None:
         return None
@@ -8,4 +12,66 @@ def _to_date_or_none(v) -> date | None:
     s = str(v).strip()
     if not s:
         return None
-    return date.fromisoformat(s[:10])
\ No newline at end of file
+    return date.fromisoformat(s[:10])
+
+def encode_change_cursor(txid: str, listing_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{txid}:{listing_id}".encode()).decode().rstrip("=")
+
+def decode_change_cursor(cursor: str | None) -> tuple[str, int]:
+    """Returns (txid, listing_id); raises ValueError for anything we did not issue."""
+    if not cursor:
+        return "0", 0
+    raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+    txid, lid = raw.split(":")
+    if not txid.isdigit():
+        raise ValueError(cursor)
+    return txid, int(lid)
+
+def listing_create_doc(payload) -> dict:
+    """The create_listing_v1() argument (migration 0012) for a ListingCreate payload."""
+    state = (payload.state or "CO").strip().upper()
+    date_added = _to_date_or_none(payload.date_added)
+    equity_to_cover = None
+    if payload.asking_price is not None and payload.balance is not None:
+        equity_to_cover = max(0.0, round(payload.asking_price - payload.balance, 2))
+
+    analysis = None
+    if payload.analysis_url or payload.done_running_numbers is not None or payload.roi_pass is not None:
+        analysis = {"url": payload.analysis_url, "roi_pass": payload.roi_pass, "run_complete": payload.done_running_numbers}
+
+    notes = []
+    if payload.response_from_realtor:
+        notes.append({"author": "Realtor/Seller", "note_text": payload.response_from_realtor.strip()})
+    if payload.full_response_from_amy:
+        notes.append({"author": "Amy", "note_text": payload.full_response_from_amy.strip()})
+
+    loan_type = payload.loan_type.strip() if isinstance(payload.loan_type, str) and payload.loan_type.strip() else "CONV"
+    return {
+        "realtor_name": (payload.realtor_name or "Unknown").strip() or "Unknown",
+        "street": payload.street.strip(),
+        "unit": payload.unit or None,
+        "city": payload.city.strip(),
+        "state": state,
+        "zip": payload.zip.strip(),
+        "address_key": address_key(payload.street, payload.unit, payload.city, payload.state or "CO", payload.zip),
+        "beds": payload.beds,
+        "baths": payload.baths,
+        "sqft": payload.sqft,
+        "hoa_amount": payload.hoa_amount,
+        "hoa_frequency": payload.hoa_frequency or None,
+        "date_added": date_added.isoformat() if date_added else None,
+        "mls_id": extract_mls_id(payload.mls_link),
+        "mls_link": payload.mls_link,
+        "mls_status": payload.mls_status,
+        "equity_to_cover": equity_to_cover,
+        "sent_to_clients": bool(payload.sent_to_clients),
+        "asking_price": payload.asking_price,
+        "loan_type": loan_type,
+        "interest_rate": payload.interest_rate,
+        "balance": payload.balance,
+        "piti": payload.piti,
+        "loan_servicer": payload.loan_servicer,
+        "investor_allowed": bool(payload.investor_allowed) if payload.investor_allowed is not None else None,
+        "analysis": analysis,
+        "notes": notes,
+    }
@@ -36,6 +36,46 @@ class ListingOut(_FiniteFloatModel):
     lat: Optional[float] = None
     lon: Optional[float] = None
 
+class ListingChange(_FiniteFloatModel):
+    listing_id: int
+    address: Optional[str] = None
+    price: Optional[float] = None
+    loan_type: Optional[str] = None
+    mls_status: Optional[str] = None
+    lat: Optional[float] = None
+    lon: Optional[float] = None
+    version: Optional[int] = None
+    updated_at: Optional[datetime] = None
+
+class ComparableListing(_FiniteFloatModel):
+    listing_id: int
+    address: str
+    price: Optional[float] = None
+    loan_type: Optional[str] = None
+    mls_status: Optional[str] = None
+    beds: Optional[int] = None
+    baths: Optional[float] = None
+    sqft: Optional[int] = None
+    interest_rate: Optional[float] = None
+    lat: Optional[float] = None
+    lon: Optional[float] = None
+    score: float
+    distance_km: Optional[float] = None
+
+class TopListing(_FiniteFloatModel):
+    listing_id: int
+    score: float
+    loan_type: Optional[str] = None
+    rate_spread: Optional[float] = None
+    equity_share: Optional[float] = None
+    payment_ratio: Optional[float] = None
+
+class ListingChanges(BaseModel):
+    changed: List[ListingChange] = []
+    deleted: List[int] = []
+    cursor: str
+    has_more: bool = False
+
 class ListingDetail(_FiniteFloatModel):
     listing_id: int
 
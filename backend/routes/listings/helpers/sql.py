@@ -1,10 +1,10 @@
 from sqlalchemy import text
 
-BASE_LIST_SQL = """
+_LIST_SQL = """
 WITH latest_price AS (
   SELECT DISTINCT ON (listing_id) listing_id, price
-  FROM price_history
-  ORDER BY listing_id, effective_date DESC
+  FROM {price_history}
+  ORDER BY listing_id, effective_date DESC, price_id DESC
 )
 SELECT l.listing_id,
        p.street || ', ' || p.city || ', ' || p.state || ' ' || p.zip AS address,
@@ -13,15 +13,27 @@ SELECT l.listing_id,
        l.mls_status,
        p.latitude AS lat,
        p.longitude AS lon
-FROM   listing l
+FROM   {listing} l
 JOIN   property p  ON p.property_id  = l.property_id
 JOIN   loan     lo ON lo.property_id = p.property_id
 LEFT   JOIN latest_price lp ON lp.listing_id = l.listing_id
 """
 
+BASE_LIST_SQL = _LIST_SQL.format(listing="listing", price_history="price_history")
+
+# include_archived=true: live and archived listings (jobs/archive.py) together.
+ARCHIVED_LIST_SQL = _LIST_SQL.format(
+    listing="""(SELECT listing_id, property_id, mls_status, equity_to_cover FROM listing
+            UNION ALL
+            SELECT listing_id, property_id, mls_status, equity_to_cover FROM listing_archive)""",
+    price_history="""(SELECT listing_id, effective_date, price_id, price FROM price_history
+        UNION ALL
+        SELECT listing_id, effective_date, price_id, price FROM price_history_archive) ph""",
+)
+
 ORDER_CLAUSE = " ORDER BY lp.price NULLS LAST "
 
-DETAIL_SQL = text("""
+_DETAIL_SQL = """
 SELECT l.listing_id,
 
   -- address / property
@@ -53,14 +65,14 @@ SELECT l.listing_id,
   COALESCE(ph_all.items, '[]'::json) AS price_history,
   COALESCE(resp_all.items, '[]'::json) AS responses
 
-FROM listing l
+FROM {listing} l
 JOIN property p ON p.property_id = l.property_id
 JOIN realtor  r ON r.realtor_id = l.realtor_id
 LEFT JOIN loan lo ON lo.property_id = p.property_id
 
 LEFT JOIN LATERAL (
   SELECT ph.price, ph.effective_date
-  FROM price_history ph
+  FROM {price_history} ph
   WHERE ph.listing_id = l.listing_id
   ORDER BY ph.effective_date DESC, ph.price_id DESC
   LIMIT 1
@@ -68,7 +80,7 @@ LEFT JOIN LATERAL (
 
 LEFT JOIN LATERAL (
   SELECT a.url, a.roi_pass, a.run_complete, a.run_date
-  FROM analysis a
+  FROM {analysis} a
   WHERE a.listing_id = l.listing_id
   ORDER BY a.run_date DESC, a.analysis_id DESC
   LIMIT 1
@@ -81,7 +93,7 @@ LEFT JOIN LATERAL (
            'price', ph.price
          )
          ORDER BY ph.effective_date DESC, ph.price_id DESC) AS items
-  FROM price_history ph
+  FROM {price_history} ph
   WHERE ph.listing_id = l.listing_id
 ) ph_all ON TRUE
 
@@ -93,9 +105,109 @@ LEFT JOIN LATERAL (
            'created_at', resp.created_at
          )
          ORDER BY resp.created_at DESC, resp.response_id DESC) AS items
-  FROM response resp
+  FROM {response} resp
   WHERE resp.listing_id = l.listing_id
 ) resp_all ON TRUE
 
 WHERE l.listing_id = :lid;
-""")
\ No newline at end of file
+"""
+
+DETAIL_SQL = text(_DETAIL_SQL.format(
+    listing="listing", price_history="price_history", analysis="analysis", response="response",
+)).execution_options(metric_name="listing_detail")
+
+# A listing moved out by jobs/archive.py, read from the archive tables.
+ARCHIVED_DETAIL_SQL = text(_DETAIL_SQL.format(
+    listing="listing_archive", price_history="price_history_archive", analysis="analysis_archive",
+    response="response_archive",
+)).execution_options(metric_name="listing_detail_archived")
+
+# Built at commit by listing_detail_refresh(); DETAIL_SQL is the fallback for a
+# listing that has no document yet.
+DETAIL_DOC_SQL = text("""
+SELECT doc::text FROM listing_detail_doc WHERE listing_id = :lid AND doc <> '{}'
+""").execution_options(metric_name="listing_detail_doc")
+
+# Change feed: keyset scan of listing_change on (txid, listing_id), capped at the
+# snapshot xmin so only finished transactions are returned. Listings are rebuilt in
+# the list shape; a changed row whose listing has since gone reads as deleted.
+CHANGES_SQL = text("""
+WITH ch AS (
+  SELECT c.listing_id, c.deleted, c.txid
+  FROM listing_change c
+  WHERE (c.txid, c.listing_id) > (CAST(:txid AS xid8), :lid)
+    AND c.txid < pg_snapshot_xmin(pg_current_snapshot())
+  ORDER BY c.txid, c.listing_id
+  LIMIT :limit
+)
+SELECT ch.txid::text AS txid,
+       ch.listing_id,
+       ch.deleted OR l.listing_id IS NULL AS deleted,
+       p.street || ', ' || p.city || ', ' || p.state || ' ' || p.zip AS address,
+       lp.price,
+       lo.loan_type,
+       l.mls_status,
+       p.latitude AS lat,
+       p.longitude AS lon,
+       l.version,
+       GREATEST(l.updated_at, p.updated_at, lo.updated_at, lp.updated_at) AS updated_at
+FROM ch
+LEFT JOIN listing  l  ON l.listing_id = ch.listing_id AND NOT ch.deleted
+LEFT JOIN property p  ON p.property_id = l.property_id
+LEFT JOIN loan     lo ON lo.property_id = l.property_id
+LEFT JOIN LATERAL (
+  SELECT ph.price, ph.updated_at
+  FROM price_history ph
+  WHERE ph.listing_id = l.listing_id
+  ORDER BY ph.effective_date DESC, ph.price_id DESC
+  LIMIT 1
+) lp ON TRUE
+ORDER BY ch.txid, ch.listing_id
+""").execution_options(metric_name="listing_changes")
+
+# Top listings by deal score, overall or for one loan type. Both are answered by an
+# index-only scan of migration 0017's indexes, stopping after :n.
+TOP_SQL = text("""
+SELECT listing_id, score, loan_type, rate_spread, equity_share, payment_ratio
+FROM listing_score
+ORDER BY score DESC, listing_id
+LIMIT :n
+""").execution_options(metric_name="listing_top")
+
+TOP_BY_TYPE_SQL = text("""
+SELECT listing_id, score, loan_type, rate_spread, equity_share, payment_ratio
+FROM listing_score
+WHERE loan_type = :loan_type
+ORDER BY score DESC, listing_id
+LIMIT :n
+""").execution_options(metric_name="listing_top_by_type")
+
+# Display rows for comparables, in the list shape; ordering is applied in Python.
+COMPARABLE_ROWS_SQL = text("""
+SELECT l.listing_id,
+       p.street || ', ' || p.city || ', ' || p.state || ' ' || p.zip AS address,
+       lp.price,
+       lo.loan_type,
+       l.mls_status,
+       p.beds, p.baths, p.sqft,
+       lo.interest_rate,
+       p.latitude AS lat,
+       p.longitude AS lon
+FROM listing l
+JOIN property p ON p.property_id = l.property_id
+LEFT JOIN loan lo ON lo.property_id = l.property_id
+LEFT JOIN LATERAL (
+  SELECT ph.price FROM price_history ph
+  WHERE ph.listing_id = l.listing_id
+  ORDER BY ph.effective_date DESC, ph.price_id DESC
+  LIMIT 1
+) lp ON TRUE
+WHERE l.listing_id = ANY(:ids)
+""").execution_options(metric_name="listing_comparables")
+
+# One round trip for the whole POST /api/listings write (migration 0012). Kept out
+# of query stats, whose slow-statement sampler would re-run the writes.
+CREATE_LISTING_SQL = text("""
+SELECT listing_id, geocode, replayed, request_hash
+FROM create_listing_v1(CAST(:doc AS jsonb), :key, :hash)
+""").execution_options(metric_name="create_listing", query_stats_skip=True)
@@ -1,209 +1,227 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+import asyncio, hashlib, json
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
+from fastapi.responses import Response, StreamingResponse
 from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 
-from db.main import get_session
+from db.main import get_read_session, get_session, read_session
+from db.replica import LSN_COOKIE
 from ..auth.router import require_auth
-from .helpers.schemas import ListingOut, ListingDetail, ListingCreate
-from .helpers.sql import BASE_LIST_SQL, ORDER_CLAUSE, DETAIL_SQL
-from .helpers.functions import _to_date_or_none
-from .helpers.geocode import geocode_address
+from .helpers.schemas import (
+    ListingOut, ListingDetail, ListingCreate, ListingChange, ListingChanges, ComparableListing, TopListing,
+)
+from .helpers.sql import (
+    BASE_LIST_SQL, ARCHIVED_LIST_SQL, ORDER_CLAUSE, DETAIL_SQL, ARCHIVED_DETAIL_SQL, DETAIL_DOC_SQL, CHANGES_SQL,
+    COMPARABLE_ROWS_SQL, CREATE_LISTING_SQL, TOP_SQL, TOP_BY_TYPE_SQL,
+)
+from .helpers.functions import decode_change_cursor, encode_change_cursor, listing_create_doc
+from jobs.geocode.worker import geocode_workers
+from services.comparables import comparables
+from services.create_coalescer import CreateRejected, create_coalescer
+from services.events import event_hub
+from services.filters import ListingFilters, listing_filters
+from services.listing_snapshot import listing_snapshot
+from services.load_shed import HIGH, ConcurrencyLimit, sqlstate
 
 router = APIRouter(prefix="/listings", tags=["listings"])
 
-@router.get("", response_model=List[ListingOut], dependencies=[Depends(require_auth)])
+SSE_HEARTBEAT_SECONDS = 15.0
+COMPARABLES_READY_TIMEOUT = 5.0
+
+# The list and change feed are mostly served from memory / one index range scan;
+# detail, comparables and create hold a connection for several statements.
+LIST_LIMIT = ConcurrencyLimit("list_listings", limit=32, priority=HIGH, statement_timeout_ms=5_000)
+CHANGES_LIMIT = ConcurrencyLimit("listing_changes", limit=32, priority=HIGH, statement_timeout_ms=2_000)
+TOP_LIMIT = ConcurrencyLimit("listing_top", limit=32, priority=HIGH, statement_timeout_ms=1_000)
+DETAIL_LIMIT = ConcurrencyLimit("listing_detail", limit=16, statement_timeout_ms=2_000)
+COMPARABLES_LIMIT = ConcurrencyLimit("listing_comparables", limit=8, statement_timeout_ms=3_000)
+# Coalesced creates wait without holding a connection, so a whole batch may be queued.
+CREATE_LIMIT = ConcurrencyLimit("create_listing", limit=create_coalescer.max_batch if create_coalescer.enabled else 8,
+                                statement_timeout_ms=5_000)
+
+@router.get("", response_model=List[ListingOut], dependencies=[Depends(require_auth), Depends(LIST_LIMIT)])
 async def list_listings(
-        session: AsyncSession = Depends(get_session),
-        loan_type: Optional[List[str]] = Query(None)
+        request: Request,
+        filters: ListingFilters = Depends(listing_filters),
+        include_archived: bool = Query(False, description="Also return listings moved to the archive"),
 ):
-    sql_parts = [BASE_LIST_SQL]
-    params: dict[str, object] = {}
-    if loan_type:
-        sql_parts.append("WHERE lo.loan_type = ANY(:loan_types)")
-        params["loan_types"] = loan_type
+    # Answered from the in-process snapshot (live listings only) whenever it is in sync,
+    # except for a client that just wrote (rw_lsn cookie): the NOTIFY that patches the
+    # snapshot may not have arrived yet, so its reads go to the database until the cookie expires.
+    if listing_snapshot.ready and not include_archived and LSN_COOKIE not in request.cookies:
+        return listing_snapshot.snapshot.query(filters)
+
+    sql_parts = [ARCHIVED_LIST_SQL if include_archived else BASE_LIST_SQL]
+    conds, params = filters.where()
+    if conds:
+        sql_parts.append("WHERE " + " AND ".join(conds))
 
     sql_parts.append(ORDER_CLAUSE)
     sql = " ".join(sql_parts)
-    text_sql = text(sql)
+    text_sql = text(sql).execution_options(metric_name="list_listings_archived" if include_archived else "list_listings")
 
-    rows = await session.execute(text_sql, params)
-    return [ListingOut(**row._mapping) for row in rows]
+    async with read_session(request) as session:
+        rows = await session.execute(text_sql, params)
+        return [ListingOut(**row._mapping) for row in rows]
+
+@router.get("/changes", response_model=ListingChanges, dependencies=[Depends(require_auth), Depends(CHANGES_LIMIT)])
+async def listing_changes(
+        since: Optional[str] = Query(None, description="Cursor from a previous response; omit to start from the beginning"),
+        limit: int = Query(500, ge=1, le=5000),
+        session: AsyncSession = Depends(get_read_session),
+):
+    try:
+        txid, lid = decode_change_cursor(since)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    rows = (await session.execute(CHANGES_SQL, {"txid": txid, "lid": lid, "limit": limit})).mappings().all()
+    out = ListingChanges(cursor=since or encode_change_cursor(txid, lid), has_more=len(rows) == limit)
+    for r in rows:
+        if r["deleted"]:
+            out.deleted.append(r["listing_id"])
+        else:
+            out.changed.append(ListingChange(**r))
+    if rows:
+        out.cursor = encode_change_cursor(rows[-1]["txid"], rows[-1]["listing_id"])
+    return out
+
+@router.get("/top", response_model=List[TopListing], dependencies=[Depends(require_auth), Depends(TOP_LIMIT)])
+async def top_listings(
+        n: int = Query(20, ge=1, le=500),
+        loan_type: Optional[str] = Query(None, pattern="^(FHA|VA|NVVA|Maybe_NVVA|CONV)$"),
+        session: AsyncSession = Depends(get_read_session),
+):
+    # Scores are precomputed by jobs/deal_score.py; this only reads the top of an index.
+    if loan_type:
+        rows = await session.execute(TOP_BY_TYPE_SQL, {"n": n, "loan_type": loan_type})
+    else:
+        rows = await session.execute(TOP_SQL, {"n": n})
+    return [TopListing(**r) for r in rows.mappings()]
+
+@router.get("/stream", dependencies=[Depends(require_auth)])
+async def listing_stream(
+        request: Request,
+        last_event_id: Optional[str] = Header(None),
+        since: Optional[str] = Query(None, description="Stream id to resume after, for clients that cannot set Last-Event-ID"),
+):
+    resume_from = last_event_id or since
+    sub = event_hub.subscribe()
+
+    async def events():
+        try:
+            yield "retry: 3000\n\n"
+            seen = None
+            if resume_from:
+                try:
+                    replayed, gap = await event_hub.replay(resume_from)
+                except Exception:
+                    replayed, gap = [], True
+                if gap:
+                    yield "event: resync\ndata: {}\n\n"
+                for ev in replayed:
+                    seen = ev
+                    yield ev.sse()
+            while not sub.exhausted and not await request.is_disconnected():
+                ev = await sub.get(SSE_HEARTBEAT_SECONDS)
+                if ev is None:
+                    yield ": ping\n\n"
+                elif seen is None or ev.after(seen):
+                    yield ev.sse()
+        finally:
+            sub.close()
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@router.get("/{lid}", response_model=ListingDetail, dependencies=[Depends(require_auth), Depends(DETAIL_LIMIT)])
+async def listing_detail(lid: int, session: AsyncSession = Depends(get_read_session)):
+    # Pre-rendered document (migration 0009), passed through without parsing it.
+    doc = (await session.execute(DETAIL_DOC_SQL, {"lid": lid})).scalar_one_or_none()
+    if doc is not None:
+        return Response(content=doc, media_type="application/json")
 
-@router.get("/{lid}", response_model=ListingDetail, dependencies=[Depends(require_auth)])
-async def listing_detail(lid: int, session: AsyncSession = Depends(get_session)):
     row = (await session.execute(DETAIL_SQL, {"lid": lid})).mappings().first()
+    if row is None:
+        row = (await session.execute(ARCHIVED_DETAIL_SQL, {"lid": lid})).mappings().first()
     if row is None:
         raise HTTPException(status_code=404, detail="Listing not found")
 
     return ListingDetail(**row)
 
-@router.post("", dependencies=[Depends(require_auth)])
-async def create_listing(payload: ListingCreate, session: AsyncSession = Depends(get_session)):
+@router.get("/{lid}/comparables", response_model=List[ComparableListing],
+            dependencies=[Depends(require_auth), Depends(COMPARABLES_LIMIT)])
+async def listing_comparables(
+        lid: int,
+        k: int = Query(10, ge=1, le=100),
+        radius_km: Optional[float] = Query(None, gt=0, le=500, description="Only listings within this distance"),
+        session: AsyncSession = Depends(get_read_session),
+):
+    try:
+        await asyncio.wait_for(comparables.ready.wait(), COMPARABLES_READY_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=503, detail="Comparables index is still building", headers={"Retry-After": "5"})
+    if lid not in comparables.index:
+        # Written moments ago and its event not applied yet.
+        await comparables.refresh([lid])
+    try:
+        hits = comparables.index.search(lid, k=k, radius_km=radius_km)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Listing not found")
+    if not hits:
+        return []
+
+    rows = (await session.execute(COMPARABLE_ROWS_SQL, {"ids": [h.listing_id for h in hits]})).mappings().all()
+    by_id = {r["listing_id"]: r for r in rows}
+    return [
+        ComparableListing(**by_id[h.listing_id], score=h.score, distance_km=h.distance_km)
+        for h in hits if h.listing_id in by_id
+    ]
+
+@router.post("", dependencies=[Depends(require_auth), Depends(CREATE_LIMIT)])
+async def create_listing(
+        payload: ListingCreate,
+        response: Response,
+        idempotency_key: Optional[str] = Header(None, max_length=255),
+        session: AsyncSession = Depends(get_session),
+):
+    # Every write (realtor, property, geocode job, listing, price, loan, analysis,
+    # notes) happens in create_listing_v1(): one round trip instead of nine. With
+    # the coalescer on, concurrent creates also share one transaction and commit.
+    request_hash = hashlib.sha256(payload.model_dump_json().encode()).hexdigest() if idempotency_key else None
     try:
-        # Realtor
-        res = await session.execute(
-            text("""
-                INSERT INTO realtor (name)
-                VALUES (:n)
-                ON CONFLICT (name) DO UPDATE SET name = EXCLUDED.name
-                RETURNING realtor_id
-            """),
-            {"n": (payload.realtor_name or "Unknown").strip() or "Unknown"}
-        )
-        realtor_id = res.scalar_one()
-
-        # Property
-        res = await session.execute(
-            text("""
-                INSERT INTO property (street, unit, city, state, zip, beds, baths, sqft, hoa_amount, hoa_frequency)
-                VALUES (:street, :unit, :city, :state, :zip, :beds, :baths, :sqft, :hoa_amount, :hoa_frequency)
-                ON CONFLICT (street, unit, city, state, zip)
-                DO UPDATE SET
-                  beds = COALESCE(EXCLUDED.beds, property.beds),
-                  baths = COALESCE(EXCLUDED.baths, property.baths),
-                  sqft = COALESCE(EXCLUDED.sqft, property.sqft),
-                  hoa_amount = COALESCE(EXCLUDED.hoa_amount, property.hoa_amount),
-                  hoa_frequency = COALESCE(EXCLUDED.hoa_frequency, property.hoa_frequency)
-                RETURNING property_id
-            """),
-            {
-                "street": payload.street.strip(),
-                "unit": (payload.unit or None),
-                "city": payload.city.strip(),
-                "state": (payload.state or "CO").strip().upper(),
-                "zip": payload.zip.strip(),
-                "beds": payload.beds,
-                "baths": payload.baths,
-                "sqft": payload.sqft,
-                "hoa_amount": payload.hoa_amount,
-                "hoa_frequency": payload.hoa_frequency or None,
-            }
-        )
-        property_id = res.scalar_one()
-
-        # Geocode address
-        coords = await geocode_address(
-            payload.street.strip(),
-            payload.city.strip(),
-            (payload.state or "CO").strip().upper(),
-            payload.zip.strip(),
-            (payload.unit or None),
-        )
-        if coords:
-            lat, lon = coords
-            await session.execute(
-                text("""
-                    UPDATE property
-                    SET latitude = :lat, longitude = :lon
-                    WHERE property_id = :pid
-                        AND (latitude IS DISTINCT FROM :lat OR longitude IS DISTINCT FROM :lon)
-                """),
-                {"pid": property_id, "lat": lat, "lon": lon},
-            )
-
-        # Listing
-        date_added = _to_date_or_none(payload.date_added)
-        asking_price = payload.asking_price
-        loan_balance = payload.balance
-        equity_to_cover = None
-        if asking_price is not None and loan_balance is not None:
-            equity = round(asking_price - loan_balance, 2)
-            equity_to_cover = max(0.0, equity)
-
-        res = await session.execute(
-            text("""
-                INSERT INTO listing (property_id, realtor_id, date_added, mls_link, mls_status, equity_to_cover, sent_to_clients)
-                VALUES (:pid, :rid, COALESCE(:date_added, CURRENT_DATE), :mls_link, :mls_status, :equity, :sent)
-                ON CONFLICT ON CONSTRAINT listing_prop_realtor_link_unique
-                DO UPDATE SET
-                    date_added = COALESCE(EXCLUDED.date_added, listing.date_added),
-                    mls_status = COALESCE(EXCLUDED.mls_status, listing.mls_status),
-                    equity_to_cover = COALESCE(EXCLUDED.equity_to_cover, listing.equity_to_cover),
-                    sent_to_clients = COALESCE(EXCLUDED.sent_to_clients, listing.sent_to_clients)
-                RETURNING listing_id
-            """),
-            {
-                "pid": property_id,
-                "rid": realtor_id,
-                "date_added": date_added,
-                "mls_link": payload.mls_link,
-                "mls_status": payload.mls_status,
-                "equity": equity_to_cover,
-                "sent": bool(payload.sent_to_clients),
-            }
-        )
-        listing_id = res.scalar_one()
-
-        # Price history
-        if asking_price is not None:
-            await session.execute(
-                text("""
-                    INSERT INTO price_history (listing_id, effective_date, price)
-                    VALUES (:lid, COALESCE(:eff, CURRENT_DATE), :price)
-                """),
-                {"lid": listing_id, "eff": date_added, "price": asking_price}
-            )
-
-        # Loan
-        loan_type = payload.loan_type.strip() if isinstance(payload.loan_type, str) and payload.loan_type.strip() else "CONV"
-        await session.execute(
-            text("""
-                INSERT INTO loan (property_id, loan_type, interest_rate, balance, piti, loan_servicer, investor_allowed)
-                VALUES (:pid, :loan_type, :rate, :bal, :piti, :servicer, :allowed)
-                ON CONFLICT (property_id) DO UPDATE SET
-                  loan_type = EXCLUDED.loan_type,
-                  interest_rate = EXCLUDED.interest_rate,
-                  balance = EXCLUDED.balance,
-                  piti = EXCLUDED.piti,
-                  loan_servicer = EXCLUDED.loan_servicer,
-                  investor_allowed = EXCLUDED.investor_allowed
-            """),
-            {
-                "pid": property_id,
-                "loan_type": loan_type,
-                "rate": payload.interest_rate,
-                "bal": payload.balance,
-                "piti": payload.piti,
-                "servicer": payload.loan_servicer,
-                "allowed": bool(payload.investor_allowed) if payload.investor_allowed is not None else None,
-            }
-        )
-
-        # Analysis
-        if (
-            payload.analysis_url
-            or payload.done_running_numbers is not None
-            or payload.roi_pass is not None
-        ):
-            await session.execute(
-                text("""
-                    INSERT INTO analysis (listing_id, url, roi_pass, run_complete)
-                    VALUES (:lid, :url, :roi, :done)
-                """),
-                {
-                    "lid": listing_id,
-                    "url": payload.analysis_url,
-                    "roi": payload.roi_pass,
-                    "done": payload.done_running_numbers,
-                }
-            )
-
-        # Notes
-        if payload.response_from_realtor:
-            await session.execute(
-                text("INSERT INTO response (listing_id, author, note_text) VALUES (:lid, 'Realtor/Seller', :t)"),
-                {"lid": listing_id, "t": payload.response_from_realtor.strip()}
-            )
-        if payload.full_response_from_amy:
-            await session.execute(
-                text("INSERT INTO response (listing_id, author, note_text) VALUES (:lid, 'Amy', :t)"),
-                {"lid": listing_id, "t": payload.full_response_from_amy.strip()}
-            )
-
-        await session.commit()
-        return {"id": listing_id}
-
-    except Exception as e:
+        # Inside the try: an unparseable date_added is the client's 400, not a 500.
+        doc = json.dumps(listing_create_doc(payload))
+        if create_coalescer.enabled:
+            row = await create_coalescer.submit(doc, idempotency_key, request_hash)
+        else:
+            row = (await session.execute(CREATE_LISTING_SQL, {
+                "doc": doc,
+                "key": idempotency_key,
+                "hash": request_hash,
+            })).mappings().one()
+            await session.commit()
+    except (CreateRejected, ValueError) as e:
         await session.rollback()
         raise HTTPException(status_code=400, detail=str(e))
+    except DBAPIError as e:
+        await session.rollback()
+        # The document's own fault (bad value, constraint, RAISE in the function) is the
+        # client's 400, as CreateRejected is on the coalesced path. Anything else, a
+        # statement timeout included, goes on to CREATE_LIMIT (503) or the server (500).
+        if (sqlstate(e) or "")[:2] not in ("22", "23", "P0"):
+            raise
+        raise HTTPException(status_code=400, detail=str(e.orig))
+
+    if row["replayed"]:
+        if row["request_hash"] != request_hash:
+            raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different request")
+        response.headers["Idempotent-Replayed"] = "true"
+        return {"id": row["listing_id"], "geocode": row["geocode"]}
+
+    if row["geocode"] != "done":
+        geocode_workers.notify()
+    await event_hub.publish("listing", id=row["listing_id"], op="upsert", source="api")
+    return {"id": row["listing_id"], "geocode": row["geocode"]}
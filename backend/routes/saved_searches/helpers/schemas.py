@@ -0,0 +1,29 @@
+from pydantic import BaseModel, Field
+from datetime import datetime
+from typing import Optional, List
+
+from services.filters import ListingFilters
+
+class SavedSearchIn(BaseModel):
+    name: str = Field(..., min_length=1, max_length=200)
+    filters: ListingFilters = ListingFilters()
+
+class SavedSearchOut(BaseModel):
+    search_id: int
+    name: str
+    filters: ListingFilters
+    created_at: datetime
+    updated_at: datetime
+    unseen: int = 0
+
+class SavedSearchMatch(BaseModel):
+    listing_id: int
+    matched_at: datetime
+    seen: bool
+    address: Optional[str] = None
+    price: Optional[float] = None
+    loan_type: Optional[str] = None
+    mls_status: Optional[str] = None
+
+class MarkSeen(BaseModel):
+    listing_ids: Optional[List[int]] = None
@@ -0,0 +1,48 @@
+from sqlalchemy import text
+
+CREATE_SQL = text("""
+INSERT INTO saved_search (name, filters) VALUES (:name, CAST(:filters AS jsonb))
+RETURNING search_id
+""")
+
+UPDATE_SQL = text("""
+UPDATE saved_search SET name = :name, filters = CAST(:filters AS jsonb), updated_at = now()
+WHERE search_id = :sid
+RETURNING search_id
+""")
+
+DELETE_SQL = text("DELETE FROM saved_search WHERE search_id = :sid RETURNING search_id")
+
+_SEARCH_COLS = """
+SELECT s.search_id, s.name, s.filters, s.created_at, s.updated_at,
+       (SELECT count(*) FROM saved_search_match m WHERE m.search_id = s.search_id AND NOT m.seen) AS unseen
+FROM saved_search s
+"""
+
+LIST_SQL = text(_SEARCH_COLS + " ORDER BY s.name, s.search_id")
+GET_SQL = text(_SEARCH_COLS + " WHERE s.search_id = :sid")
+
+MATCHES_SQL = text("""
+SELECT m.listing_id, m.matched_at, m.seen,
+       p.street || ', ' || p.city || ', ' || p.state || ' ' || p.zip AS address,
+       lp.price, lo.loan_type, l.mls_status
+FROM saved_search_match m
+JOIN listing l ON l.listing_id = m.listing_id
+JOIN property p ON p.property_id = l.property_id
+LEFT JOIN loan lo ON lo.property_id = l.property_id
+LEFT JOIN LATERAL (
+  SELECT ph.price FROM price_history ph
+  WHERE ph.listing_id = l.listing_id
+  ORDER BY ph.effective_date DESC, ph.price_id DESC
+  LIMIT 1
+) lp ON TRUE
+WHERE m.search_id = :sid AND (NOT :unseen OR NOT m.seen)
+ORDER BY m.matched_at DESC, m.listing_id DESC
+LIMIT :limit
+""").execution_options(metric_name="saved_search_matches")
+
+MARK_SEEN_SQL = text("""
+UPDATE saved_search_match SET seen = true
+WHERE search_id = :sid AND NOT seen
+  AND (CAST(:lids AS int[]) IS NULL OR listing_id = ANY(CAST(:lids AS int[])))
+""")
@@ -0,0 +1,79 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List
+
+from db.main import get_read_session, get_session
+from ..auth.router import require_auth
+from .helpers.schemas import MarkSeen, SavedSearchIn, SavedSearchMatch, SavedSearchOut
+from .helpers.sql import CREATE_SQL, DELETE_SQL, GET_SQL, LIST_SQL, MARK_SEEN_SQL, MATCHES_SQL, UPDATE_SQL
+from jobs.saved_searches.matcher import parse_filters
+from jobs.saved_searches.sql import full_match_sql
+from services.load_shed import ConcurrencyLimit
+
+router = APIRouter(prefix="/saved-searches", tags=["saved-searches"], dependencies=[Depends(require_auth)])
+
+MATCHES_LIMIT = ConcurrencyLimit("saved_search_matches", limit=16, statement_timeout_ms=2_000)
+
+def _out(row) -> SavedSearchOut:
+    return SavedSearchOut(**{**row, "filters": parse_filters(row["filters"])})
+
+async def _baseline(session: AsyncSession, sid: int, payload: SavedSearchIn):
+    # Listings that already match are recorded as seen; only later arrivals alert.
+    where, params = payload.filters.where()
+    await session.execute(full_match_sql(where, seen=True), {**params, "search_id": sid})
+
+async def _get(session: AsyncSession, sid: int) -> SavedSearchOut:
+    row = (await session.execute(GET_SQL, {"sid": sid})).mappings().first()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Saved search not found")
+    return _out(row)
+
+@router.get("", response_model=List[SavedSearchOut])
+async def list_saved_searches(session: AsyncSession = Depends(get_read_session)):
+    return [_out(r) for r in (await session.execute(LIST_SQL)).mappings()]
+
+@router.post("", response_model=SavedSearchOut, status_code=201)
+async def create_saved_search(payload: SavedSearchIn, session: AsyncSession = Depends(get_session)):
+    filters = payload.filters.model_dump_json(exclude_none=True)
+    sid = (await session.execute(CREATE_SQL, {"name": payload.name.strip(), "filters": filters})).scalar_one()
+    await _baseline(session, sid, payload)
+    await session.commit()
+    return await _get(session, sid)
+
+@router.get("/{sid}", response_model=SavedSearchOut)
+async def get_saved_search(sid: int, session: AsyncSession = Depends(get_read_session)):
+    return await _get(session, sid)
+
+@router.put("/{sid}", response_model=SavedSearchOut)
+async def update_saved_search(sid: int, payload: SavedSearchIn, session: AsyncSession = Depends(get_session)):
+    filters = payload.filters.model_dump_json(exclude_none=True)
+    if (await session.execute(UPDATE_SQL, {"sid": sid, "name": payload.name.strip(), "filters": filters})).first() is None:
+        raise HTTPException(status_code=404, detail="Saved search not found")
+    await _baseline(session, sid, payload)
+    await session.commit()
+    return await _get(session, sid)
+
+@router.delete("/{sid}", status_code=204)
+async def delete_saved_search(sid: int, session: AsyncSession = Depends(get_session)):
+    if (await session.execute(DELETE_SQL, {"sid": sid})).first() is None:
+        raise HTTPException(status_code=404, detail="Saved search not found")
+    await session.commit()
+
+@router.get("/{sid}/matches", response_model=List[SavedSearchMatch], dependencies=[Depends(MATCHES_LIMIT)])
+async def saved_search_matches(
+        sid: int,
+        unseen: bool = Query(True, description="Only matches not yet marked seen"),
+        limit: int = Query(100, ge=1, le=1000),
+        session: AsyncSession = Depends(get_read_session),
+):
+    await _get(session, sid)
+    rows = (await session.execute(MATCHES_SQL, {"sid": sid, "unseen": unseen, "limit": limit})).mappings().all()
+    return [SavedSearchMatch(**r) for r in rows]
+
+@router.post("/{sid}/matches/seen")
+async def mark_matches_seen(sid: int, payload: MarkSeen, session: AsyncSession = Depends(get_session)):
+    """Mark the given matches (or all of them) as seen."""
+    await _get(session, sid)
+    n = (await session.execute(MARK_SEEN_SQL, {"sid": sid, "lids": payload.listing_ids})).rowcount
+    await session.commit()
+    return {"marked": n}
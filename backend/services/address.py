@@ -0,0 +1,118 @@
+"""
+Canonical address key shared by the ETL, the API and the geocode queue.
+
+    address_key("123 Main Street", "Apt. 4", "Denver", "co", "80202-1234")
+    == address_key("123 MAIN ST #4", None, "denver", "CO", "80202")
+    == "123 MAIN ST|4|DENVER|CO|80202"
+
+Upper-cased, punctuation dropped, USPS street suffixes and directionals abbreviated,
+unit designators reduced to their value (a unit embedded in the street is pulled
+out), and ZIP+4 trimmed to five digits. `property.address_key` is uniquely indexed
+on this value, so every lookup and upsert must go through this function.
+"""
+from __future__ import annotations
+import re
+from typing import Optional
+
+SUFFIXES = {
+    "ALLEY": "ALY", "AVENUE": "AVE", "AV": "AVE", "BOULEVARD": "BLVD", "CIRCLE": "CIR",
+    "COURT": "CT", "COVE": "CV", "CROSSING": "XING", "DRIVE": "DR", "EXPRESSWAY": "EXPY",
+    "HIGHWAY": "HWY", "LANE": "LN", "LOOP": "LOOP", "PARKWAY": "PKWY", "PKY": "PKWY",
+    "PLACE": "PL", "PLAZA": "PLZ", "POINT": "PT", "ROAD": "RD", "SQUARE": "SQ",
+    "STREET": "ST", "STR": "ST", "TERRACE": "TER", "TRAIL": "TRL", "WAY": "WAY",
+}
+DIRECTIONALS = {
+    "NORTH": "N", "SOUTH": "S", "EAST": "E", "WEST": "W",
+    "NORTHEAST": "NE", "NORTHWEST": "NW", "SOUTHEAST": "SE", "SOUTHWEST": "SW",
+}
+_ABBREVIATED = set(SUFFIXES.values()) | set(DIRECTIONALS.values())
+
+_UNIT_RE = re.compile(
+    r"(?:\b(?P<designator>APARTMENT|APT|UNIT|SUITE|STE|BLDG|LOT|RM|ROOM)\b\.?|#)\s*#?\s*(?P<unit>[A-Z0-9-]+)\s*$"
+)
+# Any designator can also be part of a street name ("500 Unit Rd", "12 Apt Way"), so
+# inside a street it never counts right after the house number or before a street
+# suffix. Those that are common street names ("100 Suite Rd", "7 Lot St") also
+# need the street suffix before them and a unit-like value after them.
+_AMBIGUOUS_DESIGNATORS = {"SUITE", "STE", "LOT", "RM", "ROOM"}
+_STREET_SUFFIXES = set(SUFFIXES) | set(SUFFIXES.values())
+_UNIT_VALUE_RE = re.compile(r"^(?:[A-Z]|[A-Z0-9-]*\d[A-Z0-9-]*)$")
+_PUNCT_RE = re.compile(r"[.,;]")
+_WS_RE = re.compile(r"\s+")
+
+def _clean(s: Optional[str]) -> str:
+    return _WS_RE.sub(" ", _PUNCT_RE.sub(" ", (s or "").upper())).strip()
+
+def normalize_unit(unit: Optional[str]) -> str:
+    u = _clean(unit)
+    m = _UNIT_RE.search(u)
+    return m.group("unit") if m else u.lstrip("# ")
+
+def _embedded_unit(s: str, m: re.Match) -> bool:
+    before = s[:m.start()].split()
+    if len(before) < 2 or m.group("unit") in _STREET_SUFFIXES:
+        return False
+    if m.group("designator") not in _AMBIGUOUS_DESIGNATORS:
+        return True
+    return (
+        (before[-1] in SUFFIXES or before[-1] in _ABBREVIATED)
+        and bool(_UNIT_VALUE_RE.match(m.group("unit")))
+    )
+
+def normalize_street(street: Optional[str]) -> tuple[str, str]:
+    """
+    Returns (street, unit found inside the street or '').
+
+    >>> normalize_street("123 North Main Street Suite 200")
+    ('123 N MAIN ST', '200')
+    >>> normalize_street("100 Suite Rd")
+    ('100 SUITE RD', '')
+    >>> normalize_street("7 Lot St")
+    ('7 LOT ST', '')
+    >>> normalize_street("12 Room Ave Lot 4")
+    ('12 ROOM AVE', '4')
+    >>> normalize_street("55 Elm St #B")
+    ('55 ELM ST', 'B')
+    >>> normalize_street("500 Unit Rd")
+    ('500 UNIT RD', '')
+    >>> normalize_street("12 Apt Way")
+    ('12 APT WAY', '')
+    >>> normalize_street("9 Oak Ave Apt 3C")
+    ('9 OAK AVE', '3C')
+    """
+    s = _clean(street)
+    embedded = ""
+    m = _UNIT_RE.search(s)
+    if m and _embedded_unit(s, m):
+        embedded = normalize_unit(m.group(0))
+        s = s[:m.start()].strip()
+
+    tokens = s.split(" ")
+    if len(tokens) < 2:
+        return s, embedded
+    # Suffix: last token, or second-to-last when a trailing directional follows it.
+    last = len(tokens) - 1
+    if tokens[last] in DIRECTIONALS or (tokens[last] in _ABBREVIATED and last > 1 and tokens[last - 1] in SUFFIXES):
+        tokens[last] = DIRECTIONALS.get(tokens[last], tokens[last])
+        last -= 1
+    # Never abbreviate the only name token ("123 North St", "45 Court").
+    if last >= 2 and tokens[last] in SUFFIXES:
+        tokens[last] = SUFFIXES[tokens[last]]
+    # Leading directional after the house number, when a street name still follows it.
+    if len(tokens) >= 4 and tokens[1] in DIRECTIONALS:
+        tokens[1] = DIRECTIONALS[tokens[1]]
+    return " ".join(tokens), embedded
+
+def normalize_zip(zip_code: Optional[str]) -> str:
+    digits = re.sub(r"\D", "", str(zip_code or ""))
+    return digits[:5]
+
+def address_key(street: Optional[str], unit: Optional[str], city: Optional[str],
+                state: Optional[str], zip_code: Optional[str]) -> Optional[str]:
+    """Canonical key, or None when there is no address to key on."""
+    street_n, embedded = normalize_street(street)
+    unit_n = normalize_unit(unit) or embedded
+    parts = (street_n, unit_n, _clean(city), _clean(state)[:2], normalize_zip(zip_code))
+    if not (parts[0] or parts[2] or parts[4]):
+        return None
+    return "|".join(parts)
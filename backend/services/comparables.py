@@ -0,0 +1,296 @@
+"""
+In-memory comparable-listings index.
+
+Every listing is one row of a float32 feature matrix: log price, beds, baths,
+log sqft, interest rate, monthly HOA, plus its loan type and coordinates kept
+alongside. Features are z-scored with the mean/std of the last full build, and a
+missing value scores as the population mean. A query is one vectorized weighted
+distance over the live rows (optionally pre-filtered to a lat/lon box) and an
+argpartition, so it stays in the low milliseconds at 100k listings.
+
+The index is built at startup, then kept current from the listing event stream
+(services/events.py): changed ids are reloaded in batches and patched in place.
+A "bulk" event, a dropped subscription or REBUILD_SECONDS elapsing triggers a
+full rebuild, which also refreshes the normalization statistics.
+"""
+from __future__ import annotations
+import asyncio, logging, math, os, warnings
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from services.events import event_hub
+
+log = logging.getLogger(__name__)
+
+REBUILD_SECONDS = float(os.getenv("COMPARABLES_REBUILD_SECONDS", "3600"))
+
+FEATURES = ("log_price", "beds", "baths", "log_sqft", "interest_rate", "hoa_monthly")
+# Relative importance of each standardized feature, then the flat penalty for a
+# different loan type (in the same squared-z units).
+WEIGHTS = np.array([3.0, 1.0, 1.0, 1.5, 2.0, 0.5], dtype=np.float32)
+LOAN_TYPE_PENALTY = 2.0
+
+_EARTH_KM = 6371.0088
+
+FEATURES_SQL = """
+SELECT l.listing_id,
+       NULLIF(lp.price, 'NaN')::float8 AS price,
+       p.beds::float8 AS beds,
+       NULLIF(p.baths, 'NaN')::float8 AS baths,
+       p.sqft::float8 AS sqft,
+       NULLIF(lo.interest_rate, 'NaN')::float8 AS interest_rate,
+       NULLIF(p.hoa_amount, 'NaN')::float8 / CASE p.hoa_frequency
+         WHEN 'Quarterly' THEN 3 WHEN 'Semi-Annual' THEN 6 WHEN 'Annual' THEN 12 ELSE 1 END AS hoa_monthly,
+       lo.loan_type,
+       p.latitude AS lat,
+       p.longitude AS lon
+FROM listing l
+JOIN property p ON p.property_id = l.property_id
+LEFT JOIN loan lo ON lo.property_id = l.property_id
+LEFT JOIN LATERAL (
+  SELECT ph.price FROM price_history ph
+  WHERE ph.listing_id = l.listing_id
+  ORDER BY ph.effective_date DESC, ph.price_id DESC
+  LIMIT 1
+) lp ON TRUE
+"""
+
+ALL_SQL = text(FEATURES_SQL).execution_options(metric_name="comparables_build")
+SOME_SQL = text(FEATURES_SQL + " WHERE l.listing_id = ANY(:ids)").execution_options(metric_name="comparables_patch")
+
+def _raw(rows) -> np.ndarray:
+    """(n, len(FEATURES)) float32 with NaN for unknowns, from FEATURES_SQL rows."""
+    out = np.full((len(rows), len(FEATURES)), np.nan, dtype=np.float32)
+    for i, r in enumerate(rows):
+        price, sqft = r["price"], r["sqft"]
+        out[i] = (
+            math.log(price) if price and price > 0 else np.nan,
+            np.nan if r["beds"] is None else r["beds"],
+            np.nan if r["baths"] is None else r["baths"],
+            math.log(sqft) if sqft and sqft > 0 else np.nan,
+            np.nan if r["interest_rate"] is None else r["interest_rate"],
+            np.nan if r["hoa_monthly"] is None else r["hoa_monthly"],
+        )
+    return out
+
+@dataclass
+class Comparable:
+    listing_id: int
+    score: float
+    distance_km: Optional[float]
+
+class ComparablesIndex:
+    def __init__(self, capacity: int = 1024):
+        self._alloc(capacity)
+        self.size = 0
+        self._row: dict[int, int] = {}
+        self._types: dict[str, int] = {}
+        self.mean = np.zeros(len(FEATURES), dtype=np.float32)
+        self.std = np.ones(len(FEATURES), dtype=np.float32)
+
+    def _alloc(self, capacity: int):
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        self.z = np.zeros((capacity, len(FEATURES)), dtype=np.float32)
+        self.loan_type = np.full(capacity, -1, dtype=np.int16)
+        self.lat = np.full(capacity, np.nan, dtype=np.float32)
+        self.lon = np.full(capacity, np.nan, dtype=np.float32)
+        self.alive = np.zeros(capacity, dtype=bool)
+
+    def _grow(self, need: int):
+        cap = len(self.ids)
+        if need <= cap:
+            return
+        old = (self.ids, self.z, self.loan_type, self.lat, self.lon, self.alive)
+        self._alloc(max(need, cap * 2))
+        for new, prev in zip((self.ids, self.z, self.loan_type, self.lat, self.lon, self.alive), old):
+            new[:cap] = prev
+
+    def __len__(self) -> int:
+        return len(self._row)
+
+    def __contains__(self, listing_id: int) -> bool:
+        return listing_id in self._row
+
+    def _type_code(self, loan_type: Optional[str]) -> int:
+        if loan_type is None:
+            return -1
+        return self._types.setdefault(loan_type, len(self._types))
+
+    def _standardize(self, raw: np.ndarray) -> np.ndarray:
+        z = (raw - self.mean) / self.std
+        return np.nan_to_num(z, nan=0.0)
+
+    @classmethod
+    def build(cls, rows) -> "ComparablesIndex":
+        rows = list(rows)
+        idx = cls(capacity=max(1024, int(len(rows) * 1.25)))
+        raw = _raw(rows)
+        if len(rows):
+            # nanmean/nanstd warn on an all-NaN column (no HOA data yet); handled below.
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", RuntimeWarning)
+                mean = np.nanmean(raw, axis=0)
+                std = np.nanstd(raw, axis=0)
+            idx.mean = np.nan_to_num(mean, nan=0.0).astype(np.float32)
+            idx.std = np.where(np.isfinite(std) & (std > 0), std, 1.0).astype(np.float32)
+        idx._put(rows, raw)
+        return idx
+
+    def upsert(self, rows):
+        rows = list(rows)
+        if rows:
+            self._put(rows, _raw(rows))
+
+    def remove(self, listing_ids: Iterable[int]):
+        for lid in listing_ids:
+            i = self._row.pop(lid, None)
+            if i is not None:
+                self.alive[i] = False
+
+    def _put(self, rows, raw: np.ndarray):
+        fresh = sum(1 for r in rows if r["listing_id"] not in self._row)
+        self._grow(self.size + fresh)
+        z = self._standardize(raw)
+        for j, r in enumerate(rows):
+            lid = r["listing_id"]
+            i = self._row.get(lid)
+            if i is None:
+                i = self._row[lid] = self.size
+                self.size += 1
+            self.ids[i] = lid
+            self.z[i] = z[j]
+            self.loan_type[i] = self._type_code(r["loan_type"])
+            self.lat[i] = np.nan if r["lat"] is None else r["lat"]
+            self.lon[i] = np.nan if r["lon"] is None else r["lon"]
+            self.alive[i] = True
+
+    def search(self, listing_id: int, k: int = 10, radius_km: Optional[float] = None) -> list[Comparable]:
+        i = self._row.get(listing_id)
+        if i is None:
+            raise KeyError(listing_id)
+        n = self.size
+        cand = self.alive[:n].copy()
+        cand[i] = False
+        lat0, lon0 = float(self.lat[i]), float(self.lon[i])
+        located = math.isfinite(lat0) and math.isfinite(lon0)
+
+        if radius_km is not None:
+            if not located:
+                return []
+            # Cheap box first; exact great-circle distance only for what survives it.
+            dlat = radius_km / 111.0
+            dlon = radius_km / (111.0 * max(math.cos(math.radians(lat0)), 0.01))
+            with np.errstate(invalid="ignore"):
+                cand &= (np.abs(self.lat[:n] - lat0) <= dlat) & (np.abs(self.lon[:n] - lon0) <= dlon)
+        sel = np.flatnonzero(cand)
+        if radius_km is not None and len(sel):
+            sel = sel[_haversine_km(lat0, lon0, self.lat[sel], self.lon[sel]) <= radius_km]
+        if not len(sel):
+            return []
+
+        diff = self.z[sel] - self.z[i]
+        score = (diff * diff) @ WEIGHTS
+        if self.loan_type[i] >= 0:
+            score += LOAN_TYPE_PENALTY * (self.loan_type[sel] != self.loan_type[i])
+        k = min(k, len(sel))
+        top = np.argpartition(score, k - 1)[:k] if k < len(sel) else np.arange(len(sel))
+        top = top[np.argsort(score[top], kind="stable")]
+
+        rows = sel[top]
+        km = _haversine_km(lat0, lon0, self.lat[rows], self.lon[rows]) if located else np.full(len(rows), np.nan)
+        return [
+            Comparable(int(self.ids[r]), float(np.sqrt(score[t])), None if np.isnan(d) else round(float(d), 2))
+            for r, t, d in zip(rows, top, km)
+        ]
+
+def _haversine_km(lat0: float, lon0: float, lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+    p0, l0 = math.radians(lat0), math.radians(lon0)
+    p, l = np.radians(lat.astype(np.float64)), np.radians(lon.astype(np.float64))
+    a = np.sin((p - p0) / 2) ** 2 + math.cos(p0) * np.cos(p) * np.sin((l - l0) / 2) ** 2
+    return 2 * _EARTH_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+class ComparablesService:
+    """Owns the live index: builds it, follows listing events, rebuilds periodically."""
+    def __init__(self, rebuild_seconds: float = REBUILD_SECONDS, batch_window: float = 0.5):
+        self.rebuild_seconds = rebuild_seconds
+        self.batch_window = batch_window
+        self.index: Optional[ComparablesIndex] = None
+        self.ready = asyncio.Event()
+        self._engine: Optional[AsyncEngine] = None
+        self._task: Optional[asyncio.Task] = None
+        self.builds = 0
+        self.patched = 0
+
+    def start(self, engine: AsyncEngine):
+        if self._task is None:
+            self._engine = engine
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def stats(self) -> dict:
+        return {"listings": len(self.index) if self.index else 0, "builds": self.builds, "patched": self.patched}
+
+    async def rebuild(self):
+        async with self._engine.connect() as conn:
+            rows = (await conn.execute(ALL_SQL)).mappings().all()
+        self.index = ComparablesIndex.build(rows)
+        self.builds += 1
+        self.ready.set()
+
+    async def refresh(self, listing_ids: Iterable[int]):
+        ids = sorted(set(listing_ids))
+        if not ids or self.index is None:
+            return
+        async with self._engine.connect() as conn:
+            rows = (await conn.execute(SOME_SQL, {"ids": ids})).mappings().all()
+        found = {r["listing_id"] for r in rows}
+        self.index.upsert(rows)
+        self.index.remove(lid for lid in ids if lid not in found)
+        self.patched += len(ids)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            sub = event_hub.subscribe()
+            try:
+                await self.rebuild()
+                rebuild_at = loop.time() + self.rebuild_seconds
+                while not sub.exhausted and loop.time() < rebuild_at:
+                    ev = await sub.get(timeout=min(30.0, max(0.1, rebuild_at - loop.time())))
+                    if ev is None:
+                        continue
+                    if ev.type == "bulk":
+                        break
+                    if ev.type != "listing":
+                        continue
+                    # Coalesce a burst of events into one reload query.
+                    pending = {ev.data["id"]}
+                    await asyncio.sleep(self.batch_window)
+                    while not sub.queue.empty():
+                        more = sub.queue.get_nowait()
+                        if more.type == "bulk":
+                            pending = None
+                            break
+                        if more.type == "listing":
+                            pending.add(more.data["id"])
+                    if pending is None:
+                        break
+                    await self.refresh(pending)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                log.exception("comparables index refresh failed; rebuilding")
+                await asyncio.sleep(5.0)
+            finally:
+                sub.close()
+
+comparables = ComparablesService()
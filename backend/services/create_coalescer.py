@@ -0,0 +1,177 @@
+"""
+Group commit for POST /api/listings.
+
+Concurrent creates are collected for up to CREATE_COALESCE_MS (or until
+CREATE_COALESCE_MAX are waiting) and written by one create_listings_v1() call
+(migration 0018): one statement, one transaction, one commit for the whole batch.
+Each caller gets its own row back, or a CreateRejected carrying the database error
+for its document alone; the other documents in the batch still commit. A failure
+of the batch itself (lost connection, timeout) is raised to every caller in it,
+except a deadlock with another process's batch, which is retried.
+
+One batch is in flight per process at a time. Creates that arrive while it is
+committing form the next batch, so under load the batch size grows with the
+arrival rate and the commit rate stays flat.
+
+Off unless CREATE_COALESCE_MS > 0. A lone request then waits up to that long
+before its write starts, so keep the window small (1-5 ms).
+"""
+from __future__ import annotations
+import asyncio, logging, os
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+from db.replica import note_commit
+from services.load_shed import sqlstate
+
+log = logging.getLogger(__name__)
+
+DEADLOCK_DETECTED = "40P01"
+
+CREATE_LISTINGS_SQL = text("""
+SELECT ord, listing_id, geocode, replayed, request_hash, error
+FROM create_listings_v1(CAST(CAST(:docs AS text[]) AS jsonb[]), CAST(:keys AS text[]), CAST(:hashes AS text[]))
+""").execution_options(metric_name="create_listings_batch", query_stats_skip=True)
+
+class CreateRejected(Exception):
+    """create_listing_v1() raised for this document; the message is the database's."""
+
+class CreateCoalescer:
+    def __init__(self, window_ms: float = 0.0, max_batch: int = 64, deadlock_retries: int = 3):
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self.deadlock_retries = deadlock_retries
+        self._sessions = None
+        self._pending: list[tuple[str, Optional[str], Optional[str], asyncio.Future]] = []
+        self._wake = asyncio.Event()
+        self._full = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.batches = 0
+        self.creates = 0
+        self.rejected = 0
+        self.failed_batches = 0
+        self.deadlocks = 0
+        self.largest = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.window > 0
+
+    def start(self, session_factory):
+        if self.enabled and self._task is None:
+            self._sessions = session_factory
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        for *_, fut in self._pending:
+            if not fut.done():
+                fut.set_exception(RuntimeError("create coalescer stopped"))
+        self._pending = []
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "window_ms": self.window * 1000.0,
+            "max_batch": self.max_batch,
+            "pending": len(self._pending),
+            "batches": self.batches,
+            "creates": self.creates,
+            "rejected": self.rejected,
+            "failed_batches": self.failed_batches,
+            "deadlocks": self.deadlocks,
+            "avg_batch": round(self.creates / self.batches, 2) if self.batches else None,
+            "largest": self.largest,
+        }
+
+    async def submit(self, doc: str, key: Optional[str] = None, request_hash: Optional[str] = None) -> dict:
+        """
+        Queues one create_listing_v1() document (JSON text) and waits for its batch.
+        Returns the function's row (listing_id, geocode, replayed, request_hash).
+
+        The batch commits in the coalescer's task, outside any request, so the
+        read-your-writes flag (db/replica.py) is set here in the caller's context.
+        """
+        if self._task is None:
+            raise RuntimeError("create coalescer not started")
+        fut = asyncio.get_running_loop().create_future()
+        self._pending.append((doc, key, request_hash, fut))
+        self._wake.set()
+        if len(self._pending) >= self.max_batch:
+            self._full.set()
+        # shield: a caller that goes away must not cancel the write of its batch
+        row = await asyncio.shield(fut)
+        if not row["replayed"]:
+            note_commit()
+        return row
+
+    async def _run(self):
+        while True:
+            await self._wake.wait()
+            try:
+                await asyncio.wait_for(self._full.wait(), self.window)
+            except asyncio.TimeoutError:
+                pass
+            batch, self._pending = self._pending[:self.max_batch], self._pending[self.max_batch:]
+            self._full.clear()
+            if not self._pending:
+                self._wake.clear()
+            elif len(self._pending) >= self.max_batch:
+                self._full.set()
+            if batch:
+                await self._flush(batch)
+
+    async def _flush(self, batch):
+        params = {
+            "docs": [b[0] for b in batch],
+            "keys": [b[1] for b in batch],
+            "hashes": [b[2] for b in batch],
+        }
+        try:
+            for attempt in range(self.deadlock_retries + 1):
+                try:
+                    async with self._sessions() as session:
+                        rows = (await session.execute(CREATE_LISTINGS_SQL, params)).mappings().all()
+                        await session.commit()
+                    break
+                except DBAPIError as e:
+                    if sqlstate(e) != DEADLOCK_DETECTED or attempt == self.deadlock_retries:
+                        raise
+                    self.deadlocks += 1
+                    log.info("coalesced create batch of %d deadlocked; retrying", len(batch))
+        except asyncio.CancelledError:
+            for *_, fut in batch:
+                if not fut.done():
+                    fut.set_exception(RuntimeError("create coalescer stopped"))
+            raise
+        except Exception as e:
+            log.warning("coalesced create batch of %d failed: %s", len(batch), e)
+            self.failed_batches += 1
+            for *_, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+
+        self.batches += 1
+        self.creates += len(batch)
+        self.largest = max(self.largest, len(batch))
+        by_ord = {r["ord"]: r for r in rows}
+        for i, (*_, fut) in enumerate(batch, start=1):
+            row = by_ord.get(i)
+            if fut.done():
+                continue
+            if row is None or row["error"] is not None:
+                self.rejected += 1
+                fut.set_exception(CreateRejected(row["error"] if row is not None else "no result"))
+            else:
+                fut.set_result({k: row[k] for k in ("listing_id", "geocode", "replayed", "request_hash")})
+
+create_coalescer = CreateCoalescer(
+    window_ms=float(os.getenv("CREATE_COALESCE_MS", "0")),
+    max_batch=int(os.getenv("CREATE_COALESCE_MAX", "64")),
+)
@@ -0,0 +1,105 @@
+"""
+Deal score: one 0-100 number for how good an assumable is to send to clients.
+
+    rate     market reference rate minus the loan's rate; full marks at
+             `spread_full` points below market, nothing at or above it
+    equity   equity_to_cover as a share of price; full marks at 0, nothing at
+             `equity_share_max` or more
+    payment  (PITI + monthly HOA) * 12 as a share of price; full marks at
+             `payment_lo`, nothing at `payment_hi` or more
+
+The weighted mean of the three terms is scaled by the loan type's eligibility
+factor (how readily a buyer can assume it). A term whose inputs are missing
+scores 0, so incomplete listings sort below complete ones. Everything is
+vectorized over column arrays: the batch job and the per-write updates run the
+same code on 100k rows or on one.
+
+Inputs come from the environment:
+
+    DEAL_MARKET_RATE=6.5
+    DEAL_WEIGHTS=rate=0.5,equity=0.3,payment=0.2
+    DEAL_LOAN_TYPE_FACTORS=FHA=1,VA=0.9,NVVA=1,Maybe_NVVA=0.85,CONV=0.5
+"""
+from __future__ import annotations
+import hashlib, json, os
+from dataclasses import asdict, dataclass, field
+from typing import Mapping, Sequence
+
+import numpy as np
+
+def _pairs(raw: str) -> dict[str, float]:
+    out = {}
+    for part in raw.split(","):
+        k, _, v = part.partition("=")
+        if k.strip() and v.strip():
+            out[k.strip()] = float(v)
+    return out
+
+@dataclass(frozen=True)
+class DealScoreParams:
+    market_rate: float = 6.5
+    spread_full: float = 3.0
+    equity_share_max: float = 0.5
+    payment_lo: float = 0.04
+    payment_hi: float = 0.12
+    weights: dict = field(default_factory=lambda: {"rate": 0.5, "equity": 0.3, "payment": 0.2})
+    loan_type_factors: dict = field(default_factory=lambda: {
+        "FHA": 1.0, "VA": 0.9, "NVVA": 1.0, "Maybe_NVVA": 0.85, "CONV": 0.5,
+    })
+    unknown_loan_type_factor: float = 0.5
+
+    @classmethod
+    def from_env(cls) -> "DealScoreParams":
+        d = cls()
+        return cls(
+            market_rate=float(os.getenv("DEAL_MARKET_RATE", d.market_rate)),
+            spread_full=float(os.getenv("DEAL_SPREAD_FULL", d.spread_full)),
+            equity_share_max=float(os.getenv("DEAL_EQUITY_SHARE_MAX", d.equity_share_max)),
+            payment_lo=float(os.getenv("DEAL_PAYMENT_LO", d.payment_lo)),
+            payment_hi=float(os.getenv("DEAL_PAYMENT_HI", d.payment_hi)),
+            weights={**d.weights, **_pairs(os.getenv("DEAL_WEIGHTS", ""))},
+            loan_type_factors={**d.loan_type_factors, **_pairs(os.getenv("DEAL_LOAN_TYPE_FACTORS", ""))},
+        )
+
+    def fingerprint(self) -> str:
+        """Stored with every score; a different value means the row was scored under other inputs."""
+        return hashlib.sha1(json.dumps(asdict(self), sort_keys=True).encode()).hexdigest()[:12]
+
+def _col(rows: Sequence[Mapping], name: str) -> np.ndarray:
+    return np.array([np.nan if r[name] is None else float(r[name]) for r in rows], dtype=np.float64)
+
+def _ramp_down(x: np.ndarray, lo: float, hi: float) -> np.ndarray:
+    """1 at or below lo, 0 at or above hi, linear between; NaN stays NaN."""
+    return np.clip((hi - x) / (hi - lo), 0.0, 1.0)
+
+def score_rows(rows: Sequence[Mapping], params: DealScoreParams) -> dict[str, np.ndarray]:
+    """
+    Rows carry price, interest_rate, equity_to_cover, piti, hoa_monthly and
+    loan_type. Returns the score and its raw components, one array each.
+    """
+    price = _col(rows, "price")
+    price[~(price > 0)] = np.nan
+    rate = _col(rows, "interest_rate")
+    equity = _col(rows, "equity_to_cover")
+    piti = _col(rows, "piti")
+    hoa = np.nan_to_num(_col(rows, "hoa_monthly"), nan=0.0)
+
+    rate_spread = params.market_rate - rate
+    equity_share = np.maximum(equity, 0.0) / price
+    payment_ratio = (piti + hoa) * 12.0 / price
+
+    terms = {
+        "rate": np.clip(rate_spread / params.spread_full, 0.0, 1.0),
+        "equity": _ramp_down(equity_share, 0.0, params.equity_share_max),
+        "payment": _ramp_down(payment_ratio, params.payment_lo, params.payment_hi),
+    }
+    total_w = sum(params.weights.get(k, 0.0) for k in terms) or 1.0
+    blended = sum(params.weights.get(k, 0.0) * np.nan_to_num(t, nan=0.0) for k, t in terms.items()) / total_w
+    factor = np.array([params.loan_type_factors.get(r["loan_type"], params.unknown_loan_type_factor) for r in rows],
+                      dtype=np.float64)
+    return {
+        "score": np.round(100.0 * blended * factor, 2),
+        "rate_spread": rate_spread,
+        "equity_share": equity_share,
+        "payment_ratio": payment_ratio,
+    }
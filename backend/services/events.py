@@ -0,0 +1,216 @@
+"""
+Listing change events over a Redis Stream.
+
+Writers (create_listing, the ETL) XADD compact events after they commit. Each API
+process runs one `EventHub`, which holds a single blocking XREAD on the stream and
+fans events out to bounded per-subscriber queues. Connected clients therefore never
+add Redis or database load. A subscriber whose queue fills up is cut off rather
+than buffered without bound. It reconnects with Last-Event-ID and catches up from
+the stream, which keeps the last STREAM_MAXLEN events.
+
+A stream rather than plain pub/sub is what makes that resume possible.
+"""
+from __future__ import annotations
+import asyncio, json, logging, os
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+from redis import Redis as SyncRedis
+from redis.asyncio import Redis
+
+log = logging.getLogger(__name__)
+
+STREAM = os.getenv("EVENTS_STREAM", "listing-events")
+STREAM_MAXLEN = int(os.getenv("EVENTS_STREAM_MAXLEN", "10000"))
+# Above this many listings a writer publishes one "bulk" event instead; clients then
+# catch up through GET /api/listings/changes.
+BULK_THRESHOLD = 500
+
+@dataclass(frozen=True)
+class Event:
+    id: str
+    type: str
+    data: dict
+
+    def after(self, other: "Event") -> bool:
+        return _id_key(self.id) > _id_key(other.id)
+
+    def sse(self) -> str:
+        return f"id: {self.id}\nevent: {self.type}\ndata: {json.dumps(self.data, separators=(',', ':'))}\n\n"
+
+def _fields(kind: str, data: dict) -> dict:
+    return {"type": kind, "data": json.dumps(data, separators=(",", ":"), default=str)}
+
+def _event(entry_id, fields: dict) -> Event:
+    def s(v):
+        return v.decode() if isinstance(v, bytes) else v
+    f = {s(k): s(v) for k, v in fields.items()}
+    return Event(id=s(entry_id), type=f.get("type", "message"), data=json.loads(f.get("data") or "{}"))
+
+def _id_key(entry_id: str) -> tuple[int, int]:
+    ms, _, seq = entry_id.partition("-")
+    return int(ms), int(seq or 0)
+
+def listing_events(listing_ids: Iterable[int], op: str = "upsert", source: str = "api") -> list[tuple[str, dict]]:
+    ids = sorted(set(listing_ids))
+    if len(ids) > BULK_THRESHOLD:
+        return [("bulk", {"listings": len(ids), "source": source})]
+    return [("listing", {"id": lid, "op": op, "source": source}) for lid in ids]
+
+def publish_sync(redis: SyncRedis, events: list[tuple[str, dict]]):
+    """Publish from sync code (the ETL) in one round trip."""
+    pipe = redis.pipeline(transaction=False)
+    for kind, data in events:
+        pipe.xadd(STREAM, _fields(kind, data), maxlen=STREAM_MAXLEN, approximate=True)
+    pipe.execute()
+
+class Subscriber:
+    def __init__(self, hub: "EventHub", maxsize: int):
+        self.hub = hub
+        self.queue: asyncio.Queue[Event] = asyncio.Queue(maxsize=maxsize)
+        self.overflowed = False
+
+    @property
+    def exhausted(self) -> bool:
+        """Cut off for falling behind, and everything queued before that was consumed."""
+        return self.overflowed and self.queue.empty()
+
+    async def get(self, timeout: float) -> Optional[Event]:
+        """Next event, or None after `timeout` seconds without one."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.hub._subscribers.discard(self)
+
+class EventHub:
+    """One XREAD loop per process, fanned out to any number of in-process subscribers."""
+    def __init__(self, stream: str = STREAM, queue_size: int = 256, block_ms: int = 5000):
+        self.stream = stream
+        self.queue_size = queue_size
+        self.block_ms = block_ms
+        self.redis: Optional[Redis] = None
+        self._subscribers: set[Subscriber] = set()
+        self._task: Optional[asyncio.Task] = None
+        self.delivered = 0
+        self.dropped_subscribers = 0
+
+    def start(self, redis: Redis):
+        if self._task is None:
+            self.redis = redis
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        self._subscribers.clear()
+
+    async def publish(self, kind: str, **data) -> Optional[str]:
+        """Best effort: a Redis outage must never fail the write that already committed."""
+        if self.redis is None:
+            return None
+        try:
+            return await self.redis.xadd(self.stream, _fields(kind, data), maxlen=STREAM_MAXLEN, approximate=True)
+        except Exception:
+            log.exception("publishing %s event failed", kind)
+            return None
+
+    def subscribe(self) -> Subscriber:
+        sub = Subscriber(self, self.queue_size)
+        self._subscribers.add(sub)
+        return sub
+
+    async def replay(self, after_id: str, count: int = STREAM_MAXLEN) -> tuple[list[Event], bool]:
+        """
+        Events strictly after `after_id` that the stream still retains, and whether
+        older ones were already trimmed (the caller then has to resync in full).
+        """
+        oldest = await self.redis.xrange(self.stream, min="-", max="+", count=1)
+        gap = bool(oldest) and _id_key(_event(*oldest[0]).id) > _id_key(after_id)
+        entries = await self.redis.xrange(self.stream, min=f"({after_id}", max="+", count=count)
+        return [_event(i, f) for i, f in entries], gap
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": len(self._subscribers),
+            "delivered": self.delivered,
+            "dropped_subscribers": self.dropped_subscribers,
+        }
+
+    def _fan_out(self, ev: Event):
+        for sub in list(self._subscribers):
+            try:
+                sub.queue.put_nowait(ev)
+                self.delivered += 1
+            except asyncio.QueueFull:
+                sub.overflowed = True
+                sub.close()
+                self.dropped_subscribers += 1
+
+    async def _run(self):
+        last_id = "$"
+        while True:
+            try:
+                resp = await self.redis.xread({self.stream: last_id}, block=self.block_ms, count=500)
+                for _stream, entries in resp or ():
+                    for entry_id, fields in entries:
+                        ev = _event(entry_id, fields)
+                        last_id = ev.id
+                        self._fan_out(ev)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                log.exception("event stream read failed; retrying")
+                await asyncio.sleep(1.0)
+
+class StreamConsumer:
+    """
+    Consumer-group reader for background jobs that must see every event once across
+    all API processes, and catch up on what they missed while down. Entries are
+    only acknowledged after the caller has processed them; anything left pending by
+    a crashed consumer is claimed after `claim_idle_ms`.
+    """
+    def __init__(self, redis: Redis, group: str, consumer: str, stream: str = STREAM, claim_idle_ms: int = 60_000):
+        self.redis = redis
+        self.group = group
+        self.consumer = consumer
+        self.stream = stream
+        self.claim_idle_ms = claim_idle_ms
+        self._backlog = True
+
+    async def ensure_group(self):
+        try:
+            await self.redis.xgroup_create(self.stream, self.group, id="$", mkstream=True)
+        except Exception as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    async def read(self, count: int = 200, block_ms: int = 5000) -> list[Event]:
+        if self._backlog:
+            # Our own unacknowledged entries first (after a restart or a failed batch),
+            # then whatever a dead consumer left behind.
+            resp = await self.redis.xreadgroup(self.group, self.consumer, {self.stream: "0"}, count=count)
+            entries = [e for _s, es in resp or () for e in es]
+            if not entries:
+                claimed = await self.redis.xautoclaim(self.stream, self.group, self.consumer,
+                                                      self.claim_idle_ms, start_id="0-0", count=count)
+                entries = claimed[1] if claimed else []
+            if entries:
+                return [_event(i, f) for i, f in entries if f]
+            self._backlog = False
+        resp = await self.redis.xreadgroup(self.group, self.consumer, {self.stream: ">"}, count=count, block=block_ms)
+        return [_event(i, f) for _s, es in resp or () for i, f in es]
+
+    async def ack(self, events: list[Event]):
+        if events:
+            await self.redis.xack(self.stream, self.group, *[e.id for e in events])
+
+    def retry(self):
+        """Re-read pending entries on the next call, e.g. after a batch failed."""
+        self._backlog = True
+
+event_hub = EventHub(queue_size=int(os.getenv("EVENTS_CLIENT_QUEUE", "256")))
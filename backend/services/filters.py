@@ -0,0 +1,123 @@
+"""
+The listing filter vocabulary, shared by GET /api/listings and saved searches.
+
+`ListingFilters.where()` renders the filters as SQL over the list query's aliases
+(l = listing, p = property, lo = loan, lp = latest price). `ListingFilters.matches()`
+evaluates the same predicates in Python against one listing's facts (FACTS_SQL),
+which is how saved searches are checked on every write without querying again.
+The two must agree; unknown (NULL/NaN) values never satisfy a bound.
+"""
+from __future__ import annotations
+import math
+from typing import Any, List, Mapping, Optional
+
+from fastapi import Query
+from pydantic import BaseModel, field_validator
+
+class ListingFilters(BaseModel):
+    loan_type: Optional[List[str]] = None
+    zip: Optional[List[str]] = None
+    mls_status: Optional[List[str]] = None
+    min_rate: Optional[float] = None
+    max_rate: Optional[float] = None
+    investor_allowed: Optional[bool] = None
+    max_equity: Optional[float] = None
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+    min_beds: Optional[int] = None
+
+    @field_validator("loan_type", "zip", "mls_status")
+    def _drop_empty(cls, v):
+        v = [s.strip() for s in v or [] if s and s.strip()]
+        return v or None
+
+    def is_empty(self) -> bool:
+        return not self.model_dump(exclude_none=True)
+
+    def where(self, prefix: str = "f_") -> tuple[list[str], dict[str, Any]]:
+        """SQL conditions (to AND together) and their bind parameters."""
+        conds, params = [], {}
+
+        def add(cond: str, name: str, value):
+            conds.append(cond.format(p=f":{prefix}{name}"))
+            params[f"{prefix}{name}"] = value
+
+        if self.loan_type:
+            add("lo.loan_type = ANY({p})", "loan_type", self.loan_type)
+        if self.zip:
+            add("left(p.zip, 5) = ANY({p})", "zip", [z[:5] for z in self.zip])
+        if self.mls_status:
+            add("lower(l.mls_status) = ANY({p})", "mls_status", [s.lower() for s in self.mls_status])
+        if self.min_rate is not None:
+            add("NULLIF(lo.interest_rate, 'NaN') >= {p}", "min_rate", self.min_rate)
+        if self.max_rate is not None:
+            add("NULLIF(lo.interest_rate, 'NaN') <= {p}", "max_rate", self.max_rate)
+        if self.investor_allowed is not None:
+            add("lo.investor_allowed = {p}", "investor_allowed", self.investor_allowed)
+        if self.max_equity is not None:
+            add("NULLIF(l.equity_to_cover, 'NaN') <= {p}", "max_equity", self.max_equity)
+        if self.min_price is not None:
+            add("NULLIF(lp.price, 'NaN') >= {p}", "min_price", self.min_price)
+        if self.max_price is not None:
+            add("NULLIF(lp.price, 'NaN') <= {p}", "max_price", self.max_price)
+        if self.min_beds is not None:
+            add("p.beds >= {p}", "min_beds", self.min_beds)
+        return conds, params
+
+    def matches(self, facts: Mapping[str, Any]) -> bool:
+        """`facts` is one FACTS_SQL row."""
+        def num(key) -> Optional[float]:
+            v = facts.get(key)
+            if v is None:
+                return None
+            v = float(v)
+            return None if math.isnan(v) else v
+
+        def at_least(key, bound) -> bool:
+            v = num(key)
+            return v is not None and v >= bound
+
+        def at_most(key, bound) -> bool:
+            v = num(key)
+            return v is not None and v <= bound
+
+        if self.loan_type and facts.get("loan_type") not in self.loan_type:
+            return False
+        if self.zip and (facts.get("zip") or "")[:5] not in {z[:5] for z in self.zip}:
+            return False
+        if self.mls_status and (facts.get("mls_status") or "").lower() not in {s.lower() for s in self.mls_status}:
+            return False
+        if self.min_rate is not None and not at_least("interest_rate", self.min_rate):
+            return False
+        if self.max_rate is not None and not at_most("interest_rate", self.max_rate):
+            return False
+        if self.investor_allowed is not None and facts.get("investor_allowed") is not self.investor_allowed:
+            return False
+        if self.max_equity is not None and not at_most("equity_to_cover", self.max_equity):
+            return False
+        if self.min_price is not None and not at_least("price", self.min_price):
+            return False
+        if self.max_price is not None and not at_most("price", self.max_price):
+            return False
+        if self.min_beds is not None and not at_least("beds", self.min_beds):
+            return False
+        return True
+
+def listing_filters(
+        loan_type: Optional[List[str]] = Query(None),
+        zip: Optional[List[str]] = Query(None),
+        mls_status: Optional[List[str]] = Query(None),
+        min_rate: Optional[float] = Query(None, ge=0),
+        max_rate: Optional[float] = Query(None, ge=0),
+        investor_allowed: Optional[bool] = Query(None),
+        max_equity: Optional[float] = Query(None),
+        min_price: Optional[float] = Query(None, ge=0),
+        max_price: Optional[float] = Query(None, ge=0),
+        min_beds: Optional[int] = Query(None, ge=0),
+) -> ListingFilters:
+    """FastAPI dependency: the filters as query parameters."""
+    return ListingFilters(
+        loan_type=loan_type, zip=zip, mls_status=mls_status, min_rate=min_rate, max_rate=max_rate,
+        investor_allowed=investor_allowed, max_equity=max_equity, min_price=min_price,
+        max_price=max_price, min_beds=min_beds,
+    )
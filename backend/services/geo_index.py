@@ -0,0 +1,165 @@
+"""
+Offline address index for the local geocoder: ZIP centroids plus street address
+ranges, stored as flat NumPy record arrays and opened memory-mapped, so API
+workers and ETL processes share the page cache instead of each loading a copy.
+
+    <dir>/CURRENT               name of the live version directory
+    <dir>/<version>/zips.npy    (zip, lat, lon), sorted by zip
+    <dir>/<version>/keys.npy    uint64 street key per range, sorted
+    <dir>/<version>/ranges.npy  (from_num, to_num, parity, lat0, lon0, lat1, lon1), in key order
+    <dir>/<version>/meta.json   build time, sources, row counts
+
+The three arrays only make sense together (ranges is in keys.npy's order), so a
+rebuild writes a new version directory and then swaps CURRENT in one rename. A
+reader resolves CURRENT once and maps every file from that one version.
+
+`key` is a 64-bit hash of the normalized street name (services/address.py, house
+number dropped) and the 5-digit ZIP. A lookup is one binary search per array plus
+a scan of that street's handful of segments. The house number is interpolated
+along the matching segment.
+
+Candidates come back shaped like Google Geocoding results (geometry.location,
+location_type, types, partial_match), so callers rank them with the same score as
+remote results. Build the index with `python -m jobs.geocode.build_index`.
+"""
+from __future__ import annotations
+import hashlib, json, os, re, shutil, time
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from services.address import normalize_street, normalize_zip
+
+ZIP_DTYPE = np.dtype([("zip", "<i4"), ("lat", "<f4"), ("lon", "<f4")])
+RANGE_DTYPE = np.dtype([
+    ("from_num", "<i4"), ("to_num", "<i4"), ("parity", "i1"),
+    ("lat0", "<f4"), ("lon0", "<f4"), ("lat1", "<f4"), ("lon1", "<f4"),
+])
+# ranges.parity
+BOTH, ODD, EVEN = 0, 1, 2
+
+POINTER = "CURRENT"
+
+_HOUSE_RE = re.compile(r"^(\d+)[A-Z]?(?:-\d+)?$")
+
+def split_street(street: Optional[str]) -> tuple[Optional[int], str]:
+    """("123 North Main Street") -> (123, "N MAIN ST"); (None, name) without a house number."""
+    s, _unit = normalize_street(street)
+    head, _, rest = s.partition(" ")
+    m = _HOUSE_RE.match(head)
+    if m and rest:
+        return int(m.group(1)), rest
+    return None, s
+
+def street_key(name: str, zip5: str) -> int:
+    return int.from_bytes(hashlib.blake2b(f"{name}|{zip5}".encode(), digest_size=8).digest(), "little")
+
+def _result(lat: float, lon: float, location_type: str, types: list[str]) -> dict:
+    return {
+        "geometry": {"location": {"lat": round(float(lat), 6), "lng": round(float(lon), 6)}, "location_type": location_type},
+        "types": types,
+        "partial_match": False,
+    }
+
+class GeoIndex:
+    def __init__(self, path: str | os.PathLike):
+        root = Path(path)
+        self.path = root / (root / POINTER).read_text().strip()
+        self.zips = np.load(self.path / "zips.npy", mmap_mode="r")
+        self.keys = np.load(self.path / "keys.npy", mmap_mode="r")
+        self.ranges = np.load(self.path / "ranges.npy", mmap_mode="r")
+        # searchsorted copies a strided column on every call, so the binary searches
+        # run over contiguous arrays: the mapped keys file and a small copy of the ZIPs.
+        self._zip_keys = np.ascontiguousarray(self.zips["zip"])
+        meta = self.path / "meta.json"
+        self.meta = json.loads(meta.read_text()) if meta.exists() else {}
+
+    def __len__(self) -> int:
+        return len(self.ranges)
+
+    def zip_centroid(self, zip5: str) -> Optional[tuple[float, float]]:
+        if not zip5:
+            return None
+        z = int(zip5)
+        i = int(np.searchsorted(self._zip_keys, z))
+        if i < len(self.zips) and self._zip_keys[i] == z:
+            row = self.zips[i]
+            return float(row["lat"]), float(row["lon"])
+        return None
+
+    def candidates(self, street: str, zip_code: str) -> list[dict]:
+        """Street match (if any) then the ZIP centroid (if known); empty when neither is indexed."""
+        zip5 = normalize_zip(zip_code)
+        if len(zip5) != 5:
+            return []
+        out: list[dict] = []
+        number, name = split_street(street)
+        if name:
+            key = np.uint64(street_key(name, zip5))
+            lo = int(np.searchsorted(self.keys, key, side="left"))
+            hi = int(np.searchsorted(self.keys, key, side="right"))
+            if hi > lo:
+                segs = self.ranges[lo:hi]
+                out.extend(self._on_street(segs, number))
+        centroid = self.zip_centroid(zip5)
+        if centroid:
+            out.append(_result(*centroid, "APPROXIMATE", ["postal_code"]))
+        return out
+
+    @staticmethod
+    def _on_street(segs: np.ndarray, number: Optional[int]) -> list[dict]:
+        if number is not None:
+            for s in segs:
+                a, b = int(s["from_num"]), int(s["to_num"])
+                if not (min(a, b) <= number <= max(a, b)):
+                    continue
+                if (s["parity"] == ODD and number % 2 == 0) or (s["parity"] == EVEN and number % 2 == 1):
+                    continue
+                t = 0.5 if a == b else (number - a) / (b - a)
+                lat = s["lat0"] + t * (s["lat1"] - s["lat0"])
+                lon = s["lon0"] + t * (s["lon1"] - s["lon0"])
+                return [_result(lat, lon, "RANGE_INTERPOLATED", ["street_address"])]
+        # Street known, house number not: the middle of the street's segments.
+        lat = (segs["lat0"].astype(np.float64).mean() + segs["lat1"].astype(np.float64).mean()) / 2
+        lon = (segs["lon0"].astype(np.float64).mean() + segs["lon1"].astype(np.float64).mean()) / 2
+        return [_result(lat, lon, "GEOMETRIC_CENTER", ["route"])]
+
+    def stats(self) -> dict:
+        return {
+            "path": str(self.path),
+            "zips": len(self.zips),
+            "ranges": len(self.ranges),
+            "bytes": int(self.zips.nbytes + self.keys.nbytes + self.ranges.nbytes),
+            **{k: v for k, v in self.meta.items() if k in ("built_at", "states")},
+        }
+
+def write_index(path: str | os.PathLike, zips: np.ndarray, keys: np.ndarray, ranges: np.ndarray, meta: dict) -> Path:
+    """
+    Sorts and writes the arrays into a new version directory, then points CURRENT
+    at it. Running readers keep their mapping of the old version; versions other
+    than the new and the previous one are removed.
+    """
+    root = Path(path)
+    root.mkdir(parents=True, exist_ok=True)
+    out = root / f"v{time.strftime('%Y%m%d%H%M%S')}-{os.getpid()}"
+    out.mkdir()
+    zips = np.unique(zips.astype(ZIP_DTYPE))
+    order = np.argsort(keys, kind="stable")
+    keys = np.ascontiguousarray(keys[order], dtype="<u8")
+    ranges = ranges.astype(RANGE_DTYPE)[order]
+    for name, arr in (("zips", zips), ("keys", keys), ("ranges", ranges)):
+        np.save(out / f"{name}.npy", arr, allow_pickle=False)
+    (out / "meta.json").write_text(json.dumps({**meta, "zips": len(zips), "ranges": len(ranges)}, indent=2))
+
+    pointer = root / POINTER
+    previous = pointer.read_text().strip() if pointer.exists() else None
+    tmp = root / f"{POINTER}.tmp"
+    tmp.write_text(out.name)
+    os.replace(tmp, pointer)
+    for old in root.glob("v*"):
+        if old.is_dir() and old.name not in (out.name, previous):
+            # A process may still map it; on Windows that makes the delete fail, so it
+            # waits for the next build.
+            shutil.rmtree(old, ignore_errors=True)
+    return out
@@ -0,0 +1,234 @@
+from __future__ import annotations
+import asyncio, hashlib, os
+from time import perf_counter
+from typing import Optional, Tuple
+
+import httpx
+
+from observability.metrics import GEOCODER_LATENCY, GEOCODER_COALESCED, GEOCODER_LOCAL_MATCHES
+from services.address import address_key
+
+Coords = Tuple[float, float]
+
+GOOGLE_GEOCODE_URL = "https://maps.googleapis.com/maps/api/geocode/json"
+
+def _score(result: dict) -> int:
+    t = (result.get("geometry", {}).get("location_type") or "APPROXIMATE").upper()
+    loc_score = {"ROOFTOP": 4, "RANGE_INTERPOLATED": 3, "GEOMETRIC_CENTER": 2, "APPROXIMATE": 1}.get(t, 1)
+    partial_penalty = -2 if result.get("partial_match") else 0
+    street_bonus = 1 if "street_address" in (result.get("types") or []) else 0
+    return loc_score + partial_penalty + street_bonus
+
+class Geocoder:
+    """
+    Base geocoder. Concurrent lookups for the same normalized address share one
+    upstream call; subclasses only implement `_lookup`.
+    """
+    name = "base"
+
+    def __init__(self, max_concurrency: int = 8):
+        self._sem = asyncio.Semaphore(max_concurrency)
+        self._inflight: dict[str, asyncio.Task] = {}
+
+    async def geocode(
+            self, street: str, city: str, state: str, zip_code: str, unit: Optional[str] = None
+    ) -> Optional[Coords]:
+        key = address_key(street, unit, city, state, zip_code)
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._limited(street, city, state, zip_code, unit))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t, k=key: self._forget(k, t))
+        else:
+            GEOCODER_COALESCED.inc()
+        # shield: a cancelled caller must not cancel the lookup other callers are waiting on
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # mark retrieved even if every waiter went away
+
+    async def _limited(self, street, city, state, zip_code, unit) -> Optional[Coords]:
+        async with self._sem:
+            start, outcome = perf_counter(), "error"
+            try:
+                result = await self._lookup(street, city, state, zip_code, unit)
+                outcome = "hit" if result else "miss"
+                return result
+            finally:
+                GEOCODER_LATENCY.labels(self.name, outcome).observe(perf_counter() - start)
+
+    async def _lookup(
+            self, street: str, city: str, state: str, zip_code: str, unit: Optional[str]
+    ) -> Optional[Coords]:
+        raise NotImplementedError
+
+    async def aclose(self):
+        pass
+
+class NullGeocoder(Geocoder):
+    """Used when no provider is configured; every address is unresolved."""
+    name = "none"
+
+    async def _lookup(self, street, city, state, zip_code, unit) -> Optional[Coords]:
+        return None
+
+class GoogleGeocoder(Geocoder):
+    name = "google"
+
+    def __init__(self, api_key: str, max_concurrency: int = 8, timeout: float = 8.0):
+        super().__init__(max_concurrency)
+        self.api_key = api_key
+        self._client = httpx.AsyncClient(
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency),
+        )
+
+    async def _lookup(self, street, city, state, zip_code, unit) -> Optional[Coords]:
+        line1 = f"{street}{(' ' + unit) if unit else ''}"
+        params = {
+            "address": f"{line1}, {city}, {state} {zip_code}, USA",
+            "components": f"country:US|postal_code:{zip_code}",
+            "region": "us",
+            "key": self.api_key,
+        }
+        r = await self._client.get(GOOGLE_GEOCODE_URL, params=params)
+        r.raise_for_status()
+        data = r.json()
+
+        if data.get("status") != "OK" or not data.get("results"):
+            return None
+
+        best = max(data["results"], key=_score)
+        loc = best.get("geometry", {}).get("location", {})
+        lat, lng = loc.get("lat"), loc.get("lng")
+        if isinstance(lat, (int, float)) and isinstance(lng, (int, float)):
+            return float(lat), float(lng)
+        return None
+
+    async def aclose(self):
+        await self._client.aclose()
+
+class LocalGeocoder(Geocoder):
+    """
+    Answers from the memory-mapped offline index (services/geo_index.py). Candidates
+    are ranked with the same `_score` as Google results: an interpolated street
+    address scores 4, the middle of a known street 2, a ZIP centroid 1. Results
+    below `min_score` count as unresolved.
+    """
+    name = "local"
+
+    def __init__(self, index, min_score: int = 1, max_concurrency: int = 8):
+        super().__init__(max_concurrency)
+        self.index = index
+        self.min_score = min_score
+
+    def best(self, street, city, state, zip_code, unit=None) -> Optional[Tuple[Coords, int]]:
+        """Synchronous lookup of the best candidate and its score; a few microseconds."""
+        candidates = self.index.candidates(street, zip_code)
+        if not candidates:
+            GEOCODER_LOCAL_MATCHES.labels("none").inc()
+            return None
+        best = max(candidates, key=_score)
+        GEOCODER_LOCAL_MATCHES.labels(best["types"][0]).inc()
+        loc = best["geometry"]["location"]
+        return (loc["lat"], loc["lng"]), _score(best)
+
+    async def _lookup(self, street, city, state, zip_code, unit) -> Optional[Coords]:
+        hit = self.best(street, city, state, zip_code, unit)
+        return hit[0] if hit and hit[1] >= self.min_score else None
+
+class ChainGeocoder(Geocoder):
+    """
+    Local index first; the remote provider only for addresses the index cannot place
+    at `accept_score` or better. When the remote has nothing either, the local
+    best guess (a street or ZIP centroid) is still returned so the property shows
+    up on the map.
+    """
+    def __init__(self, local: LocalGeocoder, remote: Geocoder, accept_score: int = 3, max_concurrency: int = 8):
+        super().__init__(max_concurrency)
+        self.local = local
+        self.remote = remote
+        self.accept_score = accept_score
+        self.name = f"{local.name}+{remote.name}"
+
+    async def _lookup(self, street, city, state, zip_code, unit) -> Optional[Coords]:
+        hit = self.local.best(street, city, state, zip_code, unit)
+        if hit and hit[1] >= self.accept_score:
+            return hit[0]
+        coords = await self.remote.geocode(street, city, state, zip_code, unit)
+        if coords:
+            return coords
+        return hit[0] if hit and hit[1] >= self.local.min_score else None
+
+    async def aclose(self):
+        await self.remote.aclose()
+
+class FakeGeocoder(Geocoder):
+    """
+    Offline stand-in for tests and local development. Returns `results[key]` when
+    given, otherwise a deterministic point near Denver derived from the address key.
+    """
+    name = "fake"
+
+    def __init__(self, results: Optional[dict[str, Optional[Coords]]] = None, delay: float = 0.0, max_concurrency: int = 8):
+        super().__init__(max_concurrency)
+        self.results = results or {}
+        self.delay = delay
+        self.calls: list[str] = []
+
+    async def _lookup(self, street, city, state, zip_code, unit) -> Optional[Coords]:
+        key = address_key(street, unit, city, state, zip_code)
+        self.calls.append(key)
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if key in self.results:
+            return self.results[key]
+        h = hashlib.sha1(key.encode()).digest()
+        return 39.74 + (h[0] - 128) / 1280.0, -104.99 + (h[1] - 128) / 1280.0
+
+def load_local_geocoder(max_concurrency: int = 8) -> Optional[LocalGeocoder]:
+    """The offline index at GEOCODER_INDEX, or None when it is unset or not built."""
+    path = os.getenv("GEOCODER_INDEX")
+    if not path or not os.path.exists(os.path.join(path, "CURRENT")):  # geo_index.POINTER
+        return None
+    from services.geo_index import GeoIndex  # numpy; only needed with an index
+    min_score = int(os.getenv("GEOCODER_LOCAL_MIN_SCORE", "1"))
+    return LocalGeocoder(GeoIndex(path), min_score=min_score, max_concurrency=max_concurrency)
+
+def build_geocoder() -> Geocoder:
+    """
+    GEOCODER=google|local|fake|none; defaults to google when GOOGLE_MAPS_KEY is set,
+    else local when GEOCODER_INDEX points at a built index. google with an index
+    tries the index first and skips the remote call for confident local matches
+    (GEOCODER_LOCAL_ACCEPT, default 3).
+    """
+    concurrency = int(os.getenv("GEOCODER_CONCURRENCY", "8"))
+    local = load_local_geocoder(concurrency) if os.getenv("GEOCODER") in (None, "", "google", "local") else None
+    kind = os.getenv("GEOCODER") or ("google" if os.getenv("GOOGLE_MAPS_KEY") else "local" if local else "none")
+    if kind == "google":
+        remote = GoogleGeocoder(os.environ["GOOGLE_MAPS_KEY"], max_concurrency=concurrency)
+        if local is None:
+            return remote
+        return ChainGeocoder(local, remote, accept_score=int(os.getenv("GEOCODER_LOCAL_ACCEPT", "3")),
+                             max_concurrency=concurrency)
+    if kind == "local":
+        if local is None:
+            raise RuntimeError("GEOCODER=local needs GEOCODER_INDEX pointing at a built index")
+        return local
+    if kind == "fake":
+        return FakeGeocoder(max_concurrency=concurrency)
+    return NullGeocoder(max_concurrency=concurrency)
+
+_geocoder: Optional[Geocoder] = None
+
+def set_geocoder(geocoder: Optional[Geocoder]):
+    global _geocoder
+    _geocoder = geocoder
+
+def get_geocoder() -> Geocoder:
+    if _geocoder is None:
+        raise RuntimeError("Geocoder not initialised; it is created in the app lifespan")
+    return _geocoder
@@ -0,0 +1,330 @@
+"""
+In-process columnar snapshot of the listing summary behind GET /api/listings.
+
+Each API process keeps one row per listing in NumPy columns: price, interest rate,
+equity, beds, lat/lon, and small integer codes for loan type, MLS status and
+5-digit zip. Repeated strings are interned through per-column code tables. A
+filter is a handful of vectorized masks (services/filters.py semantics: NaN never
+satisfies a bound), applied to a cached price order, so the database is not
+touched at all on the list path.
+
+The snapshot follows Postgres LISTEN/NOTIFY on `listing_summary` (migration 0013)
+over its own connection: notified ids are reloaded in batches and patched in
+place. LISTEN is issued before every full load, so a reconnect reloads
+everything and no commit can slip between the two. Until the first load
+finishes, or while the listener is disconnected, `ready` is false and the
+endpoint queries the database as before.
+"""
+from __future__ import annotations
+import asyncio, logging, os, sys
+from typing import Iterable, Optional
+
+import asyncpg
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from services.filters import ListingFilters
+
+log = logging.getLogger(__name__)
+
+CHANNEL = "listing_summary"
+KEEPALIVE_SECONDS = 30.0
+
+SNAPSHOT_SQL = """
+SELECT l.listing_id,
+       p.street || ', ' || p.city || ', ' || p.state || ' ' || p.zip AS address,
+       lp.price::float8 AS price,
+       lo.loan_type,
+       l.mls_status,
+       p.latitude AS lat,
+       p.longitude AS lon,
+       left(p.zip, 5) AS zip5,
+       lo.interest_rate::float8 AS interest_rate,
+       lo.investor_allowed,
+       l.equity_to_cover::float8 AS equity_to_cover,
+       p.beds
+FROM listing l
+JOIN property p ON p.property_id = l.property_id
+JOIN loan lo ON lo.property_id = l.property_id
+LEFT JOIN LATERAL (
+  SELECT ph.price FROM price_history ph
+  WHERE ph.listing_id = l.listing_id
+  ORDER BY ph.effective_date DESC, ph.price_id DESC
+  LIMIT 1
+) lp ON TRUE
+"""
+
+ALL_SQL = text(SNAPSHOT_SQL).execution_options(metric_name="listing_snapshot_load")
+SOME_SQL = text(SNAPSHOT_SQL + " WHERE l.listing_id = ANY(:ids)").execution_options(metric_name="listing_snapshot_patch")
+
+class _Codes:
+    """Interned strings of one column: str <-> small int, -1 for NULL."""
+    def __init__(self):
+        self.code: dict[str, int] = {}
+        self.value: list[str] = []
+
+    def encode(self, s: Optional[str]) -> int:
+        if s is None:
+            return -1
+        c = self.code.get(s)
+        if c is None:
+            c = self.code[s] = len(self.value)
+            self.value.append(sys.intern(s))
+        return c
+
+    def known(self, values: Iterable[str]) -> list[int]:
+        return [self.code[v] for v in values if v in self.code]
+
+def _num(v) -> float:
+    return np.nan if v is None else v
+
+class ListingSnapshot:
+    _COLUMNS = ("ids", "price", "rate", "equity", "beds", "lat", "lon",
+                "loan_type", "status", "status_lc", "zip5", "investor", "alive", "address")
+
+    def __init__(self, capacity: int = 1024):
+        self._alloc(capacity)
+        self.size = 0
+        self._row: dict[int, int] = {}
+        self._order: Optional[np.ndarray] = None
+        self.loan_types, self.statuses, self.statuses_lc, self.zips = _Codes(), _Codes(), _Codes(), _Codes()
+
+    def _alloc(self, capacity: int):
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        self.price = np.full(capacity, np.nan, dtype=np.float64)
+        self.rate = np.full(capacity, np.nan, dtype=np.float64)
+        self.equity = np.full(capacity, np.nan, dtype=np.float64)
+        self.beds = np.full(capacity, np.nan, dtype=np.float32)
+        self.lat = np.full(capacity, np.nan, dtype=np.float64)
+        self.lon = np.full(capacity, np.nan, dtype=np.float64)
+        self.loan_type = np.full(capacity, -1, dtype=np.int16)
+        self.status = np.full(capacity, -1, dtype=np.int16)
+        self.status_lc = np.full(capacity, -1, dtype=np.int16)
+        self.zip5 = np.full(capacity, -1, dtype=np.int32)
+        self.investor = np.full(capacity, -1, dtype=np.int8)
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.address = np.empty(capacity, dtype=object)
+
+    def _grow(self, need: int):
+        cap = len(self.ids)
+        if need <= cap:
+            return
+        old = [getattr(self, c) for c in self._COLUMNS]
+        self._alloc(max(need, cap * 2))
+        for c, prev in zip(self._COLUMNS, old):
+            getattr(self, c)[:cap] = prev
+
+    def __len__(self) -> int:
+        return len(self._row)
+
+    def __contains__(self, listing_id: int) -> bool:
+        return listing_id in self._row
+
+    @classmethod
+    def build(cls, rows) -> "ListingSnapshot":
+        rows = list(rows)
+        snap = cls(capacity=max(1024, int(len(rows) * 1.25)))
+        snap.upsert(rows)
+        return snap
+
+    def upsert(self, rows):
+        rows = list(rows)
+        self._grow(self.size + sum(1 for r in rows if r["listing_id"] not in self._row))
+        for r in rows:
+            lid = r["listing_id"]
+            i = self._row.get(lid)
+            if i is None:
+                i = self._row[lid] = self.size
+                self.size += 1
+            status = r["mls_status"]
+            self.ids[i] = lid
+            self.price[i] = _num(r["price"])
+            self.rate[i] = _num(r["interest_rate"])
+            self.equity[i] = _num(r["equity_to_cover"])
+            self.beds[i] = _num(r["beds"])
+            self.lat[i] = _num(r["lat"])
+            self.lon[i] = _num(r["lon"])
+            self.loan_type[i] = self.loan_types.encode(r["loan_type"])
+            self.status[i] = self.statuses.encode(status)
+            self.status_lc[i] = self.statuses_lc.encode(status.lower() if status is not None else None)
+            self.zip5[i] = self.zips.encode(r["zip5"])
+            self.investor[i] = -1 if r["investor_allowed"] is None else int(r["investor_allowed"])
+            self.address[i] = r["address"]
+            self.alive[i] = True
+        if rows:
+            self._order = None
+
+    def remove(self, listing_ids: Iterable[int]):
+        for lid in listing_ids:
+            i = self._row.pop(lid, None)
+            if i is not None:
+                self.alive[i] = False
+                self.address[i] = None
+
+    def order(self) -> np.ndarray:
+        """Row positions by price (NaN/NULL last), then listing id; rebuilt after changes."""
+        if self._order is None:
+            n = self.size
+            self._order = np.lexsort((self.ids[:n], self.price[:n]))
+        return self._order
+
+    def mask(self, f: ListingFilters) -> np.ndarray:
+        n = self.size
+        m = self.alive[:n].copy()
+        if f.loan_type:
+            m &= np.isin(self.loan_type[:n], self.loan_types.known(f.loan_type))
+        if f.zip:
+            m &= np.isin(self.zip5[:n], self.zips.known({z[:5] for z in f.zip}))
+        if f.mls_status:
+            m &= np.isin(self.status_lc[:n], self.statuses_lc.known({s.lower() for s in f.mls_status}))
+        if f.investor_allowed is not None:
+            m &= self.investor[:n] == int(f.investor_allowed)
+        # NaN compares false, which is the SQL side's NULLIF(..., 'NaN') behaviour.
+        with np.errstate(invalid="ignore"):
+            if f.min_rate is not None:
+                m &= self.rate[:n] >= f.min_rate
+            if f.max_rate is not None:
+                m &= self.rate[:n] <= f.max_rate
+            if f.max_equity is not None:
+                m &= self.equity[:n] <= f.max_equity
+            if f.min_price is not None:
+                m &= self.price[:n] >= f.min_price
+            if f.max_price is not None:
+                m &= self.price[:n] <= f.max_price
+            if f.min_beds is not None:
+                m &= self.beds[:n] >= f.min_beds
+        return m
+
+    def query(self, f: ListingFilters) -> list[dict]:
+        """ListingOut-shaped rows matching `f`, in the list endpoint's order."""
+        order = self.order()
+        rows = order[self.mask(f)[order]]
+        loan_types, statuses = self.loan_types.value, self.statuses.value
+
+        def opt(xs):
+            return [None if x != x else x for x in xs.tolist()]
+
+        return [
+            {"listing_id": lid, "address": addr, "price": price,
+             "loan_type": loan_types[lt] if lt >= 0 else None,
+             "mls_status": statuses[st] if st >= 0 else None, "lat": lat, "lon": lon}
+            for lid, addr, price, lt, st, lat, lon in zip(
+                self.ids[rows].tolist(), self.address[rows].tolist(), opt(self.price[rows]),
+                self.loan_type[rows].tolist(), self.status[rows].tolist(), opt(self.lat[rows]), opt(self.lon[rows]),
+            )
+        ]
+
+    def nbytes(self) -> int:
+        arrays = sum(getattr(self, c).nbytes for c in self._COLUMNS)
+        strings = sum(sys.getsizeof(a) for a in self.address[:self.size] if a is not None)
+        tables = sum(sys.getsizeof(s) for c in (self.loan_types, self.statuses, self.statuses_lc, self.zips) for s in c.value)
+        return arrays + strings + tables + (self._order.nbytes if self._order is not None else 0)
+
+def parse_notifications(payloads: Iterable[str]) -> tuple[set[int], set[int], bool]:
+    """(changed ids, deleted ids, bulk) from migration 0013's NOTIFY payloads."""
+    changed, deleted = set(), set()
+    for payload in payloads:
+        kind, _, ids = payload.partition(":")
+        if kind == "bulk":
+            return set(), set(), True
+        target = deleted if kind == "d" else changed
+        target.update(int(i) for i in ids.split(",") if i)
+    return changed - deleted, deleted, False
+
+class ListingSnapshotService:
+    """Owns the live snapshot: loads it, follows NOTIFY, reloads after reconnects."""
+    def __init__(self, batch_window: float = 0.05):
+        self.batch_window = batch_window
+        self.snapshot: Optional[ListingSnapshot] = None
+        self.synced = False
+        self._engine: Optional[AsyncEngine] = None
+        self._task: Optional[asyncio.Task] = None
+        self.loads = 0
+        self.patched = 0
+
+    @property
+    def ready(self) -> bool:
+        return self.synced and self.snapshot is not None
+
+    def start(self, engine: AsyncEngine):
+        if self._task is None:
+            self._engine = engine
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        self.synced = False
+
+    def stats(self) -> dict:
+        snap = self.snapshot
+        return {
+            "ready": self.ready,
+            "listings": len(snap) if snap else 0,
+            "bytes": snap.nbytes() if snap else 0,
+            "loads": self.loads,
+            "patched": self.patched,
+        }
+
+    async def reload(self):
+        async with self._engine.connect() as conn:
+            rows = (await conn.execute(ALL_SQL)).mappings().all()
+        self.snapshot = ListingSnapshot.build(rows)
+        self.loads += 1
+
+    async def refresh(self, listing_ids: Iterable[int]):
+        ids = sorted(set(listing_ids))
+        if not ids or self.snapshot is None:
+            return
+        async with self._engine.connect() as conn:
+            rows = (await conn.execute(SOME_SQL, {"ids": ids})).mappings().all()
+        found = {r["listing_id"] for r in rows}
+        self.snapshot.upsert(rows)
+        # Gone, or no longer has a loan row (the list query inner-joins loan).
+        self.snapshot.remove(lid for lid in ids if lid not in found)
+        self.patched += len(ids)
+
+    async def _run(self):
+        dsn = self._engine.url.set(drivername="postgresql").render_as_string(hide_password=False)
+        while True:
+            conn = None
+            try:
+                conn = await asyncpg.connect(dsn)
+                queue: asyncio.Queue[Optional[str]] = asyncio.Queue()
+                await conn.add_listener(CHANNEL, lambda _c, _pid, _ch, payload: queue.put_nowait(payload))
+                conn.add_termination_listener(lambda _c: queue.put_nowait(None))
+                await self.reload()
+                self.synced = True
+                while True:
+                    try:
+                        payload = await asyncio.wait_for(queue.get(), KEEPALIVE_SECONDS)
+                    except asyncio.TimeoutError:
+                        await conn.fetchval("SELECT 1")   # surfaces a silently dropped connection
+                        continue
+                    # Coalesce a burst of commits into one reload query.
+                    await asyncio.sleep(self.batch_window)
+                    payloads = [payload]
+                    while not queue.empty():
+                        payloads.append(queue.get_nowait())
+                    if None in payloads:
+                        raise ConnectionError("listener connection closed")
+                    changed, deleted, bulk = parse_notifications(payloads)
+                    if bulk:
+                        await self.reload()
+                        continue
+                    self.snapshot.remove(deleted)
+                    await self.refresh(changed)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                log.exception("listing snapshot listener failed; reconnecting")
+            finally:
+                self.synced = False
+                if conn is not None:
+                    conn.terminate()
+            await asyncio.sleep(5.0)
+
+listing_snapshot = ListingSnapshotService(batch_window=float(os.getenv("LISTING_SNAPSHOT_BATCH_SECONDS", "0.05")))
@@ -0,0 +1,183 @@
+"""
+Per-route concurrency limits, statement timeouts and load shedding.
+
+Each limited route gets a ConcurrencyLimit dependency:
+
+    DETAIL_LIMIT = ConcurrencyLimit("listing_detail", limit=16, statement_timeout_ms=2_000)
+
+    @router.get("/{lid}", dependencies=[Depends(DETAIL_LIMIT)])
+
+A request takes one of the route's `limit` slots for its whole lifetime. When
+the slots are taken it waits at most `queue_timeout` seconds behind at most
+`max_queue` others. Past either bound it is rejected at once with 503 and
+Retry-After, instead of holding a socket and a coroutine while it waits.
+
+Expensive (LOW priority) routes are also shed while the primary's pool is under
+pressure: too many coroutines are waiting for a connection, or recent checkouts
+have waited too long. Cheap (HIGH priority) routes such as auth and snapshot
+reads only answer to their own limit, so they keep working while detail pages
+and analytics back off.
+
+`statement_timeout_ms` is applied with SET LOCAL at the start of every
+transaction the request opens (db/main.py). A statement cancelled by it is
+turned into the same 503, not a 500.
+
+LOAD_SHED=0 turns the limits and shedding off; statement timeouts stay.
+"""
+from __future__ import annotations
+import asyncio, os
+from contextvars import ContextVar
+from time import monotonic
+from typing import Optional
+
+from fastapi import HTTPException
+from sqlalchemy.exc import DBAPIError
+
+from observability.metrics import LOAD_SHED, ROUTE_ACTIVE, ROUTE_WAITING
+
+HIGH, LOW = "high", "low"
+QUERY_CANCELED = "57014"
+
+# Read in db/main.py when a session begins a transaction.
+statement_timeout_ms: ContextVar[Optional[int]] = ContextVar("statement_timeout_ms", default=None)
+
+class PoolPressure:
+    """
+    Checkout pressure on the primary pool, fed by TimedQueuePool: how many
+    checkouts are waiting right now, and a moving average of recent waits that
+    also decays while no checkouts happen.
+    """
+    def __init__(self, max_waiting: int = 10, max_wait_s: float = 0.1, half_life_s: float = 2.0, alpha: float = 0.2):
+        self.max_waiting = max_waiting
+        self.max_wait_s = max_wait_s
+        self.half_life_s = half_life_s
+        self.alpha = alpha
+        self.waiting = 0
+        self._avg_wait = 0.0
+        self._at = monotonic()
+
+    def checkout_started(self):
+        self.waiting += 1
+
+    def checkout_finished(self, waited_s: float):
+        self.waiting -= 1
+        prev = self.avg_wait()
+        self._avg_wait = prev + self.alpha * (waited_s - prev)
+        self._at = monotonic()
+
+    def avg_wait(self) -> float:
+        return self._avg_wait * 0.5 ** ((monotonic() - self._at) / self.half_life_s)
+
+    def overloaded(self) -> Optional[str]:
+        """The reason to shed expensive work, or None."""
+        if self.waiting >= self.max_waiting:
+            return "pool_queue"
+        if self.avg_wait() >= self.max_wait_s:
+            return "pool_wait"
+        return None
+
+    def stats(self) -> dict:
+        return {
+            "waiting": self.waiting,
+            "avg_wait_ms": round(self.avg_wait() * 1000, 2),
+            "max_waiting": self.max_waiting,
+            "max_wait_ms": self.max_wait_s * 1000,
+        }
+
+pool_pressure = PoolPressure(
+    max_waiting=int(os.getenv("LOAD_SHED_POOL_WAITING", "10")),
+    max_wait_s=float(os.getenv("LOAD_SHED_POOL_WAIT_MS", "100")) / 1000,
+)
+
+def sqlstate(exc: BaseException) -> Optional[str]:
+    orig = getattr(exc, "orig", None)
+    return getattr(orig, "sqlstate", None) or getattr(getattr(orig, "__cause__", None), "sqlstate", None)
+
+class ConcurrencyLimit:
+    enabled = os.getenv("LOAD_SHED", "1") == "1"
+    retry_after = int(os.getenv("LOAD_SHED_RETRY_AFTER", "1"))
+    registry: dict[str, "ConcurrencyLimit"] = {}
+
+    def __init__(
+            self,
+            name: str,
+            limit: int,
+            priority: str = LOW,
+            max_queue: Optional[int] = None,
+            queue_timeout: float = 1.0,
+            statement_timeout_ms: Optional[int] = None,
+    ):
+        self.name = name
+        self.limit = limit
+        self.priority = priority
+        self.max_queue = limit if max_queue is None else max_queue
+        self.queue_timeout = queue_timeout
+        self.statement_timeout_ms = statement_timeout_ms
+        self._sem = asyncio.Semaphore(limit)
+        self.active = 0
+        self.waiting = 0
+        self.shed: dict[str, int] = {}
+        ConcurrencyLimit.registry[name] = self
+
+    def _reject(self, reason: str):
+        self.shed[reason] = self.shed.get(reason, 0) + 1
+        LOAD_SHED.labels(self.name, reason).inc()
+        raise HTTPException(status_code=503, detail="Server busy, retry shortly",
+                            headers={"Retry-After": str(self.retry_after)})
+
+    async def _acquire(self):
+        if self.priority == LOW:
+            reason = pool_pressure.overloaded()
+            if reason:
+                self._reject(reason)
+        if not self._sem.locked():
+            await self._sem.acquire()
+            return
+        if self.waiting >= self.max_queue:
+            self._reject("queue_full")
+        self.waiting += 1
+        ROUTE_WAITING.labels(self.name).inc()
+        try:
+            await asyncio.wait_for(self._sem.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._reject("queue_timeout")
+        finally:
+            self.waiting -= 1
+            ROUTE_WAITING.labels(self.name).dec()
+
+    async def __call__(self):
+        if self.enabled:
+            await self._acquire()
+            self.active += 1
+            ROUTE_ACTIVE.labels(self.name).inc()
+        statement_timeout_ms.set(self.statement_timeout_ms)
+        try:
+            yield
+        except DBAPIError as e:
+            if sqlstate(e) != QUERY_CANCELED:
+                raise
+            self._reject("statement_timeout")
+        finally:
+            statement_timeout_ms.set(None)
+            if self.enabled:
+                self.active -= 1
+                ROUTE_ACTIVE.labels(self.name).dec()
+                self._sem.release()
+
+    def stats(self) -> dict:
+        return {
+            "priority": self.priority,
+            "limit": self.limit,
+            "max_queue": self.max_queue,
+            "statement_timeout_ms": self.statement_timeout_ms,
+            "active": self.active,
+            "waiting": self.waiting,
+            "shed": dict(self.shed),
+        }
+
+def load_shed_stats() -> dict:
+    return {
+        "enabled": ConcurrencyLimit.enabled,
+        "pool": pool_pressure.stats(),
+        "routes": {name: lim.stats() for name, lim in ConcurrencyLimit.registry.items()},
+    }
@@ -0,0 +1,183 @@
+"""
+Pluggable MLS clients used by the status/price refresher (jobs/mls/refresh.py).
+
+Every client shares one token-bucket rate limit and a concurrency cap, and sends
+conditional requests (If-None-Match) so unchanged listings cost a 304. A 429 pauses
+the whole client for Retry-After rather than letting every in-flight task retry.
+
+    MLS_PROVIDER=http|fake|none   MLS_BASE_URL  MLS_API_KEY  MLS_QPS  MLS_CONCURRENCY
+"""
+from __future__ import annotations
+import asyncio, hashlib, os, time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Optional
+
+import httpx
+
+@dataclass(frozen=True)
+class MlsRecord:
+    mls_id: str
+    status: Optional[str]
+    price: Optional[float]
+
+@dataclass(frozen=True)
+class MlsResult:
+    mls_id: str
+    record: Optional[MlsRecord] = None   # None with not_modified=False: unknown to the MLS
+    etag: Optional[str] = None
+    not_modified: bool = False
+
+class RateLimited(Exception):
+    def __init__(self, retry_after: float):
+        super().__init__(f"rate limited for {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def block_for(self, seconds: float):
+        self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._blocked_until:
+                    await asyncio.sleep(self._blocked_until - now)
+                    continue
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+class MlsClient:
+    """Base client; subclasses implement `_fetch`."""
+    name = "base"
+
+    def __init__(self, qps: float = 5.0, max_concurrency: int = 8, max_rate_limit_retries: int = 5):
+        self.max_concurrency = max_concurrency
+        self.max_rate_limit_retries = max_rate_limit_retries
+        self._bucket = TokenBucket(qps)
+        self._sem = asyncio.Semaphore(max_concurrency)
+
+    async def fetch(self, mls_id: str, etag: Optional[str] = None) -> MlsResult:
+        async with self._sem:
+            for attempt in range(self.max_rate_limit_retries + 1):
+                await self._bucket.acquire()
+                try:
+                    return await self._fetch(mls_id, etag)
+                except RateLimited as e:
+                    if attempt == self.max_rate_limit_retries:
+                        raise
+                    self._bucket.block_for(e.retry_after)
+
+    async def _fetch(self, mls_id: str, etag: Optional[str]) -> MlsResult:
+        raise NotImplementedError
+
+    async def aclose(self):
+        pass
+
+class NullMlsClient(MlsClient):
+    name = "none"
+
+    async def _fetch(self, mls_id, etag):
+        return MlsResult(mls_id)
+
+def _retry_after(value: Optional[str], default: float = 5.0) -> float:
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        try:
+            when = datetime.strptime(value, "%a, %d %b %Y %H:%M:%S GMT").replace(tzinfo=timezone.utc)
+            return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+        except ValueError:
+            return default
+
+class HttpMlsClient(MlsClient):
+    """
+    GET {base_url}/listings/{mls_id} -> {"mls_id", "status", "price"} with an ETag.
+    Any MLS/RESO gateway can be adapted behind this shape.
+    """
+    name = "http"
+
+    def __init__(self, base_url: str, api_key: Optional[str] = None, timeout: float = 10.0, **kw):
+        super().__init__(**kw)
+        headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+        self._client = httpx.AsyncClient(
+            base_url=base_url.rstrip("/"), headers=headers, timeout=timeout,
+            limits=httpx.Limits(max_connections=self.max_concurrency, max_keepalive_connections=self.max_concurrency),
+        )
+
+    async def _fetch(self, mls_id, etag):
+        r = await self._client.get(f"/listings/{mls_id}", headers={"If-None-Match": etag} if etag else None)
+        if r.status_code == 304:
+            return MlsResult(mls_id, etag=etag, not_modified=True)
+        if r.status_code == 404:
+            return MlsResult(mls_id)
+        if r.status_code == 429:
+            raise RateLimited(_retry_after(r.headers.get("Retry-After")))
+        r.raise_for_status()
+        body = r.json()
+        price = body.get("price")
+        return MlsResult(
+            mls_id,
+            record=MlsRecord(mls_id, body.get("status"), float(price) if price is not None else None),
+            etag=r.headers.get("ETag"),
+        )
+
+    async def aclose(self):
+        await self._client.aclose()
+
+def fake_record(mls_id: str, now: Optional[float] = None, period_s: float = 3600.0) -> MlsRecord:
+    """
+    Deterministic listing state that drifts over time: every `period_s` a listing may
+    take a price cut or move along Active -> Pending -> Closed. Shared by FakeMlsClient
+    and the local fake server (jobs/mls/fake_server.py).
+    """
+    h = int(hashlib.sha1(mls_id.encode()).hexdigest(), 16)
+    epoch = int((now if now is not None else time.time()) // period_s)
+    base = 300_000 + (h % 600) * 1_000
+    step = (epoch + h) % 40
+    cuts = sum(1 for e in range(step) if (h >> (e % 64)) & 1)
+    status = "Active" if step < 30 else ("Pending" if step < 37 else "Closed")
+    return MlsRecord(mls_id, status, float(round(base * (0.99 ** cuts), -2)))
+
+def record_etag(rec: MlsRecord) -> str:
+    return '"' + hashlib.sha1(f"{rec.status}|{rec.price}".encode()).hexdigest()[:16] + '"'
+
+class FakeMlsClient(MlsClient):
+    """In-process stand-in with the same conditional-request semantics as the HTTP client."""
+    name = "fake"
+
+    def __init__(self, period_s: float = 3600.0, **kw):
+        super().__init__(**kw)
+        self.period_s = period_s
+        self.calls = 0
+
+    async def _fetch(self, mls_id, etag):
+        self.calls += 1
+        rec = fake_record(mls_id, period_s=self.period_s)
+        tag = record_etag(rec)
+        if etag == tag:
+            return MlsResult(mls_id, etag=tag, not_modified=True)
+        return MlsResult(mls_id, record=rec, etag=tag)
+
+def build_mls_client() -> MlsClient:
+    kw = {"qps": float(os.getenv("MLS_QPS", "5")), "max_concurrency": int(os.getenv("MLS_CONCURRENCY", "8"))}
+    provider = os.getenv("MLS_PROVIDER", "none").lower()
+    if provider == "http":
+        return HttpMlsClient(os.environ["MLS_BASE_URL"], os.getenv("MLS_API_KEY"), **kw)
+    if provider == "fake":
+        return FakeMlsClient(period_s=float(os.getenv("MLS_FAKE_PERIOD", "3600")), **kw)
+    return NullMlsClient(**kw)
@@ -0,0 +1,22 @@
+import { useEffect } from "react";
+import { useQueryClient } from "@tanstack/react-query";
+
+// Refetch listing queries when the API pushes a change. EventSource reconnects on its
+// own and resends Last-Event-ID, so events missed while disconnected are replayed.
+export function useListingEvents(debounceMs = 1000) {
+    const qc = useQueryClient();
+
+    useEffect(() => {
+        const source = new EventSource("/api/listings/stream", { withCredentials: true });
+        let timer: number | undefined;
+        const refresh = () => {
+            window.clearTimeout(timer);
+            timer = window.setTimeout(() => qc.invalidateQueries({ queryKey: ["listings"] }), debounceMs);
+        };
+        for (const type of ["listing", "bulk", "resync"]) source.addEventListener(type, refresh);
+        return () => {
+            window.clearTimeout(timer);
+            source.close();
+        };
+    }, [qc, debounceMs]);
+}
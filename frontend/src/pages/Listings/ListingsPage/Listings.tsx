@@ -4,6 +4,7 @@ import { LoadingWithText } from "../../../components/Loading/Loading.tsx";
 import { ErrorWithText } from "../../../components/Error/Error";
 import styles from "./Listings.module.css";
 import {LoanBadge, StatusBadge} from "../../../components/Badges/Badges.tsx";
+import { useListingEvents } from "../../../listingEvents";
 
 type Listing = {
     listing_id: number;
@@ -64,6 +65,7 @@ export default function Listings() {
     const [searchParams, setSearchParams] = useSearchParams();
     const selectedLoanTypes = searchParams.getAll("loan_type");
     const selectedStatuses = searchParams.getAll("mls_status");
+    useListingEvents();
 
     function updateMulti(name: string, values: string[]) {
         const next = new URLSearchParams(searchParams);
@@ -11,6 +11,7 @@ import {LoadingWithText} from "../../components/Loading/Loading.tsx";
 import {ErrorWithText} from "../../components/Error/Error.tsx";
 import styles from "./Map.module.css";
 import {LoanBadge, StatusBadge} from "../../components/Badges/Badges.tsx";
+import { useListingEvents } from "../../listingEvents";
 
 type MapListing = {
     listing_id: number;
@@ -56,6 +57,7 @@ export default function ListingsMap() {
     const [sp] = useSearchParams();
     const selected = sp.getAll("loan_type");
     const focusId = sp.get("focus");
+    useListingEvents();
 
     const qs =
         selected.length === 0